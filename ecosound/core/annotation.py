@@ -18,13 +18,30 @@ from ecosound.core.metadata import DeploymentInfo
 from ecosound.visualization.grapher_builder import GrapherFactory
 from ecosound.core.spectrogram import Spectrogram
 from ecosound.core.audiotools import Sound
+from ecosound.core.predicate import Predicate
 import copy
 import csv
+import concurrent.futures
+import threading
+import importlib.util
 import datetime
-import re
 import warnings
 from tqdm import tqdm
 
+# maximum number of partition folders written by Annotation.to_parquet
+PARQUET_MAX_PARTITIONS = 100000
+# fields indexed in sqlite tables written by Annotation.to_sqlite
+SQLITE_INDEXED_FIELDS = [
+    "audio_file_name",
+    "time_min_date",
+    "label_class",
+    "confidence",
+]
+# table of sqlite files written by Annotation.to_sqlite with the data types
+SQLITE_METADATA_TABLE = "ecosound_metadata"
+# netcdf4/hdf5 library calls are not thread-safe
+NETCDF_LOCK = threading.Lock()
+
 
 class Annotation:
     """
@@ -60,18 +77,31 @@ class Annotation:
         Import annotation data from a netCDF4 file.
     to_netcdf(file)
         Write annotation data to a netCDF4 file.
+    use_compact_dtypes(compact_dtypes=True)
+        Use memory efficient data types for the annotation fields.
+    invalidate_cache()
+        Forget the integrity state and indexes after in-place modifications.
     insert_values(**kwargs)
         Manually insert values for given Annotation fields.
     insert_metadata(deployment_info_file)
         Insert metadata information to the annotation from a
         deployment_info_file.
+    overlap_join(other, freq_ovp=True, filter_deploymentID=True)
+        Return pairs of annotations overlapping with another set of
+        annotations.
     filter_overlap_with(annot, freq_ovp=True, dur_factor_max=None,
                         dur_factor_min=None,ovlp_ratio_min=None,
                         remove_duplicates=False,inherit_metadata=False,
                         filter_deploymentID=True, inplace=False)
         Filter annotations overalaping with another set of annotations.
-    update_audio_dir(new_data_dir)
+    update_audio_dir(new_data_dir, verbose=False, cache_file=None)
         Update path of audio files.
+    get_by_file(audio_file_name)
+        Return annotations from given audio files.
+    get_by_deployment(deployment_ID)
+        Return annotations from given deployments.
+    time_range(date_min=None, date_max=None)
+        Return annotations starting within a time period.
     get_labels_class()
         Return all unique class labels.
     get_labels_subclass()
@@ -81,13 +111,44 @@ class Annotation:
     summary(rows='deployment_ID',columns='label_class')
         Produce a summary pivot table with the number of annotations for two
         given annotation fields.
+    concat(annotations)
+        Concatenate a list of annotation objects.
     __add__()
         Concatenate data from annotation objects uisng the + sign.
     __len__()
         Return number of annotations.
     """
 
-    def __init__(self):
+    # data types used when compact_dtypes is True (see use_compact_dtypes)
+    _compact_schema = {
+        "uuid": "string[pyarrow]",
+        "software_name": "category",
+        "software_version": "category",
+        "operator_name": "category",
+        "UTC_offset": "float32",
+        "audio_channel": "int32",
+        "audio_file_name": "category",
+        "audio_file_dir": "category",
+        "audio_file_extension": "category",
+        "audio_sampling_frequency": "int32",
+        "audio_bit_depth": "int32",
+        "mooring_platform_name": "category",
+        "recorder_type": "category",
+        "recorder_SN": "category",
+        "hydrophone_model": "category",
+        "hydrophone_SN": "category",
+        "hydrophone_depth": "float32",
+        "location_name": "category",
+        "location_water_depth": "float32",
+        "deployment_ID": "category",
+        "frequency_min": "float32",
+        "frequency_max": "float32",
+        "label_class": "category",
+        "label_subclass": "category",
+        "confidence": "float32",
+    }
+
+    def __init__(self, compact_dtypes=False):
         """
         Initialize Annotation object.
 
@@ -166,11 +227,18 @@ class Annotation:
             'confidence': float,
                 Confidence of the classification.
 
+        Parameters
+        ----------
+        compact_dtypes : bool, optional
+            If set to True, uses memory efficient data types for the
+            annotation fields (see use_compact_dtypes). The default is False.
+
         Returns
         -------
         Annotation object.
 
         """
+        self.compact_dtypes = compact_dtypes
         self.data = pd.DataFrame(
             {
                 "uuid": [],
@@ -212,8 +280,79 @@ class Annotation:
         )
         self._enforce_dtypes()
 
+    @property
+    def data(self):
+        """Return the annotation data (pandas DataFrame)."""
+        if len(self._pending_data) > 0:
+            self._concat_pending_data()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        """Set the annotation data (pandas DataFrame)."""
+        self._data = data
+        self._pending_data = []
+        self.invalidate_cache()
+
+    def _concat_pending_data(self):
+        """Concatenate data added with the + sign to the annotation data."""
+        frames = [self._data] + self._pending_data
+        self._pending_data = []
+        integrity = self._integrity
+        self._data = pd.concat(frames, ignore_index=True, sort=False)
+        self._indexes = dict()
+        self._enforce_dtypes()
+        # rows already checked are still at the top
+        self._integrity = integrity
+
+    def invalidate_cache(self):
+        """
+        Forget the integrity state and lookup indexes of the annotations.
+
+        Must be called after the annotation data are modified in place (e.g.
+        annot.data.loc[0, 'audio_file_name'] = 'file1'), so the next
+        integrity check covers all annotations and the indexes used by
+        get_by_file, get_by_deployment and time_range are rebuilt. Methods of
+        the Annotation object that modify the data already call it.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._integrity = None
+        self._indexes = dict()
+
+    def use_compact_dtypes(self, compact_dtypes=True):
+        """
+        Use memory efficient data types for the annotation fields.
+
+        With compact data types, text fields with repeated values (e.g.
+        'audio_file_name', 'deployment_ID', 'label_class') are stored as
+        pandas categories, the uuid as Arrow-backed strings, and integer and
+        float fields that don't require double precision (e.g. frequencies,
+        confidence, sampling frequency) as 32-bit numbers. Time offsets,
+        durations and coordinates remain 64-bit floats. Compact data types
+        are kept when filtering, concatenating, or writing/reading the
+        annotations to/from Parquet, SQLite or netCDF files (files written
+        with compact data types are read with compact data types).
+
+        Parameters
+        ----------
+        compact_dtypes : bool, optional
+            If set to True, uses compact data types. If set to False, reverts
+            to the default data types. The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.compact_dtypes = compact_dtypes
+        self._enforce_dtypes()
+
     def check_integrity(
-        self, verbose=False, ignore_frequency_duplicates=False
+        self, verbose=False, ignore_frequency_duplicates=False, incremental=True
     ):
         """
         Check integrity of Annotation object.
@@ -223,6 +362,14 @@ class Annotation:
             2- Check that min frequency < max frequency
             3- Remove duplicate entries based on time and frequency, filename,
                labels and filenames
+            4- Regenerate duplicated UUIDs
+
+        Rows that passed a previous integrity check are remembered, so in
+        incremental mode only rows added since then (e.g. with the + sign) are
+        checked. Annotations obtained by filtering a checked Annotation object
+        don't need to be checked again. If the data were modified in place
+        since the last check, use incremental=False or call invalidate_cache
+        first.
 
         Parameters
         ----------
@@ -233,6 +380,9 @@ class Annotation:
             If set to True, doesn't consider frequency values when deleting
             duplicates. It is useful when data are imported from Raven.
             The default is False.
+        incremental : bool, optional
+            If set to True, only checks rows that were not already checked.
+            Set to False to always check all rows. The default is True.
 
         Raises
         ------
@@ -245,38 +395,49 @@ class Annotation:
         None.
 
         """
-        # Drop all duplicates
-        count_start = len(self.data)
+        data = self.data
         if ignore_frequency_duplicates:  # doesn't use frequency boundaries
-            self.data = self.data.drop_duplicates(
-                subset=[
-                    "time_min_offset",
-                    "time_max_offset",
-                    "label_class",
-                    "label_subclass",
-                    "audio_file_name",
-                ],
-                keep="first",
-            ).reset_index(drop=True)
+            fields = [
+                "time_min_offset",
+                "time_max_offset",
+                "label_class",
+                "label_subclass",
+                "audio_file_name",
+            ]
         else:  # remove annot with exact same time AND frequency boundaries
-            self.data = self.data.drop_duplicates(
-                subset=[
-                    "time_min_offset",
-                    "time_max_offset",
-                    "frequency_min",
-                    "frequency_max",
-                    "label_class",
-                    "label_subclass",
-                    "audio_file_name",
-                ],
-                keep="first",
-            ).reset_index(drop=True)
-        count_stop = len(self.data)
+            fields = [
+                "time_min_offset",
+                "time_max_offset",
+                "frequency_min",
+                "frequency_max",
+                "label_class",
+                "label_subclass",
+                "audio_file_name",
+            ]
+        n_checked = 0
+        if incremental:
+            n_checked = self._count_checked_rows(fields)
+        old_state = self._integrity
+        if n_checked == 0:
+            old_state = None
+        count_start = len(data)
+
+        # Drop all duplicates
+        new_rows = data.iloc[n_checked:]
+        is_dup = new_rows.duplicated(subset=fields, keep="first").values
+        if (n_checked > 0) & (len(new_rows) > 0):
+            is_dup |= self._is_checked_row(new_rows, fields)
+        if is_dup.any():
+            data = data[np.r_[np.ones(n_checked, dtype=bool), ~is_dup]]
+        if not data.index.equals(pd.RangeIndex(len(data))):
+            data = data.reset_index(drop=True)
+        count_stop = len(data)
         if verbose:
             print("Duplicate entries removed:", str(count_start - count_stop))
+        new_rows = data.iloc[n_checked:]
         # Check that start and stop times are coherent (i.e. t2 > t1)
-        time_check = self.data.index[
-            self.data["time_max_offset"] < self.data["time_min_offset"]
+        time_check = new_rows.index[
+            new_rows["time_max_offset"] < new_rows["time_min_offset"]
         ].tolist()
         if len(time_check) > 0:
             raise ValueError(
@@ -285,8 +446,8 @@ class Annotation:
                 + str(time_check)
             )
         # Check that min and max frequencies are coherent (i.e. fmin < fmax)
-        freq_check = self.data.index[
-            self.data["frequency_max"] < self.data["frequency_min"]
+        freq_check = new_rows.index[
+            new_rows["frequency_max"] < new_rows["frequency_min"]
         ].tolist()
         if len(freq_check) > 0:
             raise ValueError(
@@ -296,19 +457,102 @@ class Annotation:
             )
 
         # check that there are not uuid duplicates
-        idx = self.data.duplicated(subset=["uuid"])
-        dup_idxs = idx[idx == True].index
-        for dup_idx in dup_idxs:
-            self.data.loc[dup_idx, "uuid"] = str(uuid.uuid4())
-        if len(dup_idxs) > 0:
+        is_dup = new_rows.duplicated(subset=["uuid"]).values
+        if (n_checked > 0) & (len(new_rows) > 0):
+            is_dup |= pd.Series(
+                Annotation._hash_rows(new_rows[["uuid"]])
+            ).isin(self._get_checked_hashes("uuid", ["uuid"])).values
+        n_dup = is_dup.sum()
+        if n_dup > 0:
+            data.loc[
+                np.flatnonzero(is_dup) + n_checked, "uuid"
+            ] = [str(uuid.uuid4()) for _ in range(n_dup)]
             if verbose:
                 print(
-                    len(dup_idxs),
+                    n_dup,
                     " UUID duplicates were found and regenerated.",
                 )
+        self.data = data
+        # remember rows that were checked
+        self._integrity = {"n_rows": len(data), "fields": fields}
+        if old_state is not None:
+            for key in ("key", "uuid"):
+                if key + "_hashes" in old_state:
+                    self._integrity[key + "_hashes"] = old_state[key + "_hashes"]
+                    self._integrity[key + "_n_rows"] = min(
+                        old_state[key + "_n_rows"], n_checked
+                    )
+                    self._integrity[key + "_dtypes"] = old_state[key + "_dtypes"]
         if verbose:
             print("Integrity test succesfull")
 
+    def _count_checked_rows(self, fields):
+        """Return number of first rows that passed the integrity check."""
+        state = self._integrity
+        # duplicates checked on fewer fields are also unique on more fields
+        if (state is None) or not set(state["fields"]).issubset(fields):
+            return 0
+        if state["n_rows"] > len(self.data):
+            return 0
+        return state["n_rows"]
+
+    def _get_checked_state(self, rows):
+        """Return integrity state of a subset of rows of the data."""
+        state = self._integrity
+        if (state is None) or (state["n_rows"] != len(self.data)):
+            return None
+        return {"n_rows": len(rows), "fields": state["fields"]}
+
+    def _get_checked_hashes(self, key, fields):
+        """Return hashes of the given fields for the rows already checked."""
+        state = self._integrity
+        n_rows = state["n_rows"]
+        dtypes = str(list(self.data[fields].dtypes))
+        # (re)calculate hashes if needed
+        if (
+            (key + "_hashes" not in state)
+            or (state[key + "_dtypes"] != dtypes)
+            or (state[key + "_n_rows"] > n_rows)
+        ):
+            state[key + "_hashes"] = np.array([], dtype=np.uint64)
+            state[key + "_n_rows"] = 0
+            state[key + "_dtypes"] = dtypes
+        if state[key + "_n_rows"] < n_rows:
+            state[key + "_hashes"] = np.concatenate(
+                [
+                    state[key + "_hashes"],
+                    Annotation._hash_rows(
+                        self.data[fields].iloc[state[key + "_n_rows"]:n_rows]
+                    ),
+                ]
+            )
+            state[key + "_n_rows"] = n_rows
+        return state[key + "_hashes"]
+
+    def _is_checked_row(self, new_rows, fields):
+        """Return True for new rows identical to rows already checked."""
+        checked_hashes = self._get_checked_hashes("key", fields)
+        new_hashes = Annotation._hash_rows(new_rows[fields])
+        candidates = np.flatnonzero(pd.Series(new_hashes).isin(checked_hashes))
+        is_dup = np.zeros(len(new_rows), dtype=bool)
+        if len(candidates) > 0:
+            # confirm candidates (same hash) are identical
+            checked_rows = self.data[fields].iloc[: len(checked_hashes)]
+            checked_rows = checked_rows[
+                pd.Series(checked_hashes).isin(new_hashes[candidates]).values
+            ]
+            candidate_rows = new_rows[fields].iloc[candidates]
+            stack = pd.concat([checked_rows, candidate_rows], ignore_index=True)
+            is_dup[candidates] = stack.duplicated(keep="first").values[
+                len(checked_rows):
+            ]
+        return is_dup
+
+    @staticmethod
+    def _hash_rows(data):
+        """Return 64-bit hash of each row of a DataFrame."""
+        return pd.util.hash_pandas_object(data, index=False).values
+
     def from_raven(
         self,
         files,
@@ -317,6 +561,9 @@ class Annotation:
         is_file_sequence=False,
         recursive=False,
         verbose=False,
+        n_jobs=None,
+        errors="raise",
+        dtype=None,
     ):
         """
         Import data from 1 or several Raven files.
@@ -342,6 +589,18 @@ class Annotation:
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        n_jobs : int, optional
+            Number of threads used to read the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
+        errors : str, optional
+            If 'raise', an error is raised if a file can't be read. If
+            'warn', files that can't be read are skipped and reported in a
+            warning. The default is 'raise'.
+        dtype : dict, optional
+            Data type of the columns of the Raven tables (e.g. {'Sound type':
+            str}), passed to pandas.read_csv. If None, data types are inferred
+            from the files. The default is None.
 
         Returns
         -------
@@ -358,22 +617,19 @@ class Annotation:
                 )
                 if verbose:
                     print(len(files), "annotation files found.")
-        data = Annotation._import_csv_files(files)
+        data = Annotation._import_csv_files(
+            files, n_jobs=n_jobs, dtype=dtype, errors=errors
+        )
         columns = data.columns.to_list()
 
         if "Begin Path" in columns:
             files_timestamp = ecosound.core.tools.filename_to_datetime(
                 data["Begin Path"].tolist()
             )
-            self.data["audio_file_name"] = data["Begin Path"].apply(
-                lambda x: os.path.splitext(os.path.basename(x))[0]
-            )
-            self.data["audio_file_dir"] = data["Begin Path"].apply(
-                lambda x: os.path.dirname(x)
-            )
-            self.data["audio_file_extension"] = data["Begin Path"].apply(
-                lambda x: os.path.splitext(x)[1]
-            )
+            paths = Annotation._split_paths(data["Begin Path"])
+            self.data["audio_file_name"] = paths["audio_file_name"]
+            self.data["audio_file_dir"] = paths["audio_file_dir"]
+            self.data["audio_file_extension"] = paths["audio_file_extension"]
         elif "Begin File" in columns:
             if verbose:
                 print(
@@ -382,13 +638,10 @@ class Annotation:
             files_timestamp = ecosound.core.tools.filename_to_datetime(
                 data["Begin File"].tolist()
             )
-            self.data["audio_file_name"] = data["Begin File"].apply(
-                lambda x: os.path.splitext(os.path.basename(x))[0]
-            )
+            paths = Annotation._split_paths(data["Begin File"])
+            self.data["audio_file_name"] = paths["audio_file_name"]
             self.data["audio_file_dir"] = None
-            self.data["audio_file_extension"] = data["Begin File"].apply(
-                lambda x: os.path.splitext(x)[1]
-            )
+            self.data["audio_file_extension"] = paths["audio_file_extension"]
         else:
             files_timestamp = None
             if verbose:
@@ -424,7 +677,11 @@ class Annotation:
             print(len(self), "annotations imported.")
 
     def to_raven(
-        self, outdir, outfile="Raven.Table.1.selections.txt", single_file=False
+        self,
+        outdir,
+        outfile="Raven.Table.1.selections.txt",
+        single_file=False,
+        n_jobs=None,
     ):
         """
         Write data to 1 or several Raven files.
@@ -432,7 +689,9 @@ class Annotation:
         Write annotations as .txt files readable by the software Raven. Output
         files can be written in a single txt file or in several txt files (one
         per audio recording). In the latter case, output file names are
-        automatically generated based on the audio file's name.
+        automatically generated based on the audio file's name. The Raven
+        table is built once for all annotations and the files are written in
+        parallel.
 
         Parameters
         ----------
@@ -444,6 +703,10 @@ class Annotation:
         single_file : bool, optional
             If set to True, writes a single output file with all annotations.
             The default is False.
+        n_jobs : int, optional
+            Number of threads used to write the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
 
         Returns
         -------
@@ -468,84 +731,12 @@ class Annotation:
             "Confidence",
         ]
         if len(self) > 0:
-            if single_file:
-                annots = [self.data]
-            else:
-                annots = [
-                    pd.DataFrame(y)
-                    for x, y in self.data.groupby(
-                        "audio_file_name", as_index=False
-                    )
-                ]
-            for annot in annots:
-                annot.reset_index(inplace=True, drop=True)
-                outdf = pd.DataFrame(
-                    {
-                        "Selection": 0,
-                        "View": 0,
-                        "Channel": 0,
-                        "Begin Time (s)": 0,
-                        "End Time (s)": 0,
-                        "Delta Time (s)": 0,
-                        "Low Freq (Hz)": 0,
-                        "High Freq (Hz)": 0,
-                        "Begin Path": 0,
-                        "File Offset (s)": 0,
-                        "Begin File": 0,
-                        "Class": 0,
-                        "Sound type": 0,
-                        "Software": 0,
-                        "Confidence": 0,
-                    },
-                    index=list(range(annot.shape[0])),
-                )
-                outdf["Selection"] = range(1, annot.shape[0] + 1)
-                outdf["View"] = "Spectrogram 1"
-                outdf["Channel"] = annot["audio_channel"]
-                outdf["Begin Time (s)"] = annot["time_min_offset"]
-                outdf["End Time (s)"] = annot["time_max_offset"]
-                outdf["Delta Time (s)"] = annot["duration"]
-                outdf["Low Freq (Hz)"] = annot["frequency_min"]
-                outdf["High Freq (Hz)"] = annot["frequency_max"]
-                outdf["File Offset (s)"] = annot["time_min_offset"]
-                outdf["Class"] = annot["label_class"]
-                outdf["Sound type"] = annot["label_subclass"]
-                outdf["Software"] = annot["software_name"]
-                outdf["Confidence"] = annot["confidence"]
-                outdf["Begin Path"] = [
-                    os.path.join(x, y) + z
-                    for x, y, z in zip(
-                        annot["audio_file_dir"],
-                        annot["audio_file_name"],
-                        annot["audio_file_extension"],
-                    )
-                ]
-                outdf["Begin File"] = [
-                    x + y
-                    for x, y in zip(
-                        annot["audio_file_name"], annot["audio_file_extension"]
-                    )
-                ]
-                outdf = outdf.fillna(0)
-                if single_file:
-                    outfilename = os.path.join(outdir, outfile)
-                else:
-                    outfilename = os.path.join(
-                        outdir,
-                        str(annot["audio_file_name"].iloc[0])
-                        + str(annot["audio_file_extension"].iloc[0])
-                        + ".chan"
-                        + str(annot["audio_channel"].iloc[0])
-                        + ".Table.1.selections.txt",
-                    )
-                outdf.to_csv(
-                    outfilename,
-                    sep="\t",
-                    encoding="utf-8",
-                    header=True,
-                    columns=cols,
-                    index=False,
-                )
+            outdf, codes, outfilenames = self._raven_table(
+                outdir, outfile, single_file
+            )
+            Annotation._write_tables(
+                outdf, cols, codes, outfilenames, n_jobs=n_jobs
+            )
         else:
             # No annotation => write file with header only
             outfilename = os.path.join(outdir, outfile)
@@ -554,16 +745,103 @@ class Annotation:
             f.write(header)
             f.close()
 
-    def to_sqlite(self, file):
+    def _raven_table(self, outdir, outfile, single_file):
+        """
+        Build the Raven table of all annotations.
+
+        Parameters
+        ----------
+        outdir : str
+            Path of the output directory where the Raven files are written.
+        outfile : str
+            Name of the output file. Only used is single_file is True.
+        single_file : bool
+            If True, all annotations are in a single output file.
+
+        Returns
+        -------
+        outdf : pandas DataFrame
+            Raven table with one row per annotation.
+        codes : numpy array
+            Index of the output file of each annotation (-1 if the annotation
+            is not written).
+        outfilenames : list of str
+            Path of each output file.
+
+        """
+        annot = self.data.reset_index(drop=True)
+        codes, first_rows = Annotation._group_by_audio_file(
+            annot, single_file
+        )
+        outdf = pd.DataFrame(
+            {
+                # numbered from 1 in each output file
+                "Selection": pd.Series(codes).groupby(codes).cumcount().values
+                + 1,
+                "View": "Spectrogram 1",
+                "Channel": annot["audio_channel"],
+                "Begin Time (s)": annot["time_min_offset"],
+                "End Time (s)": annot["time_max_offset"],
+                "Delta Time (s)": annot["duration"],
+                "Low Freq (Hz)": annot["frequency_min"],
+                "High Freq (Hz)": annot["frequency_max"],
+                "Begin Path": Annotation._join_paths(
+                    annot["audio_file_dir"],
+                    annot["audio_file_name"],
+                    annot["audio_file_extension"],
+                ),
+                "File Offset (s)": annot["time_min_offset"],
+                "Begin File": Annotation._join_paths(
+                    "",
+                    annot["audio_file_name"],
+                    annot["audio_file_extension"],
+                ),
+                "Class": annot["label_class"],
+                "Sound type": annot["label_subclass"],
+                "Software": annot["software_name"],
+                "Confidence": annot["confidence"],
+            }
+        )
+        outdf = Annotation._fill_missing(outdf)
+        if single_file:
+            outfilenames = [os.path.join(outdir, outfile)]
+        else:
+            outfilenames = [
+                os.path.join(
+                    outdir,
+                    str(annot["audio_file_name"].iloc[row])
+                    + str(annot["audio_file_extension"].iloc[row])
+                    + ".chan"
+                    + str(annot["audio_channel"].iloc[row])
+                    + ".Table.1.selections.txt",
+                )
+                for row in first_rows
+            ]
+        return outdf, codes, outfilenames
+
+    def to_sqlite(self, file, table_name="detections", chunksize=100000):
         """
         Write data to a sqlite database file.
 
-        Write annotations as .sqlite file.
+        Write annotations as .sqlite file. If the table doesn't exist, it is
+        created with the data type of each annotation field and indexes on
+        the fields 'audio_file_name', 'time_min_date', 'label_class' and
+        'confidence'. Annotations are added to the table by chunks, each
+        committed in its own transaction, so chunks already written are kept
+        if writing is interrupted. The database uses write-ahead logging (WAL)
+        so it can be read while new annotations are written. Whether compact
+        data types are used (see use_compact_dtypes) is stored in the table
+        'ecosound_metadata', so annotations are read with the same data types.
 
         Parameters
         ----------
         file : str
             Path of the output file (.sqlite) to be written.
+        table_name : str, optional
+            Name of the sql table. The default is 'detections'.
+        chunksize : int, optional
+            Number of annotations written in each transaction. The default is
+            100000.
 
         Returns
         -------
@@ -573,19 +851,72 @@ class Annotation:
         if file.endswith(".sqlite") is False:
             file = file + ".sqlite"
         self._enforce_dtypes()
-
+        data = self.data
+        columns = ", ".join(['"' + col + '"' for col in data.columns])
+        placeholders = ", ".join(["?"] * len(data.columns))
         conn = sqlite3.connect(file)
-        self.data.to_sql(
-            name="detections", con=conn, if_exists="append", index=False
-        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(Annotation._sqlite_schema(data, table_name))
+            # data types to use when reading the table
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS "
+                + SQLITE_METADATA_TABLE
+                + " (table_name TEXT PRIMARY KEY, compact_dtypes INTEGER)"
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO "
+                + SQLITE_METADATA_TABLE
+                + " VALUES (?, ?)",
+                (table_name, int(self.compact_dtypes)),
+            )
+        for idx in range(0, len(data), chunksize):
+            with conn:  # one transaction per chunk
+                conn.executemany(
+                    "INSERT INTO "
+                    + table_name
+                    + " ("
+                    + columns
+                    + ") VALUES ("
+                    + placeholders
+                    + ")",
+                    Annotation._sqlite_rows(data.iloc[idx : idx + chunksize]),
+                )
+        with conn:
+            # indexes created after the first insert are faster to build
+            for field in SQLITE_INDEXED_FIELDS:
+                if field in data.columns:
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS "
+                        + table_name
+                        + "_"
+                        + field
+                        + " ON "
+                        + table_name
+                        + ' ("'
+                        + field
+                        + '")'
+                    )
         conn.close()
 
-    def from_sqlite(self, files, table_name="detections", verbose=False):
+    def from_sqlite(
+        self,
+        files,
+        table_name="detections",
+        verbose=False,
+        columns=None,
+        filters=None,
+        chunksize=100000,
+    ):
         """
         Import data from 1 or several sqlite files.
 
         Load annotation or detection tables from .sqlite files created by the
-        method annotation.to_sqlite
+        method annotation.to_sqlite. Only the columns and rows needed can be
+        loaded using columns and filters, which are evaluated by sqlite
+        (using the indexes of the table when available). Tables that don't
+        fit in memory can be read by chunks with iter_sqlite.
 
         Parameters
         ----------
@@ -600,11 +931,107 @@ class Annotation:
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        columns : list of str, optional
+            Name of the annotation fields to load. If None, all fields are
+            loaded. If defined, the data types and integrity of the
+            annotations are not checked. The default is None.
+        filters : list of tuples, optional
+            Conditions on the rows to load, as a list of (field, operator,
+            value) tuples that must all be true. Operators can be '==', '=',
+            '!=', '<', '<=', '>', '>=', 'in', 'not in'. For example:
+            [('label_class', '==', 'MW'), ('confidence', '>=', 0.8)]. The
+            default is None.
+        chunksize : int, optional
+            Number of annotations read at once from the database. The default
+            is 100000.
 
         Returns
         -------
         None.
 
+        """
+        tmp = []
+        for annot in self.iter_sqlite(
+            files,
+            table_name=table_name,
+            verbose=verbose,
+            columns=columns,
+            filters=filters,
+            chunksize=chunksize,
+        ):
+            tmp.append(annot.data)
+            # table written with compact data types
+            if annot.compact_dtypes:
+                self.compact_dtypes = True
+        if len(tmp) == 0:
+            data = pd.DataFrame(columns=columns)
+        else:
+            data = pd.concat(tmp, ignore_index=True, sort=False)
+        data.reset_index(inplace=True, drop=True)
+        self.data = data
+        if columns is not None:
+            if verbose:
+                print(len(self), "annotations imported.")
+            return
+        if self.compact_dtypes:
+            self._enforce_dtypes()
+        self.check_integrity(verbose=verbose, ignore_frequency_duplicates=True)
+        if verbose:
+            print(len(self), "annotations imported.")
+
+    def iter_sqlite(
+        self,
+        files,
+        table_name="detections",
+        verbose=False,
+        columns=None,
+        filters=None,
+        chunksize=100000,
+    ):
+        """
+        Iterate over the annotations of 1 or several sqlite files by chunks.
+
+        Annotations are read from the database chunksize annotations at a
+        time, so tables that don't fit in memory can be processed one chunk
+        at a time. Only the columns and rows needed can be loaded using
+        columns and filters (see from_sqlite). The integrity of the
+        annotations is not checked.
+
+        For example:
+            for annot in Annotation().iter_sqlite('detections.sqlite'):
+                annot.filter(confidence__ge=0.9).to_parquet(...)
+
+        Parameters
+        ----------
+        files : str, list
+            Path of the sqlite file(s) to import. Can be a str if importing a
+            single file. Needs to be a list if importing multiple files. If
+            'files' is a folder, all files in that folder ending with '.sqlite'
+            will be imported.
+        table_name : str, optional
+            Name of the sql table name containing the annotations. The default
+            is 'detections'.
+        verbose : bool, optional
+            If set to True, print the number of files found. The default is
+            False.
+        columns : list of str, optional
+            Name of the annotation fields to load. If None, all fields are
+            loaded. If defined, the data types of the annotations are not
+            enforced. The default is None.
+        filters : list of tuples, optional
+            Conditions on the rows to load (see from_sqlite). The default is
+            None.
+        chunksize : int, optional
+            Maximum number of annotations in each chunk. The default is
+            100000.
+
+        Yields
+        ------
+        annot : ecosound.annotation.Annotation
+            Annotation object with the next chunk of annotations. Other
+            attributes are from the current object. Compact data types are
+            used if the table was written with compact data types.
+
         """
         assert type(files) in (
             str,
@@ -614,31 +1041,161 @@ class Annotation:
         files = Annotation._make_list_from_input(
             files, ".sqlite", verbose=verbose
         )
-        """Import one or several sqlite files to a Panda datafrane."""
-        tmp = []
-        for idx, file in enumerate(files):
+        if columns is None:
+            select_str = "*"
+            date_fields = Annotation._sqlite_date_fields
+        else:
+            select_str = ", ".join(['"' + col + '"' for col in columns])
+            date_fields = [
+                field for field in Annotation._sqlite_date_fields
+                if field in columns
+            ]
+        where_str, params = Annotation._sqlite_where(filters)
+        query = "SELECT " + select_str + " FROM " + table_name + where_str
+        for file in files:
             conn = sqlite3.connect(file)
-            tmp2 = pd.read_sql_query(
-                "SELECT * FROM " + table_name,
-                conn,
-                parse_dates={
-                    "entry_date":'ISO8601',
-                    "audio_file_start_date":'ISO8601',
-                    "time_min_date":'ISO8601',
-                    "time_max_date":'ISO8601',
-                },
-            )
-            conn.close()
+            try:
+                compact_dtypes = self.compact_dtypes or (
+                    Annotation._sqlite_compact_dtypes(conn, table_name)
+                )
+                chunks = pd.read_sql_query(
+                    query,
+                    conn,
+                    params=params,
+                    parse_dates={field: "ISO8601" for field in date_fields},
+                    chunksize=chunksize,
+                )
+                for chunk in chunks:
+                    annot = copy.copy(self)
+                    annot.compact_dtypes = compact_dtypes
+                    annot.data = chunk
+                    if (columns is None) and compact_dtypes:
+                        annot._enforce_dtypes()
+                    yield annot
+            finally:
+                conn.close()
 
-            tmp.append(tmp2)
-        data = pd.concat(tmp, ignore_index=True, sort=False)
-        data.reset_index(inplace=True, drop=True)
-        self.data = data
-        self.check_integrity(verbose=verbose, ignore_frequency_duplicates=True)
-        if verbose:
-            print(len(self), "annotations imported.")
+    @staticmethod
+    def _sqlite_compact_dtypes(conn, table_name):
+        """Return True if the sqlite table was written with compact dtypes."""
+        try:
+            row = conn.execute(
+                "SELECT compact_dtypes FROM "
+                + SQLITE_METADATA_TABLE
+                + " WHERE table_name = ?",
+                (table_name,),
+            ).fetchone()
+        except sqlite3.OperationalError:  # file written by older versions
+            return False
+        return (row is not None) and bool(row[0])
+
+    _sqlite_date_fields = [
+        "entry_date",
+        "audio_file_start_date",
+        "time_min_date",
+        "time_max_date",
+    ]
+
+    @staticmethod
+    def _sqlite_schema(data, table_name):
+        """Return sql statement creating the table with data types."""
+        fields = []
+        for col, dtype in data.dtypes.items():
+            if pd.api.types.is_bool_dtype(dtype):
+                sql_type = "INTEGER"
+            elif pd.api.types.is_integer_dtype(dtype):
+                sql_type = "INTEGER"
+            elif pd.api.types.is_float_dtype(dtype):
+                sql_type = "REAL"
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                sql_type = "TIMESTAMP"
+            else:
+                sql_type = "TEXT"
+            fields.append('"' + col + '" ' + sql_type)
+        return (
+            "CREATE TABLE IF NOT EXISTS "
+            + table_name
+            + " ("
+            + ", ".join(fields)
+            + ")"
+        )
+
+    @staticmethod
+    def _sqlite_rows(data):
+        """Return rows of data as tuples of values supported by sqlite."""
+        columns = []
+        for col in data.columns:
+            values = data[col]
+            is_na = values.isna().values
+            if pd.api.types.is_datetime64_any_dtype(values.dtype):
+                # same text format as pandas.DataFrame.to_sql
+                values = np.datetime_as_string(
+                    values.values.astype("datetime64[us]"), unit="us"
+                )
+                values = np.char.replace(values, "T", " ").astype(object)
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                values = np.asarray(values, dtype=object)
+            else:
+                values = np.array(values.tolist(), dtype=object)
+            values[is_na] = None
+            columns.append(values)
+        return list(zip(*columns))
+
+    @staticmethod
+    def _sqlite_where(filters=None):
+        """Return sql WHERE clause and its parameters from filters."""
+        if (filters is None) or (len(filters) == 0):
+            return "", []
+        operators = {
+            "==": "=",
+            "=": "=",
+            "!=": "!=",
+            "<": "<",
+            "<=": "<=",
+            ">": ">",
+            ">=": ">=",
+            "in": "IN",
+            "not in": "NOT IN",
+        }
+        conditions = []
+        params = []
+        for field, op, value in filters:
+            if op not in operators:
+                raise ValueError(
+                    "Operator '"
+                    + op
+                    + "' not supported. Operators must be one of: "
+                    + str(list(operators.keys()))
+                )
+            if op in ("in", "not in"):
+                value = list(value)
+                conditions.append(
+                    '"'
+                    + field
+                    + '" '
+                    + operators[op]
+                    + " ("
+                    + ", ".join(["?"] * len(value))
+                    + ")"
+                )
+                params += [Annotation._sqlite_value(val) for val in value]
+            else:
+                conditions.append('"' + field + '" ' + operators[op] + " ?")
+                params.append(Annotation._sqlite_value(value))
+        return " WHERE " + " AND ".join(conditions), params
 
-    def from_pamlab(self, files, verbose=False):
+    @staticmethod
+    def _sqlite_value(value):
+        """Convert value to the format stored in sqlite tables."""
+        if isinstance(value, (datetime.datetime, np.datetime64)):
+            return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S.%f")
+        if hasattr(value, "item"):
+            return value.item()
+        return value
+
+    def from_pamlab(
+        self, files, verbose=False, n_jobs=None, errors="raise", dtype=None
+    ):
         """
         Import data from 1 or several PAMlab files.
 
@@ -654,6 +1211,18 @@ class Annotation:
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        n_jobs : int, optional
+            Number of threads used to read the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
+        errors : str, optional
+            If 'raise', an error is raised if a file can't be read. If
+            'warn', files that can't be read are skipped and reported in a
+            warning. The default is 'raise'.
+        dtype : dict, optional
+            Data type of the columns of the PAMlab tables (e.g. {'Species':
+            str}), passed to pandas.read_csv. If None, data types are inferred
+            from the files. The default is None.
 
         Returns
         -------
@@ -670,7 +1239,9 @@ class Annotation:
                 )
                 if verbose:
                     print(len(files), "annotation files found.")
-        data = Annotation._import_csv_files(files)
+        data = Annotation._import_csv_files(
+            files, n_jobs=n_jobs, dtype=dtype, errors=errors
+        )
         files_timestamp = ecosound.core.tools.filename_to_datetime(
             data["Soundfile"].tolist()
         )
@@ -681,15 +1252,10 @@ class Annotation:
             format="%Y-%m-%d %H:%M:%S.%f",
         )
         self.data["audio_channel"] = data["Channel"]
-        self.data["audio_file_name"] = data["Soundfile"].apply(
-            lambda x: os.path.splitext(os.path.basename(x))[0]
-        )
-        self.data["audio_file_dir"] = data["Soundfile"].apply(
-            lambda x: os.path.dirname(x)
-        )
-        self.data["audio_file_extension"] = data["Soundfile"].apply(
-            lambda x: os.path.splitext(x)[1]
-        )
+        paths = Annotation._split_paths(data["Soundfile"])
+        self.data["audio_file_name"] = paths["audio_file_name"]
+        self.data["audio_file_dir"] = paths["audio_file_dir"]
+        self.data["audio_file_extension"] = paths["audio_file_extension"]
         self.data["audio_sampling_frequency"] = data["Sampling freq (Hz)"]
         self.data["recorder_type"] = data["Recorder type"]
         self.data["recorder_SN"] = data["Recorder ID"]
@@ -724,7 +1290,11 @@ class Annotation:
             print(len(self), "annotations imported.")
 
     def to_pamlab(
-        self, outdir, outfile="PAMlab annotations.log", single_file=False
+        self,
+        outdir,
+        outfile="PAMlab annotations.log",
+        single_file=False,
+        n_jobs=None,
     ):
         """
         Write data to 1 or several PAMlab files.
@@ -733,7 +1303,8 @@ class Annotation:
         files can be written in a single txt file or in several txt files (one
         per audio recording). In teh latter case, output file names are
         automatically generated based on the audio file's name and the name
-        format required by PAMlab.
+        format required by PAMlab. The PAMlab table is built once for all
+        annotations and the files are written in parallel.
 
         Parameters
         ----------
@@ -745,160 +1316,169 @@ class Annotation:
         single_file : bool, optional
             If set to True, writes a single output file with all annotations.
             The default is False.
+        n_jobs : int, optional
+            Number of threads used to write the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
 
         Returns
         -------
         None.
 
         """
-        if single_file:
-            annots = [self.data]
-        else:
-            annots = [
-                pd.DataFrame(y)
-                for x, y in self.data.groupby(
-                    "audio_file_name", as_index=False
-                )
-            ]
-        for annot in annots:
-            annot.reset_index(inplace=True, drop=True)
-            cols = [
-                "fieldkey:",
-                "Soundfile",
-                "Channel",
-                "Sampling freq (Hz)",
-                "Latitude (deg)",
-                "Longitude (deg)",
-                "Recorder ID",
-                "Recorder depth",
-                "Start date and time (UTC)",
-                "Annotation date and time (local)",
-                "Recorder type",
-                "Deployment",
-                "Station",
-                "Operator",
-                "Left time (sec)",
-                "Right time (sec)",
-                "Top freq (Hz)",
-                "Bottom freq (Hz)",
-                "Species",
-                "Call type",
-                "rms SPL",
-                "SEL",
-                "",
-                "",
-            ]
-            outdf = pd.DataFrame(
-                {
-                    "fieldkey:": 0,
-                    "Soundfile": 0,
-                    "Channel": 0,
-                    "Sampling freq (Hz)": 0,
-                    "Latitude (deg)": 0,
-                    "Longitude (deg)": 0,
-                    "Recorder ID": 0,
-                    "Recorder depth": 0,
-                    "Start date and time (UTC)": 0,
-                    "Annotation date and time (local)": 0,
-                    "Recorder type": 0,
-                    "Deployment": 0,
-                    "Station": 0,
-                    "Operator": 0,
-                    "Left time (sec)": 0,
-                    "Right time (sec)": 0,
-                    "Top freq (Hz)": 0,
-                    "Bottom freq (Hz)": 0,
-                    "Species": "",
-                    "Call type": "",
-                    "rms SPL": 0,
-                    "SEL": 0,
-                    "": "",
-                    "": "",
-                },
-                index=list(range(annot.shape[0])),
-            )
-            outdf["fieldkey:"] = "an:"
-            outdf["Species"] = annot["label_class"]
-            outdf["Call type"] = annot["label_subclass"]
-            outdf["Left time (sec)"] = annot["time_min_offset"]
-            outdf["Right time (sec)"] = annot["time_max_offset"]
-            outdf["Top freq (Hz)"] = annot["frequency_max"]
-            outdf["Bottom freq (Hz)"] = annot["frequency_min"]
-            outdf["rms SPL"] = annot["confidence"]
-            outdf["Operator"] = annot["operator_name"]
-            outdf["Channel"] = annot["audio_channel"]
-            outdf["Annotation date and time (local)"] = annot["entry_date"]
-            outdf["Sampling freq (Hz)"] = annot["audio_sampling_frequency"]
-            outdf["Recorder type"] = annot["recorder_type"]
-            outdf["Recorder ID"] = annot["recorder_SN"]
-            outdf["Recorder depth"] = annot["hydrophone_depth"]
-            outdf["Station"] = annot["location_name"]
-            outdf["Latitude (deg)"] = annot["location_lat"]
-            outdf["Longitude (deg)"] = annot["location_lon"]
-            outdf["Soundfile"] = [
-                os.path.join(x, y) + z
-                for x, y, z in zip(
+        cols = [
+            "fieldkey:",
+            "Soundfile",
+            "Channel",
+            "Sampling freq (Hz)",
+            "Latitude (deg)",
+            "Longitude (deg)",
+            "Recorder ID",
+            "Recorder depth",
+            "Start date and time (UTC)",
+            "Annotation date and time (local)",
+            "Recorder type",
+            "Deployment",
+            "Station",
+            "Operator",
+            "Left time (sec)",
+            "Right time (sec)",
+            "Top freq (Hz)",
+            "Bottom freq (Hz)",
+            "Species",
+            "Call type",
+            "rms SPL",
+            "SEL",
+            "",
+            "",
+        ]
+        annot = self.data.reset_index(drop=True)
+        codes, first_rows = Annotation._group_by_audio_file(
+            annot, single_file
+        )
+        outdf = pd.DataFrame(
+            {
+                "fieldkey:": "an:",
+                "Soundfile": Annotation._join_paths(
                     annot["audio_file_dir"],
                     annot["audio_file_name"],
                     annot["audio_file_extension"],
-                )
-            ]
-            outdf = outdf.fillna(0)
-            if single_file:
-                outfilename = os.path.join(outdir, outfile)
-            else:
-                outfilename = os.path.join(
+                ),
+                "Channel": annot["audio_channel"],
+                "Sampling freq (Hz)": annot["audio_sampling_frequency"],
+                "Latitude (deg)": annot["location_lat"],
+                "Longitude (deg)": annot["location_lon"],
+                "Recorder ID": annot["recorder_SN"],
+                "Recorder depth": annot["hydrophone_depth"],
+                "Start date and time (UTC)": 0,
+                "Annotation date and time (local)": annot["entry_date"],
+                "Recorder type": annot["recorder_type"],
+                "Deployment": 0,
+                "Station": annot["location_name"],
+                "Operator": annot["operator_name"],
+                "Left time (sec)": annot["time_min_offset"],
+                "Right time (sec)": annot["time_max_offset"],
+                "Top freq (Hz)": annot["frequency_max"],
+                "Bottom freq (Hz)": annot["frequency_min"],
+                "Species": annot["label_class"],
+                "Call type": annot["label_subclass"],
+                "rms SPL": annot["confidence"],
+                "SEL": 0,
+                "": "",
+            }
+        )
+        outdf = Annotation._fill_missing(outdf)
+        if single_file:
+            outfilenames = [os.path.join(outdir, outfile)]
+        else:
+            outfilenames = [
+                os.path.join(
                     outdir,
-                    str(annot["audio_file_name"].iloc[0])
-                    + str(annot["audio_file_extension"].iloc[0])
+                    str(annot["audio_file_name"].iloc[row])
+                    + str(annot["audio_file_extension"].iloc[row])
                     + " annotations.log",
                 )
-            outdf.to_csv(
-                outfilename,
-                sep="\t",
-                encoding="utf-8",
-                header=True,
-                columns=cols,
-                index=False,
-            )
+                for row in first_rows
+            ]
+        Annotation._write_tables(
+            outdf, cols, codes, outfilenames, n_jobs=n_jobs
+        )
 
-    def from_parquet(self, file, verbose=False):
+    def from_parquet(self, file, verbose=False, columns=None, filters=None):
         """
         Import data from a Parquet file.
 
-        Load annotations from a .parquet file. This format allows for fast and
-        efficient data storage and access.
+        Load annotations from a .parquet file or from a partitioned parquet
+        dataset (folder written with to_parquet using partition_cols). This
+        format allows for fast and efficient data storage and access. Only
+        the columns and rows needed can be loaded using columns and filters.
+        Filters are applied to the partition folders and to the statistics
+        of the parquet files before reading the data, so only the relevant
+        files are read.
 
         Parameters
         ----------
-        file : str
-            Path of the input parquet file.
-
+        file : str or list of str
+            Path of the input parquet file or partitioned dataset folder, or
+            list of paths of parquet files.
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        columns : list of str, optional
+            Name of the annotation fields to load. If None, all fields are
+            loaded. If defined, the data types and integrity of the
+            annotations are not checked. The default is None.
+        filters : list of tuples, optional
+            Conditions on the rows to load, as a list of (field, operator,
+            value) tuples that must all be true. Operators can be '==', '=',
+            '!=', '<', '<=', '>', '>=', 'in', 'not in'. For example:
+            [('label_class', '==', 'MW'), ('confidence', '>=', 0.8)]. Folders
+            partitioned by date can be filtered using the field 'date' with
+            str values formated as 'YYYY-MM-DD'. The default is None.
 
         Returns
         -------
         None.
 
         """
-        self.data = pd.read_parquet(file)
+        if (type(file) is list) or os.path.isdir(file):
+            data = Annotation._read_parquet_dataset(file, columns, filters)
+        else:
+            data = pd.read_parquet(file, columns=columns, filters=filters)
+        if columns is not None:
+            self.data = data
+            if verbose:
+                print(len(self), "annotations imported.")
+            return
+        self._set_parquet_data(data)
         self.check_integrity(verbose=verbose)
         if verbose:
             print(len(self), "annotations imported.")
 
-    def to_parquet(self, file):
+    def to_parquet(self, file, partition_cols=None, metadata=None):
         """
         Write data to a Parquet file.
 
         Write annotations as .parquet file. This format allows for fast and
-        efficient data storage and access.
+        efficient data storage and access. If partition_cols is defined,
+        annotations are written as a partitioned dataset: a folder with one
+        sub-folder for each value of the partition columns (e.g.
+        deployment_ID=XXX/date=2021-03-04/label_class=MW/). Writing to an
+        existing dataset adds the new annotations to it.
 
         Parameters
         ----------
         file : str
-            Path of the output directory where the parquet files is written.
+            Path of the output parquet file, or of the dataset folder if
+            partition_cols is defined.
+        partition_cols : list of str, optional
+            Name of the annotation fields used to partition the dataset (e.g.
+            ['deployment_ID', 'date', 'label_class']). 'date' partitions the
+            annotations by day based on time_min_date. If None, all
+            annotations are written in a single file. The default is None.
+        metadata : dict, optional
+            Key-value pairs (str) stored in the metadata of the parquet file.
+            Only used if partition_cols is None. The default is None.
 
         Returns
         -------
@@ -906,18 +1486,118 @@ class Annotation:
 
         """
         # make sure the HP SN column are strings
-        self.data.hydrophone_SN = self.data.hydrophone_SN.astype(str)
+        if self.compact_dtypes is False:
+            self.data.hydrophone_SN = self.data.hydrophone_SN.astype(str)
         # save
-        self.data.to_parquet(
-            file, coerce_timestamps="ms", allow_truncated_timestamps=True
+        if (partition_cols is None) and (metadata is not None):
+            import pyarrow
+            import pyarrow.parquet
+
+            table = pyarrow.Table.from_pandas(self.data)
+            table = table.replace_schema_metadata(
+                {
+                    **(table.schema.metadata or {}),
+                    **{
+                        str(key).encode(): str(value).encode()
+                        for key, value in metadata.items()
+                    },
+                }
+            )
+            pyarrow.parquet.write_table(
+                table,
+                file,
+                coerce_timestamps="ms",
+                allow_truncated_timestamps=True,
+            )
+        elif partition_cols is None:
+            self.data.to_parquet(
+                file, coerce_timestamps="ms", allow_truncated_timestamps=True
+            )
+        else:
+            data = self.data
+            if ("date" in partition_cols) and ("date" not in data.columns):
+                data = data.assign(
+                    date=data["time_min_date"]
+                    .values.astype("datetime64[D]")
+                    .astype(str)
+                )
+            data.to_parquet(
+                file,
+                partition_cols=partition_cols,
+                coerce_timestamps="ms",
+                allow_truncated_timestamps=True,
+                max_partitions=PARQUET_MAX_PARTITIONS,
+            )
+
+    def _set_parquet_data(self, data):
+        """Set data read from parquet files and their data types."""
+        # date partition is not an annotation field
+        if "date" not in self.data.columns:
+            data = data.drop(columns="date", errors="ignore")
+        # put columns in the same order as annotation fields
+        fields = list(self.data.columns)
+        data = data[
+            [field for field in fields if field in data.columns]
+            + [col for col in data.columns if col not in fields]
+        ]
+        self.data = data
+        # file written with compact data types
+        if any(
+            isinstance(dtype, pd.CategoricalDtype) for dtype in self.data.dtypes
+        ):
+            self.compact_dtypes = True
+        if self.compact_dtypes:
+            self._enforce_dtypes()
+
+    @staticmethod
+    def _open_parquet_dataset(path):
+        """Open parquet file(s) or partitioned dataset with str partitions."""
+        import pyarrow
+        import pyarrow.dataset
+
+        dataset = pyarrow.dataset.dataset(
+            path, format="parquet", partitioning="hive"
+        )
+        # partition fields are the ones not stored in the parquet files
+        partition_names = []
+        fragment = next(dataset.get_fragments(), None)
+        if (dataset.partitioning is not None) and (fragment is not None):
+            partition_names = [
+                name
+                for name in dataset.partitioning.schema.names
+                if name not in fragment.physical_schema.names
+            ]
+        dataset = pyarrow.dataset.dataset(
+            path,
+            format="parquet",
+            partitioning=pyarrow.dataset.partitioning(
+                pyarrow.schema(
+                    [(name, pyarrow.string()) for name in partition_names]
+                ),
+                flavor="hive",
+            ),
         )
+        return dataset
+
+    @staticmethod
+    def _read_parquet_dataset(path, columns=None, filters=None):
+        """Read parquet files or dataset with partition values as str."""
+        import pyarrow.parquet
+
+        dataset = Annotation._open_parquet_dataset(path)
+        if filters is not None:
+            filters = pyarrow.parquet.filters_to_expression(filters)
+        table = dataset.to_table(columns=columns, filter=filters)
+        data = table.to_pandas()
+        return data
 
-    def from_netcdf(self, files, verbose=False):
+    def from_netcdf(self, files, verbose=False, variables=None):
         """
         Import data from a netcdf file.
 
         Load annotations from a .nc file. This format works well with xarray
-        and Dask.
+        and Dask. Files are decoded in parallel and only the variables needed
+        are read.
 
         Parameters
         ----------
@@ -929,6 +1609,10 @@ class Annotation:
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        variables : list of str, optional
+            Name of the annotation fields to load. If None, all fields are
+            loaded. If defined, the integrity of the annotations is not
+            checked. The default is None.
 
         Returns
         -------
@@ -941,42 +1625,64 @@ class Annotation:
         ), "Input must be of type str (single \
             file or directory) or list (multiple files)"
         files = Annotation._make_list_from_input(files, ".nc", verbose=verbose)
-        # Import all files to a dataframe
-        tmp = []
-        for idx, file in enumerate(files):
-            dxr = xr.open_dataset(file)
+        fields = self.get_fields()
+
+        def check_datatype(dxr):
             if dxr.attrs["datatype"] == "Annotation":
-                tmp2 = dxr.to_dataframe()
-                tmp2.reset_index(inplace=True)
+                pass
             elif dxr.attrs["datatype"] == "Measurement":
-                tmp2 = dxr.to_dataframe()
-                tmp2.reset_index(inplace=True)
-                tmp2 = tmp2[self.get_fields()]
+                dxr = Annotation._select_netcdf_variables(dxr, fields)
                 warnings.warn(
                     "Importing Measurement data as Annotation >> Not all Measurement data are loaded."
                 )
             else:
-                raise ValueError(file + "Not an Annotation file.")
-            tmp.append(tmp2)
+                raise ValueError(
+                    dxr.encoding.get("source", "") + "Not an Annotation file."
+                )
+            return dxr
 
-        data = pd.concat(tmp, ignore_index=True, sort=False)
-        data.reset_index(inplace=True, drop=True)
+        # Import all files to a dataframe
+        dxr = Annotation._open_netcdf_files(
+            files, variables=variables, preprocess=check_datatype
+        )
+        # file written with compact data types
+        if dxr.attrs.get("compact_dtypes", 0):
+            self.compact_dtypes = True
+        data = dxr.to_dataframe()
+        dxr.close()
+        data.reset_index(inplace=True)
         self.data = data
+        if variables is not None:
+            if verbose:
+                print(len(self), "annotations imported.")
+            return
+        if self.compact_dtypes:
+            self._enforce_dtypes()
         self.check_integrity(verbose=verbose)
         if verbose:
             print(len(self), "annotations imported.")
 
-    def to_netcdf(self, file):
+    def to_netcdf(self, file, compression_level=4, chunksize=100000):
         """
         Write data to a netcdf file.
 
         Write annotations as .nc file. This format works well with xarray
-        and Dask.
+        and Dask. Text fields with repeated values (e.g. label_class,
+        audio_file_name) are written as integer codes with a table of the
+        unique values, and all variables are compressed. Whether compact data
+        types are used (see use_compact_dtypes) is stored in the attribute
+        'compact_dtypes', so annotations are read with the same data types.
 
         Parameters
         ----------
         file : str
             Path of the output file (.nc) to be written.
+        compression_level : int, optional
+            zlib compression level (0 to 9). 0 means no compression. The
+            default is 4.
+        chunksize : int, optional
+            Number of annotations in each chunk of the netcdf variables. The
+            default is 100000.
 
         Returns
         -------
@@ -986,28 +1692,176 @@ class Annotation:
         if file.endswith(".nc") is False:
             file = file + ".nc"
         self._enforce_dtypes()
-        meas = self.data
-        meas.set_index("time_min_date", drop=False, inplace=True)
-        meas.index.name = "date"
-        dxr1 = meas.to_xarray()
+        dxr1 = Annotation._to_xarray(self.data)
         dxr1.attrs["datatype"] = "Annotation"
-        dxr1.to_netcdf(file, engine="netcdf4", format="NETCDF4")
+        # data types to use when reading the file
+        dxr1.attrs["compact_dtypes"] = int(self.compact_dtypes)
+        Annotation._write_netcdf(dxr1, file, compression_level, chunksize)
 
-    def to_csv(self, file):
+    @staticmethod
+    def _to_xarray(data):
         """
-        Writes data from the Annoatation object to a csv file.
-
-        Parameters
-        ----------
-        file : str
-            Name and path of the output csv file.
-
-        Returns
-        -------
-        None.
+        Convert annotation data to a xarray Dataset.
 
+        Data are indexed by the dimension 'date' (time_min_date). Categorical
+        fields are converted to integer codes (-1 for missing values). The
+        unique values of each categorical field are stored in the variable
+        <field>_categories, which is referenced in the 'categories' attribute
+        of the field.
         """
-        self.data.to_csv(file, index=False)
+        categorical_fields = [
+            field
+            for field, dtype in Annotation._compact_schema.items()
+            if dtype == "category"
+        ]
+        dxr = xr.Dataset(coords={"date": data["time_min_date"].values})
+        for col in data.columns:
+            values = data[col]
+            if (col in categorical_fields) or isinstance(
+                values.dtype, pd.CategoricalDtype
+            ):
+                codes, categories = pd.factorize(values)
+                lookup = col + "_categories"
+                dxr[col] = ("date", codes.astype("int32"), {"categories": lookup})
+                dxr[lookup] = (lookup, np.asarray(categories).astype(str))
+            elif isinstance(values.dtype, pd.StringDtype):
+                dxr[col] = (
+                    "date",
+                    values.to_numpy(dtype=object, na_value=np.nan),
+                )
+            else:
+                dxr[col] = ("date", values.values)
+        return dxr
+
+    @staticmethod
+    def _write_netcdf(dxr, file, compression_level=4, chunksize=100000):
+        """Write xarray Dataset to netcdf file with compression."""
+        encoding = dict()
+        n_rows = dxr.sizes["date"]
+        for name in dxr.data_vars:
+            var_encoding = dict()
+            if compression_level > 0:
+                var_encoding["zlib"] = True
+                var_encoding["complevel"] = compression_level
+            if dxr[name].dims == ("date",):
+                if dxr[name].dtype == object:
+                    # text as fixed-width characters instead of variable
+                    # length strings
+                    var_encoding["dtype"] = "S1"
+                elif n_rows > 0:
+                    var_encoding["chunksizes"] = (min(chunksize, n_rows),)
+            encoding[name] = var_encoding
+        dxr.to_netcdf(
+            file,
+            engine="netcdf4",
+            format="NETCDF4",
+            encoding=encoding,
+            unlimited_dims=["date"],
+        )
+
+    @staticmethod
+    def _open_netcdf_files(files, variables=None, preprocess=None, n_jobs=None):
+        """
+        Open one or several netcdf files as a single xarray Dataset.
+
+        Files are read one at a time (the netcdf library is not thread-safe),
+        categorical variables are decoded in parallel for each file, and
+        files are concatenated along the 'date' dimension. Only the variables
+        needed are read.
+
+        Parameters
+        ----------
+        files : list of str
+            Path of the netcdf files.
+        variables : list of str, optional
+            Name of the variables to keep. If None, all variables are kept.
+            The default is None.
+        preprocess : function, optional
+            Function applied to the Dataset of each file (e.g. to check its
+            attributes) before selecting and decoding variables. The default
+            is None.
+        n_jobs : int, optional
+            Number of threads used to decode the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
+
+        Returns
+        -------
+        dxr : xarray Dataset
+            Data from all files.
+
+        """
+
+        def read_file(file):
+            # no dask chunks: reading by netcdf chunks is much slower
+            with NETCDF_LOCK, xr.open_dataset(
+                file, engine="netcdf4", chunks=None
+            ) as dxr:
+                if preprocess is not None:
+                    dxr = preprocess(dxr)
+                if variables is not None:
+                    dxr = Annotation._select_netcdf_variables(dxr, variables)
+                dxr = dxr.load()
+            return Annotation._decode_netcdf_categories(dxr)
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        with executor:
+            datasets = list(executor.map(read_file, files))
+        if len(datasets) == 1:
+            return datasets[0]
+        dxr = xr.concat(
+            datasets,
+            dim="date",
+            data_vars="minimal",
+            coords="minimal",
+            compat="override",
+            combine_attrs="override",
+        )
+        return dxr
+
+    @staticmethod
+    def _select_netcdf_variables(dxr, variables):
+        """Keep variables of a netcdf Dataset (and their category tables)."""
+        variables = [var for var in variables if var in dxr]
+        variables += [
+            dxr[var].attrs["categories"]
+            for var in variables
+            if "categories" in dxr[var].attrs
+        ]
+        return dxr[variables]
+
+    @staticmethod
+    def _decode_netcdf_categories(dxr):
+        """Replace integer codes of categorical variables by their values."""
+        for name in list(dxr.data_vars):
+            lookup = dxr[name].attrs.get("categories")
+            if lookup is None:
+                continue
+            # code -1 (missing values) -> NaN
+            categories = np.append(dxr[lookup].values.astype(object), np.nan)
+            attrs = dict(dxr[name].attrs)
+            del attrs["categories"]
+            dxr[name] = ("date", categories[dxr[name].values], attrs)
+        # category tables (stored as coordinates) are no longer needed
+        return dxr.drop_vars(
+            [name for name in dxr.variables if "date" not in dxr[name].dims]
+        )
+
+    def to_csv(self, file):
+        """
+        Writes data from the Annoatation object to a csv file.
+
+        Parameters
+        ----------
+        file : str
+            Name and path of the output csv file.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.data.to_csv(file, index=False)
 
     def insert_values(self, **kwargs):
         """
@@ -1043,6 +1897,7 @@ class Annotation:
             if key in self.data:
                 #self.data[key] = value
                 self.data.loc[:, key] = value
+                self.invalidate_cache()
             else:
                 raise ValueError(
                     "The annotation object has no field: " + str(key)
@@ -1122,6 +1977,79 @@ class Annotation:
                            deployment_ID='',
                            )
 
+    def overlap_join(self, other, freq_ovp=True, filter_deploymentID=True):
+        """
+        Find pairs of overlapping annotations.
+
+        Find all pairs of annotations from the current object and from the
+        annotation object "other" that overlap in time and/or frequency.
+        Annotations are only paired if they are from the same audio file (and
+        deployment). Overlapping annotations are found by sorting annotations
+        by start time and sweeping through them, so it scales to large
+        datasets.
+
+        Parameters
+        ----------
+        other : ecosound.annotation.Annotation object
+            Annotation object to compare the current annotations with.
+        freq_ovp : bool, optional
+            If set to True, annotations must overlap not only in time but also
+            in frequency. The default is True.
+        filter_deploymentID : bool, optional
+            If set to False, doesn't use the deploymentID to match annotations
+            together but just the audio file name. The default is True.
+
+        Returns
+        -------
+        pairs : pandas DataFrame
+            Table with one row per pair of overlapping annotations, sorted by
+            index_other then index_self, with the following columns:
+                -'index_self': int,
+                    Row number of the annotation in self.data.
+                -'index_other': int,
+                    Row number of the annotation in other.data.
+                -'uuid_self': str,
+                    UUID of the annotation from self.
+                -'uuid_other': str,
+                    UUID of the annotation from other.
+                -'ovlp_duration': float,
+                    Duration of the time overlap, in seconds.
+                -'ovlp_ratio_self': float,
+                    Duration of the time overlap relative to the duration of
+                    the annotation from self.
+                -'ovlp_ratio_other': float,
+                    Duration of the time overlap relative to the duration of
+                    the annotation from other.
+
+        """
+        data1 = self.data
+        data2 = other.data
+        idx1, idx2 = Annotation._overlap_pairs(
+            data1, data2, freq_ovp=freq_ovp, filter_deploymentID=filter_deploymentID
+        )
+        ovlp_dur = np.minimum(
+            data1["time_max_offset"].values[idx1].astype(float),
+            data2["time_max_offset"].values[idx2].astype(float),
+        ) - np.maximum(
+            data1["time_min_offset"].values[idx1].astype(float),
+            data2["time_min_offset"].values[idx2].astype(float),
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio1 = ovlp_dur / data1["duration"].values[idx1].astype(float)
+            ratio2 = ovlp_dur / data2["duration"].values[idx2].astype(float)
+        pairs = pd.DataFrame(
+            {
+                "index_self": idx1,
+                "index_other": idx2,
+                "uuid_self": data1["uuid"].values[idx1],
+                "uuid_other": data2["uuid"].values[idx2],
+                "ovlp_duration": ovlp_dur,
+                "ovlp_ratio_self": ratio1,
+                "ovlp_ratio_other": ratio2,
+            }
+        )
+        return pairs
+
     def filter_overlap_with(
         self,
         annot,
@@ -1133,6 +2061,7 @@ class Annotation:
         inherit_metadata=False,
         filter_deploymentID=True,
         inplace=False,
+        validate=True,
     ):
         """
         Filter overalaping annotations.
@@ -1184,6 +2113,9 @@ class Annotation:
         inplace : bool, optional
             If set to True, updates the urrent object with the filter results.
             The default is False.
+        validate : bool, optional
+            If set to False, the integrity of the filtered annotations is not
+            checked. The default is True.
 
         Returns
         -------
@@ -1191,125 +2123,125 @@ class Annotation:
             Filtered Annotation object.
 
         """
-        stack = []
         det = self.data
-        for index, an in annot.data.iterrows():  # for each annotation
-            # restrict to the specific deploymnetID of the annotation if file names are not unique
-            if filter_deploymentID:
-                df = det[det.deployment_ID == an.deployment_ID]
-            else:
-                df = det
-            ## filter detections to same file and deployment ID as the current annotation
-            df = df[df.audio_file_name == an.audio_file_name]
-            ## check overlap in time first
-            if len(df) > 0:
-                df = df[
-                    (
-                        (df.time_min_offset <= an.time_min_offset)
-                        & (df.time_max_offset >= an.time_max_offset)
-                    )
-                    | (  # 1- annot inside detec
-                        (df.time_min_offset >= an.time_min_offset)
-                        & (df.time_max_offset <= an.time_max_offset)
-                    )
-                    | (  # 2- detec inside annot
-                        (df.time_min_offset < an.time_min_offset)
-                        & (df.time_max_offset < an.time_max_offset)
-                        & (df.time_max_offset > an.time_min_offset)
-                    )
-                    | (  # 3- only the end of the detec overlaps with annot
-                        (df.time_min_offset > an.time_min_offset)
-                        & (df.time_min_offset < an.time_max_offset)
-                        & (df.time_max_offset > an.time_max_offset)
-                    )  # 4- only the begining of the detec overlaps with annot
-                ]
-            # then looks at frequency overlap. Can be turned off if freq bounds are not reliable
-            if (len(df) > 0) & freq_ovp:
-                df = df[
-                    (
-                        (df.frequency_min <= an.frequency_min)
-                        & (df.frequency_max >= an.frequency_max)
-                    )
-                    | (  # 1- annot inside detec
-                        (df.frequency_min >= an.frequency_min)
-                        & (df.frequency_max <= an.frequency_max)
-                    )
-                    | (  # 2- detec inside annot
-                        (df.frequency_min < an.frequency_min)
-                        & (df.frequency_max < an.frequency_max)
-                        & (df.frequency_max > an.frequency_min)
-                    )
-                    | (  # 3- only the top of the detec overlaps with annot
-                        (df.frequency_min > an.frequency_min)
-                        & (df.frequency_min < an.frequency_max)
-                        & (df.frequency_max > an.frequency_max)
-                    )  # 4- only the bottom of the detec overlaps with annot
-                ]
-            # discard if durations are too different
-            if (len(df) > 0) & (dur_factor_max is not None):
-                df = df[df.duration < an.duration * dur_factor_max]
-            if (len(df) > 0) & (dur_factor_min is not None):
-                df = df[df.duration > an.duration * dur_factor_min]
-
-            # discard if they don't overlap enough
-            if (len(df) > 0) & (ovlp_ratio_min is not None):
-                df_ovlp = (
-                    df["time_max_offset"].apply(
-                        lambda x: min(x, an.time_max_offset)
-                    )
-                    - df["time_min_offset"].apply(
-                        lambda x: max(x, an.time_min_offset)
-                    )
-                ) / an.duration
-                df = df[df_ovlp >= ovlp_ratio_min]
-                df_ovlp = df_ovlp[df_ovlp >= ovlp_ratio_min]
-
-            if (len(df) > 1) & remove_duplicates:
-                df_ovlp = (
-                              df["time_max_offset"].apply(
-                                  lambda x: min(x, an.time_max_offset)
-                              )
-                              - df["time_min_offset"].apply(
-                              lambda x: max(x, an.time_min_offset)
-                          )
-                          ) / an.duration
-                try:
-                    df = df.iloc[
-                        [df_ovlp.values.argmax()]
-                    ]  # pick teh one with max time overlap
-                except:
-                    print("asas")
-
-            if len(df) > 0:
-                if inherit_metadata:
-                    df["mooring_platform_name"] = an["mooring_platform_name"]
-                    df["recorder_type"] = an["recorder_type"]
-                    df["recorder_SN"] = an["recorder_SN"]
-                    df["hydrophone_model"] = an["hydrophone_model"]
-                    df["hydrophone_SN"] = an["hydrophone_SN"]
-                    df["hydrophone_depth"] = an["hydrophone_depth"]
-                    df["location_name"] = an["location_name"]
-                    df["location_lat"] = an["location_lat"]
-                    df["location_lon"] = an["location_lon"]
-                    df["location_water_depth"] = an["location_water_depth"]
-                    df["deployment_ID"] = an["deployment_ID"]
-                    df["label_class"] = an["label_class"]
-                    df["label_subclass"] = an["label_subclass"]
-                stack.append(df)
-        if len(stack) > 0:
-            ovlp = pd.concat(stack, ignore_index=True)
+        ref = annot.data
+        pairs = self.overlap_join(
+            annot, freq_ovp=freq_ovp, filter_deploymentID=filter_deploymentID
+        )
+        det_idx, ref_idx = Annotation._select_overlap_pairs(
+            det,
+            ref,
+            pairs,
+            dur_factor_max=dur_factor_max,
+            dur_factor_min=dur_factor_min,
+            ovlp_ratio_min=ovlp_ratio_min,
+            remove_duplicates=remove_duplicates,
+        )
+        if len(det_idx) > 0:
+            ovlp = det.iloc[det_idx].reset_index(drop=True)
+            if inherit_metadata:
+                for field in [
+                    "mooring_platform_name",
+                    "recorder_type",
+                    "recorder_SN",
+                    "hydrophone_model",
+                    "hydrophone_SN",
+                    "hydrophone_depth",
+                    "location_name",
+                    "location_lat",
+                    "location_lon",
+                    "location_water_depth",
+                    "deployment_ID",
+                    "label_class",
+                    "label_subclass",
+                ]:
+                    ovlp[field] = ref[field].values[ref_idx]
+                if self.compact_dtypes:
+                    ovlp = Annotation._apply_dtypes(ovlp, compact_dtypes=True)
         else:
             ovlp = self.data[0:0]
         if inplace:
             self.data = ovlp
-            self.check_integrity()
+            if validate:
+                self.check_integrity()
             out_object = None
         else:
             out_object = copy.copy(self)
             out_object.data = ovlp
-            out_object.check_integrity()
+            if validate:
+                out_object.check_integrity()
         return out_object
 
+    @staticmethod
+    def _select_overlap_pairs(
+        det,
+        ref,
+        pairs,
+        dur_factor_max=None,
+        dur_factor_min=None,
+        ovlp_ratio_min=None,
+        remove_duplicates=False,
+    ):
+        """
+        Select pairs of overlapping annotations (see filter_overlap_with).
+
+        Parameters
+        ----------
+        det : pandas DataFrame
+            Annotations being filtered (Annotation.data).
+        ref : pandas DataFrame
+            Reference annotations (Annotation.data).
+        pairs : pandas DataFrame
+            Overlapping pairs from det.overlap_join(ref).
+        dur_factor_max : float, optional
+            Pairs are discarded if the duration of the annotation from det
+            is not less than dur_factor_max times the duration of the
+            annotation from ref. The default is None.
+        dur_factor_min : float, optional
+            Pairs are discarded if the duration of the annotation from det
+            is not greater than dur_factor_min times the duration of the
+            annotation from ref. The default is None.
+        ovlp_ratio_min : float, optional
+            Pairs are discarded if the time overlap relative to the duration
+            of the annotation from ref is less than ovlp_ratio_min. The
+            default is None.
+        remove_duplicates : bool, optional
+            If True, only the pair with the largest time overlap is kept for
+            each annotation from ref. The default is False.
+
+        Returns
+        -------
+        det_idx : numpy array
+            Row positions in det of the selected pairs.
+        ref_idx : numpy array
+            Row positions in ref of the selected pairs.
+
+        """
+        det_idx = pairs["index_self"].values
+        ref_idx = pairs["index_other"].values
+        ovlp = pairs["ovlp_ratio_other"].values
+        # discard if durations are too different
+        keep = np.ones(len(pairs), dtype=bool)
+        ref_dur = ref["duration"].values[ref_idx].astype(float)
+        if dur_factor_max is not None:
+            keep &= det["duration"].values[det_idx] < ref_dur * dur_factor_max
+        if dur_factor_min is not None:
+            keep &= det["duration"].values[det_idx] > ref_dur * dur_factor_min
+        # discard if they don't overlap enough
+        if ovlp_ratio_min is not None:
+            keep &= ovlp >= ovlp_ratio_min
+        det_idx, ref_idx, ovlp = det_idx[keep], ref_idx[keep], ovlp[keep]
+        # only keep detection with max time overlap for each annotation
+        if remove_duplicates & (len(det_idx) > 0):
+            is_nan = np.isnan(ovlp)
+            order = np.lexsort(
+                (det_idx, -np.where(is_nan, 0, ovlp), ~is_nan, ref_idx)
+            )
+            det_idx, ref_idx = det_idx[order], ref_idx[order]
+            first = np.r_[True, ref_idx[1:] != ref_idx[:-1]]
+            det_idx, ref_idx = det_idx[first], ref_idx[first]
+        return det_idx, ref_idx
+
     def calc_time_aggregate_1D(
         self,
         integration_time="1H",
@@ -1317,12 +2249,17 @@ class Annotation:
         is_binary=False,
         start_date=None,
         end_date=None,
+        field=None,
+        group_by=None,
     ):
         """
         Calculate the 1D time aggregate of annotations.
 
         Calculate the time aggregate of annotations over the defined
-        integration time.
+        integration time. For fixed integration times (e.g. hours, minutes,
+        days), annotations are assigned to time bins from their start date
+        and aggregated with histograms (numpy.bincount), without copying the
+        annotation data.
 
         Parameters
         ----------
@@ -1332,8 +2269,9 @@ class Annotation:
             documnentation here:https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
             The default is '1H'.
         resampler : str, optional
-            Defines method to combine aggregates. Currently only 'count' is
-            implemented. The default is 'count'.
+            Defines method to combine aggregates. Can be 'count' (number of
+            annotations), 'sum' or 'mean' (sum or mean of the values of the
+            annotation field defined by field). The default is 'count'.
         start_date : None, str, optional
             Defines at which date the aggregate should start. If set to None,
             the min. date will be automatically chosen. If str must be in the
@@ -1345,22 +2283,42 @@ class Annotation:
         is_binary : bool, optional
             If set to True, calculates the aggregates in term on presence (1)
             or absence (0). The default is False.
+        field : str, optional
+            Name of the annotation field to aggregate when resampler is 'sum'
+            or 'mean' (e.g. 'confidence'). The default is None.
+        group_by : str, optional
+            Name of the annotation field used to calculate separate aggregates
+            (e.g. 'label_class' or 'deployment_ID'). The default is None.
 
         Returns
         -------
         data_resamp : Pandas DataFrame
             1D DataFrame with datetime as the index and a 'value' column with the
-            result of the aggregates for each time frane.
+            result of the aggregates for each time frane. If group_by is
+            defined, there is one column per value of the group_by field
+            instead of the 'value' column.
         """
+        if resampler not in ("count", "sum", "mean"):
+            raise ValueError("resampler must be 'count', 'sum', or 'mean'.")
+        values = None
+        if resampler in ("sum", "mean"):
+            if field is None:
+                raise ValueError(
+                    "field must be defined when resampler is 'sum' or 'mean'."
+                )
+            values = self.data[field].values.astype(float)
+        groups = None
+        if group_by is not None:
+            groups = self.data[group_by].values
         # calulate 1D aggreagate
-        data = copy.copy(self.data)
-        data.set_index("time_min_date", inplace=True)
         data_resamp = Annotation._resample(
-            data,
+            self.data["time_min_date"],
             integration_time=integration_time,
             resampler=resampler,
             start_date=start_date,
             end_date=end_date,
+            values=values,
+            groups=groups,
         )
         data_resamp.set_index("datetime", inplace=True)
         if is_binary:
@@ -1368,7 +2326,11 @@ class Annotation:
         return data_resamp
 
     def calc_time_aggregate_2D(
-        self, integration_time="1H", resampler="count", is_binary=False
+        self,
+        integration_time="1H",
+        resampler="count",
+        is_binary=False,
+        field=None,
     ):
         """
         Calculate the 2D time aggregate of annotations.
@@ -1384,11 +2346,14 @@ class Annotation:
             documnentation here:https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
             The default is '1H'.
         resampler : str, optional
-            Defines method to combine aggregates. Currently only 'count' is
-            implemented. The default is 'count'.
+            Defines method to combine aggregates. Can be 'count', 'sum' or
+            'mean' (see calc_time_aggregate_1D). The default is 'count'.
         is_binary : bool, optional
             If set to True, calculates the aggregates in term on presence (1)
             or absence (0). The default is False.
+        field : str, optional
+            Name of the annotation field to aggregate when resampler is 'sum'
+            or 'mean'. The default is None.
 
         Returns
         -------
@@ -1399,7 +2364,10 @@ class Annotation:
         """
         # calulate 1D aggreagate
         data_resamp = self.calc_time_aggregate_1D(
-            integration_time=integration_time, is_binary=is_binary
+            integration_time=integration_time,
+            resampler=resampler,
+            is_binary=is_binary,
+            field=field,
         )
         data_resamp.reset_index(inplace=True)
         data_resamp["date"] = data_resamp["datetime"].dt.date
@@ -1411,7 +2379,7 @@ class Annotation:
             values="value",
             index="time",
             columns="date",
-            aggfunc=np.sum,
+            aggfunc="sum",
         )
         data_grid = data_grid.fillna(0)  # replaces NaNs by zeros
         if is_binary:
@@ -1437,24 +2405,42 @@ class Annotation:
         graph.add_data(self)
         graph.show()
 
-    def filter(self, query_str, inplace=False, **kwargs):
+    def filter(self, query_str=None, inplace=False, validate=True, **kwargs):
         """
         Filter data based on user-defined criteria.
 
-        Uses the pandas dataframe.query method to filter rows of the annotation
-        object (in annot.data datafrane). Filtering conditions are defined
-        as query string (query_str) indicating the fields and value conditions.
-        For example: query_str = 'label_class == "MW" & confidence >= 90'. See
-        documentation of pandas.DataFrame.query for more details.
+        Filtering conditions can be defined in three ways:
+            1- As keyword arguments with the field names, optionally followed
+               by two underscores and a comparison operator (eq, ne, lt, le,
+               gt, ge, in, notin). For example:
+               annot.filter(label_class='MW', confidence__ge=0.9).
+            2- As a ecosound Predicate object with pre-compiled conditions,
+               which can be reused to filter several annotation objects. For
+               example: annot.filter(Predicate(label_class='MW')).
+            3- As a query string (query_str) indicating the fields and value
+               conditions, evaluated with the pandas dataframe.query method.
+               For example: query_str = 'label_class == "MW" & confidence >= 90'.
+               See documentation of pandas.DataFrame.query for more details.
+               Variables used in the query string (e.g. @files_list) are
+               passed as keyword arguments.
+        Options 1 and 2 are evaluated directly as vectorized comparisons and
+        are faster than query strings.
 
         Parameters
         ----------
-        query_str : str
+        query_str : str or Predicate, optional
             query string defining annotations fiels and value conditions. For
             exemple: query_str = 'label_class == "MW" & confidence >= 90'.
+            Can also be a Predicate object. The default is None.
         inplace : bool, optional
             Whether to modify the DataFrame rather than creating a new one.
             The default is True.
+        validate : bool, optional
+            If set to False, the integrity of the filtered annotations is not
+            checked. The default is True.
+        **kwargs : optional
+            Filtering conditions if query_str is None, or variables used in
+            the query string.
 
         Returns
         -------
@@ -1462,80 +2448,150 @@ class Annotation:
             Updated with the filtered data.
 
         """
-        # unpack kwargs as separate variables
-        for key, val in kwargs.items():
-            exec(key + "=val")
-        # del key, val
+        data = self.data
+        if query_str is None:
+            query_str = Predicate(**kwargs)
         # filter
-        filt = self.data.query(query_str, inplace=inplace)
+        if isinstance(query_str, Predicate):
+            rows = np.flatnonzero(query_str.mask(data))
+            filt = data.iloc[rows]
+        else:
+            filt = data.query(query_str, local_dict=kwargs)
+            rows = None
+            if data.index.is_unique:
+                rows = data.index.get_indexer(filt.index)
+        # subset of annotations already checked
+        state = None
+        if rows is not None:
+            state = self._get_checked_state(rows)
         # create output obj
         if inplace:
+            self.data = filt
+            self._integrity = state
             out_object = None
         else:
             out_object = copy.copy(self)
             out_object.data = filt
-            out_object.check_integrity()
+            out_object._integrity = state
+            if validate:
+                out_object.check_integrity()
         return out_object
 
-    def merge_overlapped(self, time_tolerance_sec=None, inplace=False):
-
-        # add temporary time shift
-        if time_tolerance_sec:
-            self.data.time_min_offset = self.data.time_min_offset - time_tolerance_sec
-            self.data.time_max_offset = self.data.time_max_offset + time_tolerance_sec
-
-        # get index of overlapped annots
-        ovlp_idx_list = self._identify_ovlp_annot()
-
-        # merge
-        annot2 = Annotation()
-        for annot_idx in ovlp_idx_list:
-            annot_tmp = Annotation()
-            annot_tmp.data = self.data.iloc[[annot_idx[0]]]
-            if len(annot_idx)>1:
-                t_min = min(self.data.iloc[annot_idx].time_min_offset)
-                t_max = max(self.data.iloc[annot_idx].time_max_offset)
-                date_min = min(self.data.iloc[annot_idx].time_min_date)
-                date_max = max(self.data.iloc[annot_idx].time_max_date)
-                f_min = min(self.data.iloc[annot_idx].frequency_min)
-                f_max = max(self.data.iloc[annot_idx].frequency_max)
-                dur = t_max-t_min-(2*time_tolerance_sec)
-                # TO DO
-                # apply merge rules for given columns (e.g. SNR, confidence)
-                annot_tmp.data.loc[:,'time_min_offset'] = t_min
-                annot_tmp.data.loc[:,'time_max_offset'] = t_max
-                annot_tmp.data.loc[:,'duration'] = dur
-                annot_tmp.data.loc[:,'time_min_date'] = date_min
-                annot_tmp.data.loc[:,'time_max_date'] = date_max
-                annot_tmp.data.loc[:,'frequency_min'] = f_min
-                annot_tmp.data.loc[:,'frequency_max'] = f_max
-
-            # create new dataframe
-            annot2 = annot2+annot_tmp
-
-        # remove temporary time shift
-        if time_tolerance_sec:
-            annot2.data.time_min_offset = annot2.data.time_min_offset + time_tolerance_sec
-            annot2.data.time_max_offset = annot2.data.time_max_offset - time_tolerance_sec
+    def merge_overlapped(
+        self,
+        time_tolerance_sec=None,
+        merge_rules=None,
+        inplace=False,
+        validate=True,
+    ):
+        """
+        Merge overlapping annotations.
+
+        Annotations from the same audio file that overlap in time are merged
+        into a single annotation spanning all of them (in time and
+        frequency). Annotations are sorted by start time and grouped using
+        the running maximum of their end time, so merging scales linearly
+        with the number of annotations (after sorting). Unless specified in
+        merge_rules, all fields other than the time and frequency boundaries
+        are taken from the first annotation of each group.
+
+        Parameters
+        ----------
+        time_tolerance_sec : float, optional
+            Annotations are extended by time_tolerance_sec seconds on both
+            sides before being grouped, so annotations separated by less than
+            2 * time_tolerance_sec seconds are also merged. The time
+            boundaries of the merged annotations are not extended. The
+            default is None.
+        merge_rules : dict, optional
+            Dictionary defining how to calculate the value of a field for the
+            merged annotations. Keys are the field names and values are any
+            reduction accepted by pandas' groupby aggregate (e.g. 'max',
+            'mean', 'first', 'last', 'count' or a function). For instance,
+            merge_rules={'confidence': 'max', 'snr': 'mean'}. The default is
+            None.
+        inplace : bool, optional
+            If set to True, updates the current object with the merged
+            annotations. The default is False.
+        validate : bool, optional
+            If set to False, the integrity of the merged annotations is not
+            checked. The default is True.
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Annotation object with merged annotations. None if inplace is
+            True.
+
+        """
+        data = self.data
+        # group of overlapping annotations each annotation belongs to. Groups
+        # are the connected components of the time overlaps, found directly
+        # with a sweep on the sorted start times (a self overlap_join would
+        # list every pair of overlapping annotations and still need the
+        # components to be found from the pairs).
+        group_ids = self._cluster_ovlp_annot(time_tolerance_sec=time_tolerance_sec)
+        # first annotation of each group
+        _, first_idx, group_size = np.unique(
+            group_ids, return_index=True, return_counts=True
+        )
+        merged = data.iloc[first_idx].reset_index(drop=True)
+        # boundaries of each group and user-defined merge rules
+        rules = {
+            "time_min_offset": ("time_min_offset", "min"),
+            "time_max_offset": ("time_max_offset", "max"),
+            "time_min_date": ("time_min_date", "min"),
+            "time_max_date": ("time_max_date", "max"),
+            "frequency_min": ("frequency_min", "min"),
+            "frequency_max": ("frequency_max", "max"),
+        }
+        bound_fields = list(rules.keys())
+        if merge_rules is not None:
+            for field, rule in merge_rules.items():
+                if field not in data.columns:
+                    raise ValueError(
+                        "Field " + str(field) + " from merge_rules not found."
+                    )
+                rules["_rule_" + str(field)] = (field, rule)
+        merged_values = data.groupby(group_ids).agg(**rules)
+        # boundaries only need updating for groups with several annotations
+        is_merged = group_size > 1
+        for field in bound_fields:
+            merged.loc[is_merged, field] = merged_values[field].values[is_merged]
+        merged.loc[is_merged, "duration"] = (
+            merged_values["time_max_offset"].values[is_merged]
+            - merged_values["time_min_offset"].values[is_merged]
+        )
+        if merge_rules is not None:
+            for field in merge_rules.keys():
+                merged[field] = merged_values["_rule_" + str(field)].values
+        if self.compact_dtypes:
+            merged = Annotation._apply_dtypes(merged, compact_dtypes=True)
 
         if inplace:
-            self.data = annot2.data
-            self.check_integrity()
+            self.data = merged
+            if validate:
+                self.check_integrity()
             out_object = None
         else:
             out_object = copy.copy(self)
-            out_object.data = annot2.data
-            out_object.check_integrity()
+            out_object.data = merged
+            if validate:
+                out_object.check_integrity()
         return out_object
 
-    def update_audio_dir(self, new_data_dir, verbose=False):
+    def update_audio_dir(
+        self, new_data_dir, verbose=False, cache_file=None, n_jobs=None
+    ):
         """
         Update path of audio files
 
         Recursively finds the path of the annotations audio files in the folder
         provided in new_data_dir and automatically updates the annotation field
         "audio_file_dir". It is useful when the location of the audio data has
-        moved or if using annotations on a different computer.
+        moved or if using annotations on a different computer. Audio files are
+        found by name (name and extension) using an index of all the files in
+        new_data_dir (see ecosound.core.tools.index_files).
 
         Parameters
         ----------
@@ -1544,57 +2600,63 @@ class Annotation:
         verbose : bool
             Printprocess logs in command window if set to True. The defaut is
             False.
+        cache_file : str, optional
+            Path of the json file where the content of the folders in
+            new_data_dir is saved, so only folders that have changed are
+            listed again the next time. If None, no cache is used. The default
+            is None.
+        n_jobs : int, optional
+            Number of threads used to scan the subfolders of new_data_dir. If
+            None, uses the default of concurrent.futures.ThreadPoolExecutor.
+            The default is None.
 
         Returns
         -------
         None.
 
         """
-        # list name of all audio files in dataset
-        dataset_files_list = set(
-            self.data["audio_file_dir"]
-            + os.path.sep
-            + self.data["audio_file_name"]
-            + self.data["audio_file_extension"]
+        # name of the audio file of each annotation
+        dataset_files = pd.Series(
+            Annotation._join_paths(
+                "",
+                self.data["audio_file_name"],
+                self.data["audio_file_extension"],
+            ),
+            index=self.data.index,
         )
+        if verbose:
+            print(dataset_files.nunique(), " audio files.")
 
-        # list extension of all audio files in dataset
-        dataset_ext_list = set(
-            [os.path.splitext(file)[1] for file in dataset_files_list]
+        # index all audio files in new folder (only target file extensions)
+        extensions = [
+            str(ext) for ext in self.data["audio_file_extension"].unique()
+        ]
+        new_dir_files = ecosound.core.tools.index_files(
+            new_data_dir,
+            suffixes=extensions,
+            cache_file=cache_file,
+            n_jobs=n_jobs,
         )
-        if verbose:
-            print(len(dataset_files_list), " audio files.")
-
-        # list all audio files in new folder (only for the target file extensions)
-        new_dir_files_list = []
-        for ext in dataset_ext_list:
-            new_dir_files_list = (
-                new_dir_files_list
-                + ecosound.core.tools.list_files(
-                    new_data_dir, ext, recursive=True
-                )
+        new_dirs = {
+            file: os.path.split(path)[0]
+            for file, path in new_dir_files.items()
+        }
+
+        # find each file in new data folder
+        audio_file_dir = dataset_files.map(new_dirs)
+        is_found = audio_file_dir.notna().values
+        self.data["audio_file_dir"] = np.where(
+            is_found,
+            audio_file_dir,
+            self.data["audio_file_dir"].astype(object),
+        )
+        if self.compact_dtypes:
+            self.data["audio_file_dir"] = self.data["audio_file_dir"].astype(
+                "category"
             )
+        self.invalidate_cache()
 
-        # go through each file in dataset and try to find in in new data folder
-        missing_files_list = []
-        for file in dataset_files_list:
-            # if verbose:
-            # print(file)
-            res = [
-                idx
-                for idx, new_dir_file in enumerate(new_dir_files_list)
-                if re.search(os.path.split(file)[1], new_dir_file)
-            ]
-            if len(res) == 0:
-                missing_files_list.append(file)
-            else:
-                new_path = os.path.split(new_dir_files_list[res[0]])[0]
-                self.data.loc[
-                    self.data["audio_file_name"]
-                    == os.path.splitext(os.path.split(file)[1])[0],
-                    "audio_file_dir",
-                ] = new_path
-
+        missing_files_list = list(dataset_files[~is_found].unique())
         if len(missing_files_list) > 0:
             warnings.warn(
                 str(len(missing_files_list)) + " files could not be found."
@@ -1783,6 +2845,121 @@ class Annotation:
                 except Exception as error:
                     print("An error occurred:", type(error).__name__, "–", error)
 
+    def get_by_file(self, audio_file_name):
+        """
+        Get annotations from one or several audio files.
+
+        Uses an index of the annotations per audio file, built the first time
+        it is needed, so each lookup only costs the number of annotations
+        returned. If the data were modified in place, invalidate_cache must be
+        called first.
+
+        Parameters
+        ----------
+        audio_file_name : str or list of str
+            Name(s) of the audio file(s) (without extension).
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Annotation object with the annotations from these audio files.
+
+        """
+        return self._get_by_field("audio_file_name", audio_file_name)
+
+    def get_by_deployment(self, deployment_ID):
+        """
+        Get annotations from one or several deployments.
+
+        Uses an index of the annotations per deployment, built the first time
+        it is needed, so each lookup only costs the number of annotations
+        returned. If the data were modified in place, invalidate_cache must be
+        called first.
+
+        Parameters
+        ----------
+        deployment_ID : str or list of str
+            Deployment ID(s).
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Annotation object with the annotations from these deployments.
+
+        """
+        return self._get_by_field("deployment_ID", deployment_ID)
+
+    def time_range(self, date_min=None, date_max=None):
+        """
+        Get annotations starting within a time period.
+
+        Uses the annotations sorted by start date (built the first time it is
+        needed), so each lookup only costs the number of annotations returned.
+        If the data were modified in place, invalidate_cache must be called
+        first.
+
+        Parameters
+        ----------
+        date_min : str or datetime, optional
+            Annotations must have a start date (time_min_date) >= date_min.
+            If None, there is no lower limit. The default is None.
+        date_max : str or datetime, optional
+            Annotations must have a start date (time_min_date) < date_max.
+            If None, there is no upper limit. The default is None.
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Annotation object with the annotations from that time period.
+
+        """
+        dates, order = self._get_index("time_min_date")
+        start = 0
+        stop = np.count_nonzero(~np.isnat(dates))
+        if date_min is not None:
+            start = np.searchsorted(
+                dates[:stop], np.datetime64(pd.Timestamp(date_min)), side="left"
+            )
+        if date_max is not None:
+            stop = np.searchsorted(
+                dates[:stop], np.datetime64(pd.Timestamp(date_max)), side="left"
+            )
+        return self._get_rows(np.sort(order[start:stop]))
+
+    def _get_by_field(self, field, values):
+        """Return annotations with the given values of field (indexed)."""
+        index = self._get_index(field)
+        if type(values) is not list:
+            values = [values]
+        rows = [index[value] for value in values if value in index]
+        if len(rows) > 0:
+            rows = np.sort(np.concatenate(rows))
+        else:
+            rows = np.array([], dtype=int)
+        return self._get_rows(rows)
+
+    def _get_index(self, field):
+        """Return index of the annotations on field, built if needed."""
+        data = self.data
+        if field in self._indexes:
+            return self._indexes[field]
+        if field == "time_min_date":  # start dates in ascending order
+            dates = data["time_min_date"].values.astype("datetime64[ns]")
+            order = np.argsort(dates, kind="stable")
+            index = (dates[order], order)
+        else:  # rows of each value of field
+            index = data.groupby(field, sort=False, observed=True).indices
+        self._indexes[field] = index
+        return index
+
+    def _get_rows(self, rows):
+        """Return Annotation object with the given rows of data."""
+        out_object = copy.copy(self)
+        out_object.data = self.data.iloc[rows].reset_index(drop=True)
+        # subset of annotations already checked
+        out_object._integrity = self._get_checked_state(rows)
+        return out_object
+
     def get_labels_class(self):
         """
         Get all the unique class labels of the annotations.
@@ -1859,77 +3036,243 @@ class Annotation:
         summary["Total"] = summary.sum(axis=1)
         return summary
 
-    def _identify_ovlp_annot(self):
-        stack = []
+    def _cluster_ovlp_annot(self, time_tolerance_sec=None):
+        """
+        Identify groups of annotations overlapping in time.
+
+        Annotations of each audio file are sorted by start time. A new group
+        starts each time an annotation starts after the end of all previous
+        annotations of the current group (running maximum of the end times).
+
+        Parameters
+        ----------
+        time_tolerance_sec : float, optional
+            Annotations are extended by time_tolerance_sec seconds on both
+            sides, so annotations separated by less than
+            2 * time_tolerance_sec seconds are put in the same group. The
+            default is None.
+
+        Returns
+        -------
+        group_ids : numpy array
+            Group number of each annotation (rows of self.data). Groups are
+            numbered by audio file, then by start time.
+
+        """
         data = self.data
-        files_list = list(set(data.audio_file_name))
-        for file in files_list:  # for each audio file
-            file_data = data.query('audio_file_name==@file')  # data for a single file
-            while len(file_data) > 0:
-                t1 = file_data.iloc[0].time_min_offset
-                t2 = file_data.iloc[0].time_max_offset
-                # stack index + update dataframe
-                tmp = []
-                index_id = file_data.iloc[0].name
-                tmp.append(index_id)
-                file_data = file_data.drop([index_id], axis=0)  # delete annot alreday stacked in tmp
-                while True:
-                    # find other annot overlaping with curent annot
-                    ovlp = file_data[
-                        (
-                            (file_data.time_min_offset <= t1)
-                            & (file_data.time_max_offset >= t2)
-                        )
-                        | (  # 1- annot inside detec
-                            (file_data.time_min_offset >= t1)
-                            & (file_data.time_max_offset <= t2)
-                        )
-                        | (  # 2- detec inside annot
-                            (file_data.time_min_offset < t1)
-                            & (file_data.time_max_offset < t2)
-                            & (file_data.time_max_offset > t1)
-                        )
-                        | (  # 3- only the end of the detec overlaps with annot
-                            (file_data.time_min_offset > t1)
-                            & (file_data.time_min_offset < t2)
-                            & (file_data.time_max_offset > t2)
-                        )  # 4- only the begining of the detec overlaps with annot
-                        ]
-                    if len(ovlp) == 0:  # no overlap
-                        stack.append(tmp)
-                        break
-                    elif len(ovlp) > 0:  # 1 of more overlaps
-                        index_ids = list(ovlp.index.values)
-                        for index_id in index_ids:
-                            tmp.append(index_id)
-                            t1 = min([t1, ovlp.time_min_offset.values[0]])
-                            t2 = max([t2, ovlp.time_max_offset.values[0]])
-                            file_data = file_data.drop([index_id], axis=0)  # delete annot alreday stacked in tmp
-        #print('done')
-        # Sanity check
-        annot_count = sum([len(ovlp) for ovlp in stack])
-        if annot_count != len(data):
-            print('overlapped annotation identified do not add up to the total number of annotations')
-        return stack
+        if time_tolerance_sec is None:
+            time_tolerance_sec = 0
+        file_codes = pd.factorize(data["audio_file_name"], use_na_sentinel=False)[0]
+        t_min = data["time_min_offset"].values.astype(float) - time_tolerance_sec
+        t_max = data["time_max_offset"].values.astype(float) + time_tolerance_sec
+        order = np.lexsort((t_min, file_codes))
+        t_min, t_max, file_codes = t_min[order], t_max[order], file_codes[order]
+        # latest end time of all previous annotations from the same file
+        running_max = pd.Series(t_max).groupby(file_codes).cummax().values
+        prev_max = np.r_[np.nan, running_max[:-1]]
+        is_new_file = np.r_[True, file_codes[1:] != file_codes[:-1]]
+        is_new_group = is_new_file | ~(t_min < prev_max)
+        group_ids = np.empty(len(data), dtype=int)
+        group_ids[order] = np.cumsum(is_new_group) - 1
+        return group_ids
+
+    @staticmethod
+    def _overlap_pairs(data1, data2, freq_ovp=True, filter_deploymentID=True):
+        """
+        Find pairs of annotations overlapping in time and/or frequency.
+
+        Annotations are grouped by deployment ID and audio file name, then
+        sorted by start time. Overlapping pairs are either an annotation from
+        data1 starting within an annotation from data2, or the reverse, so
+        both cases are found with binary searches on the sorted start times
+        and only pairs overlapping in time are tested (sort-and-sweep). Annotations touching each other (e.g. end of one
+        equal to the start of the other) are not considered overlapping,
+        unless one is fully inside the other.
+
+        Parameters
+        ----------
+        data1 : pandas DataFrame
+            First annotation table (Annotation.data).
+        data2 : pandas DataFrame
+            Second annotation table (Annotation.data).
+        freq_ovp : bool, optional
+            If set to True, annotations must also overlap in frequency. The
+            default is True.
+        filter_deploymentID : bool, optional
+            If set to False, only the audio file name is used to group
+            annotations together. The default is True.
+
+        Returns
+        -------
+        idx1 : numpy array
+            Row positions in data1 of the overlapping pairs.
+        idx2 : numpy array
+            Row positions in data2 of the overlapping pairs.
+        Pairs are sorted by idx2 then idx1.
+
+        """
+        # integer code of the file (and deployment) of each annotation
+        fields = ["audio_file_name"]
+        if filter_deploymentID:
+            fields = ["deployment_ID", "audio_file_name"]
+        keys = pd.concat([data1[fields], data2[fields]], ignore_index=True)
+        codes = keys.groupby(fields, sort=False, dropna=True).ngroup().values
+        codes1, codes2 = codes[: len(data1)], codes[len(data1):]
+        tmin1 = data1["time_min_offset"].values.astype(float)
+        tmax1 = data1["time_max_offset"].values.astype(float)
+        tmin2 = data2["time_min_offset"].values.astype(float)
+        tmax2 = data2["time_max_offset"].values.astype(float)
+        start1, stop1 = np.fmin(tmin1, tmax1), np.fmax(tmin1, tmax1)
+        start2, stop2 = np.fmin(tmin2, tmax2), np.fmax(tmin2, tmax2)
+        idx1_list = []
+        idx2_list = []
+        # annotations without times can't overlap
+        codes1 = np.where(np.isnan(start1), -1, codes1)
+        codes2 = np.where(np.isnan(start2), -1, codes2)
+        rows1 = pd.Series(np.arange(len(data1))).groupby(codes1).indices
+        rows2 = pd.Series(np.arange(len(data2))).groupby(codes2).indices
+        for code, pos2 in rows2.items():
+            if (code < 0) or (code not in rows1):
+                continue
+            pos1 = rows1[code]
+            pos1 = pos1[np.argsort(start1[pos1], kind="stable")]
+            pos2 = pos2[np.argsort(start2[pos2], kind="stable")]
+            sorted_start1 = start1[pos1]
+            sorted_start2 = start2[pos2]
+            # a) annotations from data1 starting within each annotation of
+            # data2: start2 <= start1 <= stop2
+            win_start = np.searchsorted(sorted_start1, start2[pos2], "left")
+            win_stop = np.searchsorted(sorted_start1, stop2[pos2], "right")
+            cand2, cand1 = Annotation._expand_windows(
+                pos2, pos1, win_start, win_stop
+            )
+            idx1_list.append(cand1)
+            idx2_list.append(cand2)
+            # b) annotations from data2 starting within each annotation of
+            # data1: start1 < start2 <= stop1
+            win_start = np.searchsorted(sorted_start2, start1[pos1], "right")
+            win_stop = np.searchsorted(sorted_start2, stop1[pos1], "right")
+            cand1, cand2 = Annotation._expand_windows(
+                pos1, pos2, win_start, win_stop
+            )
+            idx1_list.append(cand1)
+            idx2_list.append(cand2)
+        if len(idx1_list) > 0:
+            idx1 = np.concatenate(idx1_list)
+            idx2 = np.concatenate(idx2_list)
+        else:
+            idx1 = np.array([], dtype=int)
+            idx2 = np.array([], dtype=int)
+        # exact overlap test on candidates
+        mask = Annotation._is_overlapping(
+            tmin1[idx1], tmax1[idx1], tmin2[idx2], tmax2[idx2]
+        )
+        if freq_ovp:
+            mask &= Annotation._is_overlapping(
+                data1["frequency_min"].values[idx1].astype(float),
+                data1["frequency_max"].values[idx1].astype(float),
+                data2["frequency_min"].values[idx2].astype(float),
+                data2["frequency_max"].values[idx2].astype(float),
+            )
+        idx1, idx2 = idx1[mask], idx2[mask]
+        order = np.lexsort((idx1, idx2))
+        return idx1[order], idx2[order]
+
+    @staticmethod
+    def _expand_windows(pos, sorted_pos, win_start, win_stop):
+        """
+        List pairs of rows from windows of sorted rows.
+
+        Parameters
+        ----------
+        pos : numpy array
+            Row positions of the first table.
+        sorted_pos : numpy array
+            Row positions of the second table (sorted).
+        win_start : numpy array
+            For each row of pos, index in sorted_pos of the first row of the
+            window.
+        win_stop : numpy array
+            For each row of pos, index in sorted_pos after the last row of the
+            window.
+
+        Returns
+        -------
+        pairs_pos : numpy array
+            Row positions from pos of each pair.
+        pairs_sorted_pos : numpy array
+            Row positions from sorted_pos of each pair.
+
+        """
+        n_rows = np.clip(win_stop - win_start, 0, None)
+        offsets = np.arange(n_rows.sum()) - np.repeat(
+            np.cumsum(n_rows) - n_rows, n_rows
+        )
+        pairs_pos = np.repeat(pos, n_rows)
+        pairs_sorted_pos = sorted_pos[np.repeat(win_start, n_rows) + offsets]
+        return pairs_pos, pairs_sorted_pos
+
+    @staticmethod
+    def _is_overlapping(min1, max1, min2, max2):
+        """Return True where intervals [min1, max1] overlap [min2, max2]."""
+        return (
+            ((min1 <= min2) & (max1 >= max2))  # 1- interval 2 inside 1
+            | ((min1 >= min2) & (max1 <= max2))  # 2- interval 1 inside 2
+            | ((min1 < max2) & (max1 > min2))  # 3- partial overlap
+        )
 
     @staticmethod
     def _resample(
-        data,
+        dates,
         integration_time="1H",
         resampler="count",
         start_date=None,
         end_date=None,
+        values=None,
+        groups=None,
     ):
+        """
+        Aggregate values over time bins.
+
+        Bins start at midnight of the first date and are integration_time
+        long. For fixed integration times, bins are calculated from the
+        dates in nanoseconds and values are aggregated with numpy.bincount.
+        Other integration times (e.g. months) use pandas' resample.
 
+        Parameters
+        ----------
+        dates : pandas Series
+            Date of each annotation (datetime64).
+        integration_time : str, optional
+            Integration time (pandas offset alias). The default is "1H".
+        resampler : str, optional
+            'count', 'sum' or 'mean'. The default is "count".
+        start_date : None, str, optional
+            Start date of the aggregate. The default is None.
+        end_date : None, str, optional
+            End date of the aggregate. The default is None.
+        values : numpy array, optional
+            Values to aggregate for 'sum' and 'mean'. The default is None.
+        groups : numpy array, optional
+            Group of each annotation. The default is None.
+
+        Returns
+        -------
+        data_out : pandas DataFrame
+            DataFrame with a 'datetime' column and a 'value' column (or one
+            column per group).
+
+        """
+        dates = pd.Series(dates).values.astype("datetime64[ns]")
         # define start time of the aggregate
         if start_date is None:
-            start_date = min(data.index)
+            start_date = pd.Timestamp(np.nanmin(dates))
         elif type(start_date) is str:
             start_date = pd.Timestamp(start_date)
 
         # define end time of the aggregate
         if end_date is None:
-            end_date = max(data.index)
+            end_date = pd.Timestamp(np.nanmax(dates))
         elif type(end_date) is str:
             end_date = pd.Timestamp(end_date)
 
@@ -1943,26 +3286,82 @@ class Annotation:
                 freq=integration_time,
             )
         )
-        if resampler == "count":
-            # Lmean = data.resample(integration_time, loffset=None, label='left').apply(count)
-            data_new = data.resample(
-                integration_time,
-                #loffset=None,
-                origin="start_day",
-                label="left",
-            ).count()
-
-        data_out = pd.DataFrame(
-            {"datetime": data_new.index, "value": data_new["uuid"]}
-        )
-        data_out = data_out.reindex(t_index).fillna(0)
-        data_out["datetime"] = data_out.index
-        data_out.reset_index(drop=True, inplace=True)
+        # only keep annotations with a date
+        is_valid = ~np.isnat(dates)
+        dates = dates[is_valid]
+        if values is None:
+            values = np.ones(len(dates))
+        else:
+            values = values[is_valid]
+        if groups is None:
+            group_codes = np.zeros(len(dates), dtype=int)
+            group_names = ["value"]
+        else:
+            group_codes, group_names = pd.factorize(
+                groups[is_valid], sort=True, use_na_sentinel=False
+            )
+            group_names = list(group_names)
+        freq = pd.tseries.frequencies.to_offset(integration_time)
+        if isinstance(freq, pd.offsets.Tick) and (len(dates) > 0):
+            # time bins of fixed width starting at midnight of the first day
+            dates_ns = dates.view("int64")
+            day_ns = 86400 * 10**9
+            origin = (dates_ns.min() // day_ns) * day_ns
+            width = freq.nanos
+            bins = (dates_ns - origin) // width
+            n_bins = bins.max() + 1
+            n_groups = len(group_names)
+            idx = group_codes * n_bins + bins
+            is_nan = np.isnan(values)
+            counts = np.bincount(
+                idx[~is_nan], minlength=n_groups * n_bins
+            ).reshape(n_groups, n_bins)
+            if resampler == "count":
+                aggr = np.bincount(idx, minlength=n_groups * n_bins)
+                aggr = aggr.reshape(n_groups, n_bins).astype(float)
+            else:
+                aggr = np.bincount(
+                    idx[~is_nan],
+                    weights=values[~is_nan],
+                    minlength=n_groups * n_bins,
+                ).reshape(n_groups, n_bins)
+                if resampler == "mean":
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        aggr = aggr / counts
+            # values for each date of the output
+            offsets = t_index.values.view("int64") - origin
+            out_bins = offsets // width
+            is_in = (
+                (offsets % width == 0) & (out_bins >= 0) & (out_bins < n_bins)
+            )
+            data_out = pd.DataFrame({"datetime": t_index})
+            for group_idx, group_name in enumerate(group_names):
+                group_values = np.zeros(len(t_index))
+                group_values[is_in] = aggr[group_idx, out_bins[is_in]]
+                data_out[group_name] = np.nan_to_num(group_values, nan=0)
+        else:
+            data = pd.DataFrame(
+                {"value": values, "group": group_codes}, index=dates
+            )
+            data_out = pd.DataFrame({"datetime": t_index})
+            for group_idx, group_name in enumerate(group_names):
+                data_new = (
+                    data[data["group"].values == group_idx]["value"]
+                    .resample(integration_time, origin="start_day", label="left")
+                    .agg(resampler)
+                )
+                data_out[group_name] = (
+                    data_new.reindex(t_index).fillna(0).values
+                )
         return data_out
 
     def _enforce_dtypes(self):
-        self.data = self.data.astype(
-            {
+        self.data = Annotation._apply_dtypes(self.data, self.compact_dtypes)
+
+    @staticmethod
+    def _apply_dtypes(data, compact_dtypes=False):
+        """Return data with the data types of each annotation field."""
+        dtypes = {
                 "uuid": "str",
                 "from_detector": "bool",  # True, False
                 "software_name": "str",
@@ -1999,40 +3398,326 @@ class Annotation:
                 "label_subclass": "str",
                 "confidence": "float",
             }
+        if compact_dtypes:
+            dtypes.update(Annotation._compact_schema)
+            data = data.copy(deep=False)
+            for field, dtype in Annotation._compact_schema.items():
+                # same str conversion as default schema (e.g. NaN -> 'nan')
+                if (dtype == "category") and not Annotation._is_str_category(
+                    data[field]
+                ):
+                    data[field] = data[field].astype(str)
+        return data.astype(dtypes)
+
+    @staticmethod
+    def _is_str_category(values):
+        """Return True if values are categorical with str categories only."""
+        return (
+            isinstance(values.dtype, pd.CategoricalDtype)
+            and (values.cat.categories.inferred_type in ("string", "empty"))
+            and not values.isna().any()
         )
 
     @staticmethod
     @ecosound.core.decorators.listinput
-    def _import_csv_files(files):
-        """Import one or several text files with header to a Panda datafrane."""
+    def _import_csv_files(
+        files, n_jobs=None, engine=None, dtype=None, errors="raise"
+    ):
+        """
+        Import one or several text files with header to a Panda datafrane.
+
+        Files are read in parallel on a thread pool and concatenated once all
+        files are loaded. The pyarrow CSV engine is used if pyarrow is
+        installed. Files that can't be parsed by the pyarrow engine (e.g.
+        PAMlab files with rows longer than the header) are read with the
+        default pandas engine.
+
+        Parameters
+        ----------
+        files : str, list
+            Path of the text file(s) to import.
+        n_jobs : int, optional
+            Number of threads used to read the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
+        engine : str, optional
+            Parser engine of pandas.read_csv ('c', 'python' or 'pyarrow'). If
+            None, uses 'pyarrow' if available, 'c' otherwise. The default is
+            None.
+        dtype : dict, optional
+            Data type of the columns, passed to pandas.read_csv. The default is
+            None.
+        errors : str, optional
+            If 'raise', an error is raised if a file can't be read. If
+            'warn', files that can't be read are skipped and the error of each
+            file is reported in a warning (an error is still raised if none of
+            the files can be read). The default is 'raise'.
+
+        Returns
+        -------
+        data : pandas DataFrame
+            Data from all files.
+
+        """
         assert type(files) in (
             str,
             list,
         ), "Input must be of type str (single \
             file) or list (multiple files)"
-        # Import all files to a dataframe
-        for idx, file in enumerate(files):
-            # Extract header first due to formating issues in PAMlab files
-            header = pd.read_csv(file, delimiter="\t", header=None, nrows=1)
-            headerLength = header.shape[1]
-            # Get all data and only keep values correpsonding to header labels
-            # tmp = pd.read_csv(file,
-            #                   delimiter='\t',
-            #                   header=None,
-            #                   #header=True,
-            #                   #skiprows=1,
-            #                   na_values=None,
-            #                   )
-            # tmp = tmp.iloc[:, 0:headerLength]
-            # Put header back
-            # tmp = tmp.set_axis(list(header.values[0]), axis=1, inplace=False)
-            tmp = pd.read_csv(file, delimiter="\t", na_values=None)
-            if idx == 0:
-                data = tmp
+        if errors not in ("raise", "warn"):
+            raise ValueError("errors must be 'raise' or 'warn'.")
+        if engine is None:
+            if importlib.util.find_spec("pyarrow") is None:
+                engine = "c"
             else:
-                data = pd.concat([data, tmp], ignore_index=True, sort=False)
+                engine = "pyarrow"
+
+        def read_file(file):
+            try:
+                table = pd.read_csv(
+                    file,
+                    delimiter="\t",
+                    na_values=None,
+                    dtype=dtype,
+                    engine=engine,
+                )
+                # missing strings as NaN like the other engines
+                for col in table.columns[table.dtypes == object]:
+                    table[col] = table[col].where(table[col].notna(), np.nan)
+                return table
+            except pd.errors.ParserError:  # not supported by pyarrow engine
+                if engine == "c":
+                    raise
+                return pd.read_csv(
+                    file, delimiter="\t", na_values=None, dtype=dtype
+                )
+
+        # Import all files
+        tables = []
+        files_errors = []
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        with executor:
+            futures = [executor.submit(read_file, file) for file in files]
+            for file, future in zip(files, futures):
+                try:
+                    tables.append(future.result())
+                except Exception as error:
+                    if errors == "raise":
+                        raise
+                    files_errors.append((file, error))
+        if len(files_errors) > 0:
+            message = "\n".join(
+                [str(file) + ": " + str(err) for file, err in files_errors]
+            )
+            if len(tables) == 0:
+                raise ValueError("None of the files could be imported:\n" + message)
+            warnings.warn(
+                str(len(files_errors))
+                + " file(s) could not be imported:\n"
+                + message
+            )
+        if len(tables) == 0:
+            data = pd.DataFrame()
+        elif len(tables) == 1:
+            data = tables[0]
+        else:
+            data = pd.concat(tables, ignore_index=True, sort=False)
         return data
 
+    @staticmethod
+    def _join_paths(dirs, names, extensions):
+        """
+        Join directory, name and extension of audio files into paths.
+
+        Each unique combination of directory, name and extension is only
+        joined once and results are mapped back to all rows. Missing values
+        (e.g. annotations without audio file name) are replaced by empty
+        strings.
+
+        Parameters
+        ----------
+        dirs : pandas Series or str
+            Directory of the audio file of each annotation (or same directory
+            for all annotations).
+        names : pandas Series
+            Name of the audio file of each annotation.
+        extensions : pandas Series
+            Extension of the audio file of each annotation.
+
+        Returns
+        -------
+        paths : numpy array
+            Path of the audio file of each annotation.
+
+        """
+        if type(dirs) is str:
+            dirs = [dirs] * len(names)
+        columns = [
+            np.array(values, dtype=object)  # copy, so data are not modified
+            for values in (dirs, names, extensions)
+        ]
+        for values in columns:
+            values[pd.isna(values)] = ""
+        # single integer key for each combination of dir, name and extension
+        keys = np.zeros(len(names), dtype=np.int64)
+        for values in columns:
+            codes, uniques = pd.factorize(values, use_na_sentinel=False)
+            keys = keys * len(uniques) + codes
+        _, first_rows, codes = np.unique(
+            keys, return_index=True, return_inverse=True
+        )
+        unique_paths = np.array(
+            [
+                os.path.join(x, y) + z
+                for x, y, z in zip(*[values[first_rows] for values in columns])
+            ],
+            dtype=object,
+        )
+        return unique_paths[codes]
+
+    @staticmethod
+    def _group_by_audio_file(data, single_file=False):
+        """
+        Group annotations by audio file for writing output files.
+
+        Parameters
+        ----------
+        data : pandas DataFrame
+            Annotation data with a default index.
+        single_file : bool, optional
+            If True, all annotations are in the same group. The default is
+            False.
+
+        Returns
+        -------
+        codes : numpy array
+            Index of the group of each annotation (sorted by audio file name).
+            -1 for annotations without audio file name, which are not written.
+        first_rows : numpy array
+            Index of the first annotation of each group.
+
+        """
+        if single_file:
+            return np.zeros(len(data), dtype=int), np.array([0])
+        codes, _ = pd.factorize(data["audio_file_name"], sort=True)
+        valid_rows = np.flatnonzero(codes >= 0)
+        _, first_rows = np.unique(codes[valid_rows], return_index=True)
+        return codes, valid_rows[first_rows]
+
+    @staticmethod
+    def _fill_missing(table):
+        """Replace missing values of an output table by 0."""
+        for col in table.columns:
+            if isinstance(table[col].dtype, pd.CategoricalDtype):
+                table[col] = table[col].astype(object)
+        return table.fillna(0)
+
+    @staticmethod
+    def _write_tables(table, columns, codes, files, n_jobs=None):
+        """
+        Write groups of rows of a table to tab-separated text files.
+
+        Rows of each group are selected from precomputed indices and the
+        files are written in parallel.
+
+        Parameters
+        ----------
+        table : pandas DataFrame
+            Table with all the rows to write.
+        columns : list of str
+            Columns to write (in that order).
+        codes : numpy array
+            Index of the output file of each row (-1 if the row is not
+            written).
+        files : list of str
+            Path of each output file.
+        n_jobs : int, optional
+            Number of threads used to write the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
+
+        Returns
+        -------
+        None.
+
+        """
+        # rows sorted by file (keeping their order within each file)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(files) + 1))
+        # format all rows at once
+        lines = table.to_csv(
+            sep="\t",
+            header=False,
+            columns=columns,
+            index=False,
+            lineterminator="\n",
+        ).split("\n")[:-1]
+        if len(lines) != len(table):
+            # text with line breaks => write each file with pandas
+            lines = None
+        header = table.iloc[:0].to_csv(sep="\t", columns=columns, index=False)
+
+        def write_file(idx):
+            rows = order[bounds[idx] : bounds[idx + 1]]
+            if lines is None:
+                table.iloc[rows].to_csv(
+                    files[idx],
+                    sep="\t",
+                    encoding="utf-8",
+                    header=True,
+                    columns=columns,
+                    index=False,
+                )
+                return
+            with open(files[idx], "w", encoding="utf-8", newline="") as f:
+                f.write(header)
+                f.write("".join([lines[row] + os.linesep for row in rows]))
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        with executor:
+            # list() to raise errors from the threads
+            list(executor.map(write_file, range(len(files))))
+
+    @staticmethod
+    def _split_paths(paths):
+        """
+        Split paths of audio files into directory, name and extension.
+
+        Each unique path is only split once and results are mapped back to
+        all rows using the codes of the unique paths.
+
+        Parameters
+        ----------
+        paths : pandas Series
+            Path of the audio file of each annotation.
+
+        Returns
+        -------
+        split_paths : pandas DataFrame
+            DataFrame with the same index as paths and columns
+            'audio_file_dir', 'audio_file_name', and 'audio_file_extension'.
+
+        """
+        codes, unique_paths = pd.factorize(paths, use_na_sentinel=False)
+        n_paths = len(unique_paths)
+        dirs = np.empty(n_paths, dtype=object)
+        names = np.empty(n_paths, dtype=object)
+        extensions = np.empty(n_paths, dtype=object)
+        for idx, path in enumerate(unique_paths):
+            dirs[idx] = os.path.dirname(path)
+            names[idx], extensions[idx] = os.path.splitext(
+                os.path.basename(path)
+            )
+        split_paths = pd.DataFrame(
+            {
+                "audio_file_dir": dirs[codes],
+                "audio_file_name": names[codes],
+                "audio_file_extension": extensions[codes],
+            },
+            index=paths.index,
+        )
+        return split_paths
+
     @staticmethod
     def _make_list_from_input(files, file_ext, verbose=True):
         if type(files) is str:
@@ -2074,19 +3759,66 @@ class Annotation:
             F = "nan"
         return F
 
+    @classmethod
+    def concat(cls, annotations):
+        """
+        Concatenate several annotation objects.
+
+        Data from all annotation objects are concatenated in one go and data
+        types are only enforced once, which is much faster than adding
+        annotation objects one by one.
+
+        Parameters
+        ----------
+        annotations : list of ecosound.annotation.Annotation objects
+            Annotation objects to concatenate.
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Annotation object with the data from all annotation objects.
+            Other attributes are from the first annotation object in the list.
+
+        """
+        annotations = list(annotations)
+        for annot in annotations:
+            assert isinstance(annot, Annotation), "Object type not \
+                supported. Can only concatenate Annotation objects together."
+        if len(annotations) == 0:
+            return cls()
+        out_object = copy.copy(annotations[0])
+        frames = [annot.data for annot in annotations]
+        out_object.data = pd.concat(frames, ignore_index=True, sort=False)
+        out_object._enforce_dtypes()
+        return out_object
+
     def __add__(self, other):
-        """Concatenate data from several annotation objects."""
+        """Concatenate data from several annotation objects.
+
+        Data from the other object are only concatenated when the data
+        attribute is accessed, so several annotation objects can be added in
+        a loop without copying the full data at each addition. A copy of the
+        other object's data is kept so later changes to the other object do
+        not affect the result.
+        """
         assert (
             type(other) is ecosound.core.annotation.Annotation
         ), "Object type not \
             supported. Can only concatenate Annotation objects together."
-        self._enforce_dtypes()
-        other._enforce_dtypes()
-        self.data = pd.concat(
-            [self.data, other.data], ignore_index=True, sort=False
-        )
+        self._pending_data.append(other.data.copy(deep=True))
         return self
 
+    def __copy__(self):
+        """Return a shallow copy of the annotation object."""
+        out_object = self.__class__.__new__(self.__class__)
+        out_object.__dict__.update(self.__dict__)
+        out_object._pending_data = list(self._pending_data)
+        # integrity state and indexes are updated in place
+        if self._integrity is not None:
+            out_object._integrity = dict(self._integrity)
+        out_object._indexes = dict(self._indexes)
+        return out_object
+
     def __repr__(self):
         """Return the type of object."""
         return f"{self.__class__.__name__} object (" f"{len(self.data)})"
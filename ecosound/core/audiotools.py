@@ -16,8 +16,15 @@ import numpy as np
 import scipy.signal as spsig
 import scipy
 import copy
+import functools
+from fractions import Fraction
 import ecosound.core.tools
 
+# maximum number of filter designs kept in memory by Filter.coefficients
+FILTER_CACHE_SIZE = 256
+# maximum number of FIR designs kept in memory for polyphase resampling
+RESAMPLING_CACHE_SIZE = 64
+
 
 class Sound:
     """
@@ -83,10 +90,11 @@ class Sound:
     tighten_waveform_window(energy_percentage)
         Crops the beginning  and end times of a waveform in a Sound object
         based on a percentage of energy.
-    upsample(resolution_sec)
+    upsample(resolution_sec, method="fft")
         upsample the waveform to a time resolution of resolution_sec.
     decimate(new_sampling_frequency, filter_order=8, filter_type="iir")
-        Decimate waveform.
+        Decimate waveform. Use filter_type="polyphase" for a faster
+        polyphase resampling supporting non-integer ratios.
     normalize()
         Normalize max amplitude of waveform to 1.
 
@@ -348,7 +356,7 @@ class Sound:
                 + " filter twice."
             )
 
-    def upsample(self, resolution_sec):
+    def upsample(self, resolution_sec, method="fft"):
         """
         Upsample  waveform
 
@@ -359,6 +367,11 @@ class Sound:
         resolution_sec : float
             Sample resolution of the upsampled waveform, in second. The new
             sampling frequency will be 1/resolution_sec.
+        method : str, optional
+            Interpolation method. 'fft' uses the Fourier method
+            (scipy.signal.resample). 'polyphase' uses a polyphase FIR filter
+            (scipy.signal.resample_poly) which is faster and supports
+            non-integer resampling ratios. The default is 'fft'.
 
         Returns
         -------
@@ -369,6 +382,7 @@ class Sound:
             self._waveform,
             1 / self._waveform_sampling_frequency,
             resolution_sec,
+            method=method,
         )
         self._waveform_duration_sec = (
             len(self._waveform) / self._waveform_sampling_frequency
@@ -390,35 +404,49 @@ class Sound:
         new_sampling_frequency : float
             Sampling frequency requested, in Hz.
         filter_order : int, optional
-            Order of the low-pass filter to use. The default is 8.
+            Order of the low-pass filter to use. Not used if filter_type is
+            'polyphase'. The default is 8.
         filter_type : str, optional
-            Type of low-pass filter to use. The default is 'iir'.
+            Type of low-pass filter to use. Can be 'iir' or 'fir' (integer
+            decimation factor with scipy.signal.decimate), or 'polyphase'
+            (rational resampling factor with scipy.signal.resample_poly). The
+            'polyphase' option is faster, filters at the lowest possible rate,
+            and gives exactly new_sampling_frequency even if it is not an
+            integer fraction of the current sampling frequency. The default
+            is 'iir'.
 
         Returns
         -------
         None. Updates the waveform and sampling frequency of the Sound object.
 
         """
+        if filter_type == "polyphase":
+            sig_decimated, new_fs = resample_polyphase(
+                self.waveform,
+                self.waveform_sampling_frequency,
+                new_sampling_frequency,
+            )
+        else:
+            # downsample to user-defined sampling rate
+            downsampling_factor = int(
+                np.round(
+                    self.waveform_sampling_frequency / new_sampling_frequency
+                )
+            )
 
-        # downsample to user-defined sampling rate
-        downsampling_factor = int(
-            np.round(self.waveform_sampling_frequency / new_sampling_frequency)
-        )
-
-        # decimate signal (the cutoff frequency of the filter is 0.8 x new_sampling_frequency)
-        sig_decimated = scipy.signal.decimate(
-            self.waveform,
-            downsampling_factor,
-            n=filter_order,
-            ftype=filter_type,
-            axis=0,
-            zero_phase=True,
-        )
+            # decimate signal (the cutoff frequency of the filter is 0.8 x new_sampling_frequency)
+            sig_decimated = scipy.signal.decimate(
+                self.waveform,
+                downsampling_factor,
+                n=filter_order,
+                ftype=filter_type,
+                axis=0,
+                zero_phase=True,
+            )
+            new_fs = self.waveform_sampling_frequency / downsampling_factor
         # update object
         self._waveform = sig_decimated
-        self._waveform_sampling_frequency = (
-            self.waveform_sampling_frequency / downsampling_factor
-        )
+        self._waveform_sampling_frequency = new_fs
         self._waveform_duration_sec = (
             len(sig_decimated) / self._waveform_sampling_frequency
         )
@@ -721,9 +749,13 @@ class Filter:
     Methods
     -------
     apply(waveform, sampling_frequency)
-        Apply filter to time vector/waveform.
+        Apply filter to time vector/waveform (or to several waveforms of equal
+        length stacked in a 2-D array).
+    apply_batch(waveforms, sampling_frequency)
+        Apply filter to a list of waveforms of equal length in a single call.
     coefficients(sampling_frequency)
-        Defines coeeficient of the filter.
+        Defines coeeficient of the filter. Filter designs are cached (LRU) and
+        shared by all Filter objects with the same parameters.
 
     """
 
@@ -797,7 +829,8 @@ class Filter:
         Parameters
         ----------
         waveform : numpy.ndarray
-            Time series to filter.
+            Time series to filter. Can be a 1-D array, or a 2-D array with
+            one time series per row (all filtered in a single call).
         sampling_frequency : float
             Sampling frequency of the time series to filter, in Hz.
 
@@ -810,12 +843,49 @@ class Filter:
         # b, a = self.coefficients(sampling_frequency)
         # return spsig.sosfiltfilt (b, a, waveform)
         sos = self.coefficients(sampling_frequency)
-        return spsig.sosfiltfilt(sos, waveform)
+        return spsig.sosfiltfilt(sos, waveform, axis=-1)
+
+    def apply_batch(self, waveforms, sampling_frequency):
+        """
+        Apply filter to several time series of equal length.
+
+        The time series are stacked in a 2-D array and filtered in one call,
+        which is much faster than filtering each of them individually.
+
+        Parameters
+        ----------
+        waveforms : list of numpy.ndarray
+            Time series to filter. All time series must have the same length.
+        sampling_frequency : float
+            Sampling frequency of the time series to filter, in Hz.
+
+        Raises
+        ------
+        ValueError
+            If the time series don't all have the same length.
+
+        Returns
+        -------
+        numpy.ndarray
+            2-D array with one filtered time series per row.
+
+        """
+        if len(set([len(waveform) for waveform in waveforms])) > 1:
+            raise ValueError(
+                "All waveforms must have the same length to be filtered "
+                + "together."
+            )
+        return self.apply(np.vstack(waveforms), sampling_frequency)
 
     def coefficients(self, sampling_frequency):
         """
         Get filter coefficients.
 
+        Coefficients are only designed once for a given filter type, cutoff
+        frequencies, order, and sampling frequency. They are then retrieved
+        from a cache of size FILTER_CACHE_SIZE (least recently used designs
+        are discarded first).
+
         Parameters
         ----------
         sampling_frequency : float
@@ -823,42 +893,234 @@ class Filter:
 
         Returns
         -------
-        b : float
-            Filter coefficient b.
-        a : float
-            Filter coefficient a.
+        sos : numpy.ndarray
+            Second-order sections representation of the filter.
 
         """
-        nyquist = 0.5 * sampling_frequency
-        if self.type == "bandpass":
-            low = self.cutoff_frequencies[0] / nyquist
-            high = self.cutoff_frequencies[1] / nyquist
-            # b, a = spsig.butter(self.order, [low, high], btype='band')
-            sos = spsig.butter(
-                self.order, [low, high], btype="band", output="sos"
-            )
-        elif self.type == "lowpass":
-            # b, a = spsig.butter(self.order,
-            #                     self.cutoff_frequencies[0]/nyquist, 'low')
-            sos = spsig.butter(
-                self.order,
-                self.cutoff_frequencies[0] / nyquist,
-                "low",
-                output="sos",
-            )
-        elif self.type == "highpass":
-            # b, a = spsig.butter(self.order,
-            #                     self.cutoff_frequencies[0]/nyquist, 'high')
-            sos = spsig.butter(
-                self.order,
-                self.cutoff_frequencies[0] / nyquist,
-                "high",
-                output="sos",
-            )
-        return sos
+        sos = _design_sos(
+            self.type,
+            tuple(float(freq) for freq in self.cutoff_frequencies),
+            int(self.order),
+            float(sampling_frequency),
+        )
+        return sos.copy()  # cached array is shared with other Filter objects
+
+
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
+def _design_sos(filter_type, cutoff_frequencies, order, sampling_frequency):
+    """Design Butterworth filter as second-order sections (cached)."""
+    nyquist = 0.5 * sampling_frequency
+    if filter_type == "bandpass":
+        low = cutoff_frequencies[0] / nyquist
+        high = cutoff_frequencies[1] / nyquist
+        sos = spsig.butter(order, [low, high], btype="band", output="sos")
+    elif filter_type == "lowpass":
+        sos = spsig.butter(
+            order, cutoff_frequencies[0] / nyquist, "low", output="sos"
+        )
+    elif filter_type == "highpass":
+        sos = spsig.butter(
+            order, cutoff_frequencies[0] / nyquist, "high", output="sos"
+        )
+    return sos
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler.
+
+    Resample a signal processed in consecutive blocks (e.g. read one chunk
+    at a time from a long audio file) so the entire waveform never needs to be
+    in memory. The state between blocks is kept in the object. Concatenating
+    the outputs of process() for all blocks, followed by flush(), gives the
+    same result as scipy.signal.resample_poly on the entire signal.
+
+    Attributes
+    ----------
+    sampling_frequency : float
+        Sampling frequency of the input signal, in Hz.
+    new_sampling_frequency : float
+        Sampling frequency of the output signal, in Hz.
+    up : int
+        Upsampling factor.
+    down : int
+        Downsampling factor.
+
+    Methods
+    -------
+    process(block)
+        Resample the next block of the signal.
+    flush()
+        Return the last samples of the resampled signal.
+
+    """
+
+    def __init__(self, sampling_frequency, new_sampling_frequency):
+        """
+        Initialize the resampler.
+
+        Parameters
+        ----------
+        sampling_frequency : float
+            Sampling frequency of the input signal, in Hz.
+        new_sampling_frequency : float
+            Sampling frequency of the output signal, in Hz.
 
+        Returns
+        -------
+        None. Resampler object.
+
+        """
+        self.sampling_frequency = sampling_frequency
+        self.up, self.down = resampling_factors(
+            sampling_frequency, new_sampling_frequency
+        )
+        self.new_sampling_frequency = sampling_frequency * self.up / self.down
+        self._h = _design_resampling_fir(self.up, self.down) * self.up
+        self._half_len = (len(self._h) - 1) // 2
+        self._buffer = np.zeros(0)
+        self._buffer_start = 0  # index of 1st buffer sample in the signal
+        self._n_in = 0  # number of input samples received
+        self._n_out = 0  # number of output samples returned
+
+    def process(self, block):
+        """
+        Resample the next block of the signal.
+
+        Parameters
+        ----------
+        block : 1D array
+            Next block of the input signal.
+
+        Returns
+        -------
+        1D array
+            Resampled signal that could be calculated with all the data
+            received so far.
+
+        """
+        block = np.asarray(block, dtype=float)
+        self._buffer = np.concatenate((self._buffer, block))
+        self._n_in += len(block)
+        # last output sample that only depends on input data received
+        n_end = (self._n_in * self.up - 1 - self._half_len) // self.down + 1
+        return self._compute(n_end)
+
+    def flush(self):
+        """
+        Return the last samples of the resampled signal.
 
-def upsample(waveform, current_res_sec, new_res_sec):
+        Must be called once, after the last block has been processed.
+
+        Returns
+        -------
+        1D array
+            Last samples of the resampled signal.
+
+        """
+        n_total = -(-self._n_in * self.up // self.down)  # ceil
+        n_in = self._n_in
+        # signal is zero-padded at the end, like scipy.signal.resample_poly
+        n_pad = (
+            ((n_total - 1) * self.down + self._half_len) // self.up + 1 - n_in
+        )
+        out = self.process(np.zeros(max(n_pad, 0)))
+        self._n_in = n_in
+        return out[: max(n_total - (self._n_out - len(out)), 0)]
+
+    def _compute(self, n_end):
+        """Compute output samples from self._n_out to n_end."""
+        count = n_end - self._n_out
+        if count <= 0:
+            return np.zeros(0)
+        # index of the first output sample in the upsampled/filtered signal,
+        # relative to the start of the buffer
+        k0 = self._n_out * self.down + self._half_len - (
+            self._buffer_start * self.up
+        )
+        # delay filter so k0 falls on a sample kept by the downsampling
+        pre_pad = -k0 % self.down
+        h = np.concatenate((np.zeros(pre_pad), self._h))
+        out = spsig.upfirdn(h, self._buffer, self.up, self.down)
+        first = (k0 + pre_pad) // self.down
+        out = out[first : first + count]
+        self._n_out = n_end
+        # discard input samples that are not needed anymore
+        k_next = self._n_out * self.down + self._half_len
+        keep_from = max(0, -(-(k_next - len(self._h) + 1) // self.up))
+        keep_from = min(keep_from, self._n_in)
+        self._buffer = self._buffer[keep_from - self._buffer_start :]
+        self._buffer_start = keep_from
+        return out
+
+
+def resampling_factors(sampling_frequency, new_sampling_frequency):
+    """
+    Rational resampling factors.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+        Sampling frequency of the input signal, in Hz.
+    new_sampling_frequency : float
+        Sampling frequency of the output signal, in Hz.
+
+    Returns
+    -------
+    up : int
+        Upsampling factor.
+    down : int
+        Downsampling factor.
+
+    """
+    ratio = Fraction(new_sampling_frequency / sampling_frequency)
+    ratio = ratio.limit_denominator(1000)
+    return ratio.numerator, ratio.denominator
+
+
+@functools.lru_cache(maxsize=RESAMPLING_CACHE_SIZE)
+def _design_resampling_fir(up, down):
+    """Design anti-aliasing FIR filter for polyphase resampling (cached).
+
+    Same design as the default of scipy.signal.resample_poly.
+    """
+    if up == down:  # no resampling
+        return np.ones(1)
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return spsig.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+
+
+def resample_polyphase(waveform, sampling_frequency, new_sampling_frequency):
+    """
+    Resample waveform using a polyphase filter.
+
+    Parameters
+    ----------
+    waveform: 1D array
+        Waveform to resample.
+    sampling_frequency : float
+        Sampling frequency of the waveform, in Hz.
+    new_sampling_frequency : float
+        Sampling frequency requested, in Hz. Does not need to be an integer
+        fraction or multiple of sampling_frequency.
+
+    Returns
+    -------
+    waveform: 1D array
+        Resampled waveform.
+    new_fs: float
+        Sampling frequency of the resampled waveform, in Hz.
+
+    """
+    up, down = resampling_factors(sampling_frequency, new_sampling_frequency)
+    new_waveform = spsig.resample_poly(
+        waveform, up, down, window=_design_resampling_fir(up, down)
+    )
+    return new_waveform, sampling_frequency * up / down
+
+
+def upsample(waveform, current_res_sec, new_res_sec, method="fft"):
     """
     Upsample  waveform
 
@@ -873,6 +1135,9 @@ def upsample(waveform, current_res_sec, new_res_sec):
         sampling frequency.
     new_res_sec : float
         New time resolution of waveform after interpolation (in seconds).
+    method : str, optional
+        Interpolation method. Can be 'fft' (scipy.signal.resample) or
+        'polyphase' (scipy.signal.resample_poly). The default is 'fft'.
 
     Returns
     -------
@@ -880,8 +1145,15 @@ def upsample(waveform, current_res_sec, new_res_sec):
         waveform upsampled to have a time resolution of "new_res_sec".
 
     """
-    axis_t = np.arange(0, len(waveform) * current_res_sec, current_res_sec)
     new_fs = round(1 / new_res_sec)
+    if method == "polyphase":
+        new_waveform, _ = resample_polyphase(
+            waveform, 1 / current_res_sec, new_fs
+        )
+        return new_waveform, new_fs
+    elif method != "fft":
+        raise ValueError('Invalid method. Should be set to "fft" or "polyphase".')
+    axis_t = np.arange(0, len(waveform) * current_res_sec, current_res_sec)
     nb_samp = round(axis_t[-1] * new_fs)
     new_waveform, new_axis_t = spsig.resample(
         waveform,
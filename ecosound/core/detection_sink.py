@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only store of detections written by parallel processes.
+"""
+import os
+import re
+import json
+import uuid
+from ecosound.core.annotation import Annotation
+from ecosound.core.lazy_annotation import LazyAnnotation
+
+
+class DetectionSink:
+    """
+    Append-only store of detections written by parallel processes.
+
+    Detections are written in a folder as parquet files (segments). Each call
+    to the write method creates a new segment, so several processes can write
+    to the same DetectionSink at the same time without locks. Segments are
+    first written to a hidden temporary file and then renamed, so readers
+    only see complete segments and can query the detections while they are
+    being written. Segments can be merged into a single file with the compact
+    method once all the detections are written. The merged file keeps the
+    names of the segments it replaces, and hides them from readers as soon as
+    it is created, so detections are never read twice.
+
+    For example, in each worker process:
+        sink = DetectionSink('detections_folder')
+        if sink.contains(audio_file_name) is False:
+            detections = detector.run(spectro)
+            sink.write(detections, name=audio_file_name)
+    and to read the results (while the batch is running or after):
+        detections = DetectionSink('detections_folder').read()
+
+    Attributes
+    ----------
+    folder : str
+        Path of the folder with the segments.
+
+    Methods
+    -------
+    write(annot, name=None)
+        Write annotations as a new segment.
+    segments()
+        List the path of all the segments.
+    names()
+        List the names of all the segments.
+    contains(name)
+        Check if a segment with the name exists.
+    read(columns=None, filters=None, verbose=False)
+        Load the detections of all the segments.
+    lazy()
+        Access the detections without loading them (LazyAnnotation).
+    compact()
+        Merge all the segments into a single segment.
+    """
+
+    segment_prefix = "segment-"
+    compacted_prefix = "compacted-"
+    # key of the parquet metadata with the names of the segments (and the
+    # files merged by compact)
+    metadata_key = b"ecosound_detection_sink"
+
+    def __init__(self, folder):
+        """
+        Initialize DetectionSink object.
+
+        Parameters
+        ----------
+        folder : str
+            Path of the folder with the segments. Created if it doesn't
+            exist.
+
+        Returns
+        -------
+        None. DetectionSink object.
+
+        """
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def write(self, annot, name=None):
+        """
+        Write annotations as a new segment.
+
+        Parameters
+        ----------
+        annot : ecosound Annotation or Measurement object
+            Detections to write.
+        name : str, optional
+            Name of the segment (e.g. name of the audio file processed). Used
+            to check which files have already been processed with the
+            contains method. The name is stored in the segment file, and only
+            used in the file name with characters other than letters, digits,
+            '_' and '.' replaced by '_'. The default is None.
+
+        Returns
+        -------
+        file : str
+            Path of the segment file written.
+
+        """
+        if name is None:
+            name = "detections"
+        name = str(name)
+        file_name = (
+            self.segment_prefix
+            + DetectionSink._safe_name(name)
+            + "-"
+            + str(os.getpid())
+            + "-"
+            + uuid.uuid4().hex
+            + ".parquet"
+        )
+        file = os.path.join(self.folder, file_name)
+        # hidden file (ignored by readers) until fully written
+        tmp_file = os.path.join(self.folder, "." + file_name + ".tmp")
+        annot.to_parquet(
+            tmp_file,
+            metadata={
+                self.metadata_key.decode(): json.dumps(
+                    {"names": [name], "files": []}
+                )
+            },
+        )
+        os.replace(tmp_file, file)
+        return file
+
+    def segments(self):
+        """
+        List the path of all the segments.
+
+        Returns
+        -------
+        files : list of str
+            Path of all the segments, sorted by name.
+
+        """
+        return list(self._scan()[0].keys())
+
+    def names(self):
+        """
+        List the names of all the segments.
+
+        Returns
+        -------
+        names : list of str
+            Unique names of the segments.
+
+        """
+        names = dict()
+        for file, segment_names in self._scan()[0].items():
+            if segment_names is None:
+                segment_names = self._read_names(file)[0] or []
+            for name in segment_names:
+                names[name] = None
+        return list(names.keys())
+
+    def contains(self, name):
+        """
+        Check if a segment with the name exists.
+
+        Parameters
+        ----------
+        name : str
+            Name of the segment (see write method).
+
+        Returns
+        -------
+        bool
+            True if a segment with that name exists.
+
+        """
+        name = str(name)
+        safe_name = DetectionSink._safe_name(name)
+        for file, segment_names in self._scan()[0].items():
+            if segment_names is None:
+                # only read segments with the same name in the file name
+                if self._file_name_to_name(file) != safe_name:
+                    continue
+                segment_names = self._read_names(file)[0] or []
+            if name in segment_names:
+                return True
+        return False
+
+    def read(self, columns=None, filters=None, verbose=False):
+        """
+        Load the detections of all the segments.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            Name of the annotation fields to load (see
+            Annotation.from_parquet). The default is None.
+        filters : list of tuples, optional
+            Conditions on the rows to load (see Annotation.from_parquet). The
+            default is None.
+        verbose : bool, optional
+            If set to True, print the summary of the annatation integrity test.
+            The default is False.
+
+        Returns
+        -------
+        annot : ecosound.annotation.Annotation
+            Detections from all the segments.
+
+        """
+        annot = Annotation()
+        files = self.segments()
+        if len(files) == 0:
+            return annot
+        try:
+            annot.from_parquet(
+                files, verbose=verbose, columns=columns, filters=filters
+            )
+        except FileNotFoundError:  # segments merged by compact while reading
+            annot.from_parquet(
+                self.segments(),
+                verbose=verbose,
+                columns=columns,
+                filters=filters,
+            )
+        return annot
+
+    def lazy(self):
+        """
+        Access the detections without loading them.
+
+        The LazyAnnotation object only reads the segments written so far, and
+        must be created again after the segments are merged with compact.
+
+        Returns
+        -------
+        lazy_annot : ecosound.lazy_annotation.LazyAnnotation
+            LazyAnnotation object for the segments written so far.
+
+        """
+        return LazyAnnotation(self.segments())
+
+    def compact(self):
+        """
+        Merge all the segments into a single segment.
+
+        Should be used once all the detections are written (e.g. at the end
+        of a batch run), and by one process at a time. Segments written while
+        compacting are not merged. The merged segment stores the names of the
+        segments it replaces (see names and contains methods) and the names
+        of their files, which are ignored by readers as soon as the merged
+        segment is created and then deleted.
+
+        Returns
+        -------
+        file : str
+            Path of the merged segment file. None if there are no segments.
+
+        """
+        import pyarrow
+        import pyarrow.parquet
+
+        segments, merged = self._scan()
+        files = list(segments.keys())
+        if len(files) == 0:
+            return None
+        if len(files) == 1:
+            return files[0]
+        for file in files:
+            if segments[file] is None:
+                segments[file] = self._read_names(file)[0] or []
+        tables = [pyarrow.parquet.read_table(file) for file in files]
+        table = pyarrow.concat_tables(tables, promote_options="default")
+        metadata = dict(table.schema.metadata or {})
+        metadata[self.metadata_key] = json.dumps(
+            {
+                "names": list(
+                    dict.fromkeys(
+                        name for file in files for name in segments[file]
+                    )
+                ),
+                # files merged previously stay hidden if not deleted yet
+                "files": sorted(
+                    merged.union(os.path.basename(file) for file in files)
+                ),
+            }
+        )
+        table = table.replace_schema_metadata(metadata)
+        file_name = (
+            self.compacted_prefix
+            + str(os.getpid())
+            + "-"
+            + uuid.uuid4().hex
+            + ".parquet"
+        )
+        file = os.path.join(self.folder, file_name)
+        tmp_file = os.path.join(self.folder, "." + file_name + ".tmp")
+        pyarrow.parquet.write_table(table, tmp_file)
+        # merged segment replaces the old ones for readers from now on
+        os.replace(tmp_file, file)
+        for old_file in files:
+            os.remove(old_file)
+        for old_file_name in merged:
+            if os.path.exists(os.path.join(self.folder, old_file_name)):
+                os.remove(os.path.join(self.folder, old_file_name))
+        return file
+
+    def _scan(self):
+        """
+        Return names of each segment and name of the merged files.
+
+        Names of the segments written by the write method are not read (None)
+        until needed, so only the metadata of the merged segments are read.
+        """
+        file_names = [
+            file
+            for file in sorted(os.listdir(self.folder))
+            if file.startswith((self.segment_prefix, self.compacted_prefix))
+            and file.endswith(".parquet")
+        ]
+        segments = dict()
+        merged = set()
+        for file_name in file_names:
+            file = os.path.join(self.folder, file_name)
+            if file_name.startswith(self.compacted_prefix):
+                names, merged_files = self._read_names(file)
+                if names is None:  # merged and deleted by compact
+                    continue
+                segments[file] = names
+                merged.update(merged_files)
+            else:
+                segments[file] = None
+        for file_name in merged:
+            segments.pop(os.path.join(self.folder, file_name), None)
+        return segments, merged
+
+    def _read_names(self, file):
+        """Return names of a segment and files it merged (from metadata)."""
+        import pyarrow.parquet
+
+        try:
+            metadata = pyarrow.parquet.read_schema(file).metadata or {}
+        except FileNotFoundError:  # merged and deleted by compact
+            return None, []
+        if self.metadata_key not in metadata:  # name from the file name only
+            return [self._file_name_to_name(file)], []
+        metadata = json.loads(metadata[self.metadata_key])
+        return metadata["names"], metadata["files"]
+
+    def _file_name_to_name(self, file):
+        """Return the name of a segment as written in its file name."""
+        file_name = os.path.basename(file)[len(self.segment_prefix) :]
+        return file_name.rsplit("-", 2)[0]
+
+    @staticmethod
+    def _safe_name(name):
+        """Return name with only characters allowed in the file names."""
+        return re.sub(r"[^A-Za-z0-9_.]", "_", name)
+
+    def __len__(self):
+        """Return number of detections."""
+        if len(self.segments()) == 0:
+            return 0
+        return len(self.lazy())
@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-core access to annotations stored as parquet datasets.
+"""
+import copy
+import numpy as np
+import pandas as pd
+from ecosound.core.annotation import Annotation
+from ecosound.core.predicate import Predicate
+
+
+class LazyAnnotation:
+    """
+    Annotations stored in parquet files and only loaded when needed.
+
+    The LazyAnnotation object gives access to annotations saved with
+    Annotation.to_parquet (single file or partitioned dataset) without
+    loading them in memory. Filters are only recorded and are applied when
+    the data are read, so only the parquet files and row groups meeting the
+    filtering conditions are read. Summaries (number of annotations, labels,
+    summary table, time aggregates) are calculated by reading the annotations
+    by batches, and only the fields needed. Annotations are loaded in an
+    Annotation object with the collect method.
+
+    For example:
+        detec = LazyAnnotation('detections_dataset')
+        detec_MW = detec.filter(label_class='MW', confidence__ge=0.9)
+        print(len(detec_MW))
+        annot = detec_MW.collect()
+
+    Attributes
+    ----------
+    path : str
+        Path of the parquet file or partitioned dataset folder.
+    filters : list of tuples
+        Filtering conditions applied when reading the annotations, as a list
+        of (field, operator, value) tuples that must all be true.
+    batch_size : int
+        Maximum number of annotations read at once.
+
+    Methods
+    -------
+    filter(conditions=None, inplace=False, **kwargs)
+        Add filtering conditions.
+    collect(columns=None, verbose=False)
+        Load annotations in an Annotation object.
+    get_labels_class()
+        Get all the unique class labels of the annotations.
+    get_labels_subclass()
+        Get all the unique subclass labels of the annotations.
+    get_fields()
+        Get all the annotations fields.
+    summary(rows='deployment_ID', columns='label_class')
+        Produce a summary table of the number of annotations.
+    calc_time_aggregate_1D(integration_time='1H', resampler='count',
+                           is_binary=False, start_date=None, end_date=None,
+                           field=None, group_by=None)
+        Calculate the 1D time aggregate of annotations.
+    filter_overlap_with(annot, freq_ovp=True, dur_factor_max=None,
+                        dur_factor_min=None, ovlp_ratio_min=None,
+                        remove_duplicates=False, inherit_metadata=False,
+                        filter_deploymentID=True)
+        Load annotations overlapping with another Annotation object.
+    """
+
+    def __init__(self, path, filters=None, batch_size=1000000):
+        """
+        Initialize LazyAnnotation object.
+
+        Parameters
+        ----------
+        path : str or list of str
+            Path of the parquet file or partitioned dataset folder written
+            with Annotation.to_parquet, or list of paths of parquet files.
+        filters : list of tuples, optional
+            Filtering conditions, as a list of (field, operator, value)
+            tuples (see Annotation.from_parquet). The default is None.
+        batch_size : int, optional
+            Maximum number of annotations read at once. The default is
+            1000000.
+
+        Returns
+        -------
+        None. LazyAnnotation object.
+
+        """
+        self.path = path
+        if filters is None:
+            filters = []
+        self.filters = list(filters)
+        self.batch_size = batch_size
+        self._dataset = Annotation._open_parquet_dataset(path)
+
+    def filter(self, conditions=None, inplace=False, **kwargs):
+        """
+        Add filtering conditions.
+
+        Conditions are not evaluated until the annotations are read.
+        Conditions can be defined as keyword arguments with the field names,
+        optionally followed by two underscores and a comparison operator (eq,
+        ne, lt, le, gt, ge, in, notin), or as a Predicate object (see
+        Annotation.filter). Query strings are not supported.
+
+        Parameters
+        ----------
+        conditions : ecosound Predicate object, optional
+            Pre-compiled filtering conditions. The default is None.
+        inplace : bool, optional
+            If set to True, updates the current object with the filter results.
+            The default is False.
+        **kwargs : optional
+            Filtering conditions (e.g. label_class='MW', confidence__ge=0.9).
+
+        Raises
+        ------
+        ValueError
+            If conditions is not a Predicate object.
+
+        Returns
+        -------
+        out_object : ecosound.lazy_annotation.LazyAnnotation
+            Filtered LazyAnnotation object.
+
+        """
+        filters = []
+        if conditions is not None:
+            if isinstance(conditions, Predicate) is False:
+                raise ValueError(
+                    "Conditions must be a Predicate object or keyword "
+                    "arguments. Query strings are not supported."
+                )
+            filters += conditions.to_filters()
+        if len(kwargs) > 0:
+            filters += Predicate(**kwargs).to_filters()
+        if inplace:
+            out_object = self
+        else:
+            out_object = copy.copy(self)
+        out_object.filters = self.filters + filters
+        if inplace:
+            out_object = None
+        return out_object
+
+    def collect(self, columns=None, verbose=False):
+        """
+        Load annotations in an Annotation object.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            Name of the annotation fields to load. If None, all fields are
+            loaded. The default is None.
+        verbose : bool, optional
+            If set to True, print the summary of the annatation integrity test.
+            The default is False.
+
+        Returns
+        -------
+        annot : ecosound.annotation.Annotation
+            Annotations meeting all the filtering conditions.
+
+        """
+        annot = Annotation()
+        annot.from_parquet(
+            self.path,
+            verbose=verbose,
+            columns=columns,
+            filters=self._get_filters(),
+        )
+        return annot
+
+    def get_labels_class(self):
+        """
+        Get all the unique class labels of the annotations.
+
+        Returns
+        -------
+        classes : list
+            List of unique class labels.
+
+        """
+        return self._get_unique("label_class")
+
+    def get_labels_subclass(self):
+        """
+        Get all the unique subclass labels of the annotations.
+
+        Returns
+        -------
+        classes : list
+            List of unique subclass labels.
+
+        """
+        return self._get_unique("label_subclass")
+
+    def get_fields(self):
+        """
+        Get all the annotations fields.
+
+        Returns
+        -------
+        classes : list
+            List of annotation fields.
+
+        """
+        return list(self._dataset.schema.names)
+
+    def summary(self, rows="deployment_ID", columns="label_class"):
+        """
+        Produce a summary table of the number of annotations.
+
+        Create a pivot table summarizing the number of annotations for each
+        deployment and each label class (see Annotation.summary).
+
+        Parameters
+        ----------
+        rows : 'str', optional
+            Name of the annotation field for the rows of the table. The default
+            is 'deployment_ID'.
+        columns : 'str', optional
+            Name of the annotation field for the columns of the table. The
+            default default is 'label_class'.
+
+        Returns
+        -------
+        summary : pandas DataFrame
+            Pivot table with the number of annotations in each category.
+
+        """
+        counts = []
+        for data in self._iter_batches([rows, columns]):
+            counts.append(
+                data.groupby([rows, columns], observed=True)
+                .size()
+                .rename("count")
+                .reset_index()
+            )
+        counts = pd.concat(counts, ignore_index=True)
+        summary = counts.pivot_table(
+            index=rows,
+            columns=columns,
+            values="count",
+            aggfunc="sum",
+            fill_value=0,
+        )
+        # Add a "Total" row and column
+        summary.loc["Total"] = summary.sum()
+        summary["Total"] = summary.sum(axis=1)
+        return summary
+
+    def calc_time_aggregate_1D(
+        self,
+        integration_time="1H",
+        resampler="count",
+        is_binary=False,
+        start_date=None,
+        end_date=None,
+        field=None,
+        group_by=None,
+    ):
+        """
+        Calculate the 1D time aggregate of annotations.
+
+        Annotations are read by batches and aggregated in time bins of each
+        batch, which are then combined. Results are the same as
+        Annotation.calc_time_aggregate_1D.
+
+        Parameters
+        ----------
+        integration_time : str, optional
+            Integration time for the aggregate. Uses the pandas offset aliases
+            (i.e. '2H'-> 2 hours, '15min'=> 15 minutes, '1D'-> 1 day). The
+            default is '1H'.
+        resampler : str, optional
+            Defines method to combine aggregates. Can be 'count', 'sum' or
+            'mean'. The default is 'count'.
+        is_binary : bool, optional
+            If set to True, calculates the aggregates in term on presence (1)
+            or absence (0). The default is False.
+        start_date : None, str, optional
+            Defines at which date the aggregate should start. If set to None,
+            the min. date will be automatically chosen. The default is None.
+        end_date : None, str, optional
+            Defines at which date the aggregate should end. If set to None,
+            the max. date will be automatically chosen. The default is None.
+        field : str, optional
+            Name of the annotation field to aggregate when resampler is 'sum'
+            or 'mean'. The default is None.
+        group_by : str, optional
+            Name of the annotation field used to calculate separate aggregates
+            (e.g. 'label_class' or 'deployment_ID'). The default is None.
+
+        Returns
+        -------
+        data_resamp : Pandas DataFrame
+            1D DataFrame with datetime as the index and a 'value' column with
+            the result of the aggregates for each time frane (or one column
+            per value of the group_by field).
+
+        """
+        if resampler not in ("count", "sum", "mean"):
+            raise ValueError("resampler must be 'count', 'sum', or 'mean'.")
+        if (resampler in ("sum", "mean")) and (field is None):
+            raise ValueError(
+                "field must be defined when resampler is 'sum' or 'mean'."
+            )
+        # first and last dates
+        dates_min = []
+        dates_max = []
+        for data in self._iter_batches(["time_min_date"]):
+            dates = data["time_min_date"].dropna()
+            if len(dates) > 0:
+                dates_min.append(dates.min())
+                dates_max.append(dates.max())
+        if len(dates_min) == 0:
+            raise ValueError("No annotations with a time_min_date.")
+        date_min = min(dates_min)
+        date_max = max(dates_max)
+        if start_date is None:
+            start_date = pd.Timestamp(date_min)
+        if end_date is None:
+            end_date = pd.Timestamp(date_max)
+        # Time bins of each annotation. Bins that are not a fixed duration
+        # (e.g. weeks, months) are made of full days.
+        freq = pd.tseries.frequencies.to_offset(integration_time)
+        if isinstance(freq, pd.offsets.Tick):
+            width = freq.nanos
+        else:
+            width = 86400 * 10**9
+        day_ns = 86400 * 10**9
+        origin = (pd.Timestamp(date_min).value // day_ns) * day_ns
+        # aggregates of each time bin
+        columns = ["time_min_date"]
+        if field is not None:
+            columns.append(field)
+        if group_by is not None:
+            columns.append(group_by)
+        aggr = []
+        for data in self._iter_batches(columns):
+            data = data[data["time_min_date"].notna()]
+            dates = data["time_min_date"].values.astype("datetime64[ns]")
+            bins = (dates.view("int64") - origin) // width * width + origin
+            batch = pd.DataFrame({"bin": bins, "count": 1.0})
+            if field is not None:
+                values = data[field].values.astype(float)
+                batch["sum"] = np.nan_to_num(values, nan=0)
+                batch["n_values"] = (~np.isnan(values)).astype(float)
+            if group_by is not None:
+                batch["group"] = data[group_by].values
+            aggr.append(
+                batch.groupby(
+                    [col for col in ["bin", "group"] if col in batch],
+                    dropna=False,
+                ).sum()
+            )
+        aggr = pd.concat(aggr)
+        aggr = aggr.groupby(level=list(range(aggr.index.nlevels)), dropna=False)
+        aggr = aggr.sum().reset_index()
+        groups = None
+        if group_by is not None:
+            groups = aggr["group"].values
+        if resampler == "count":
+            values = aggr["count"].values
+        else:
+            values = aggr["sum"].values
+        data_resamp = Annotation._resample(
+            aggr["bin"].values.astype("datetime64[ns]"),
+            integration_time=integration_time,
+            resampler="sum",
+            start_date=start_date,
+            end_date=end_date,
+            values=values,
+            groups=groups,
+        )
+        data_resamp.set_index("datetime", inplace=True)
+        if resampler == "mean":
+            n_values = Annotation._resample(
+                aggr["bin"].values.astype("datetime64[ns]"),
+                integration_time=integration_time,
+                resampler="sum",
+                start_date=start_date,
+                end_date=end_date,
+                values=aggr["n_values"].values,
+                groups=groups,
+            )
+            n_values.set_index("datetime", inplace=True)
+            data_resamp = (data_resamp / n_values).fillna(0)
+        if is_binary:
+            data_resamp[data_resamp > 0] = 1
+        return data_resamp
+
+    def filter_overlap_with(
+        self,
+        annot,
+        freq_ovp=True,
+        dur_factor_max=None,
+        dur_factor_min=None,
+        ovlp_ratio_min=None,
+        remove_duplicates=False,
+        inherit_metadata=False,
+        filter_deploymentID=True,
+    ):
+        """
+        Load annotations overlapping with another Annotation object.
+
+        Only the annotations from the audio files of annot are read, by
+        batches, and filtered with Annotation.filter_overlap_with. Results are
+        the same as Annotation.filter_overlap_with.
+
+        Parameters
+        ----------
+        annot : ecosound.annotation.Annotation object
+            Annotation object used to filter the current annotations.
+        freq_ovp : bool, optional
+            If set to True, filters not only annotations that overlap in time
+            but also overlap in frequency. The default is True.
+        dur_factor_max : float, optional
+            See Annotation.filter_overlap_with. The default is None.
+        dur_factor_min : float, optional
+            See Annotation.filter_overlap_with. The default is None.
+        ovlp_ratio_min : float, optional
+            See Annotation.filter_overlap_with. The default is None.
+        remove_duplicates : bool, optional
+            See Annotation.filter_overlap_with. The default is False.
+        inherit_metadata : bool, optional
+            See Annotation.filter_overlap_with. The default is False.
+        filter_deploymentID : bool, optional
+            See Annotation.filter_overlap_with. The default is True.
+
+        Returns
+        -------
+        out_object : ecosound.annotation.Annotation
+            Filtered Annotation object.
+
+        """
+        files = list(annot.data["audio_file_name"].dropna().unique())
+        lazy_annot = self.filter(audio_file_name__in=files)
+        results = []
+        for data in lazy_annot._iter_batches():
+            batch_annot = Annotation()
+            batch_annot._set_parquet_data(data)
+            results.append(
+                batch_annot.filter_overlap_with(
+                    annot,
+                    freq_ovp=freq_ovp,
+                    dur_factor_max=dur_factor_max,
+                    dur_factor_min=dur_factor_min,
+                    ovlp_ratio_min=ovlp_ratio_min,
+                    remove_duplicates=False,
+                    inherit_metadata=inherit_metadata,
+                    filter_deploymentID=filter_deploymentID,
+                    validate=False,
+                )
+            )
+        if len(results) == 0:
+            out_object = Annotation()
+            out_object._set_parquet_data(
+                self._dataset.schema.empty_table().to_pandas()
+            )
+            return out_object
+        out_object = Annotation.concat(results)
+        # duplicates can be in different batches
+        if remove_duplicates:
+            out_object = out_object.filter_overlap_with(
+                annot,
+                freq_ovp=freq_ovp,
+                dur_factor_max=dur_factor_max,
+                dur_factor_min=dur_factor_min,
+                ovlp_ratio_min=ovlp_ratio_min,
+                remove_duplicates=True,
+                inherit_metadata=inherit_metadata,
+                filter_deploymentID=filter_deploymentID,
+                validate=False,
+            )
+        out_object.check_integrity()
+        return out_object
+
+    def __len__(self):
+        """Return number of annotations."""
+        return self._dataset.count_rows(filter=self._get_expression())
+
+    def __repr__(self):
+        """Return path and filters of the LazyAnnotation."""
+        return (
+            f"{self.__class__.__name__}(path={self.path!r}, "
+            f"filters={self.filters})"
+        )
+
+    def _get_filters(self):
+        """Return filters, or None if there are no filtering conditions."""
+        if len(self.filters) == 0:
+            return None
+        return self.filters
+
+    def _get_expression(self):
+        """Return filters as a pyarrow expression."""
+        import pyarrow.parquet
+
+        filters = self._get_filters()
+        if filters is None:
+            return None
+        return pyarrow.parquet.filters_to_expression(filters)
+
+    def _iter_batches(self, columns=None):
+        """Read annotations by batches as pandas DataFrames."""
+        batches = self._dataset.to_batches(
+            columns=columns,
+            filter=self._get_expression(),
+            batch_size=self.batch_size,
+        )
+        for batch in batches:
+            if batch.num_rows > 0:
+                yield batch.to_pandas()
+
+    def _get_unique(self, field):
+        """Return unique values of a field (in order of appearance)."""
+        values = dict()
+        for data in self._iter_batches([field]):
+            values.update(dict.fromkeys(data[field].unique()))
+        return list(values.keys())
@@ -63,17 +63,25 @@ class Measurement(Annotation):
         """
         return self._metadata
 
-    def to_netcdf(self, file):
+    def to_netcdf(self, file, compression_level=4, chunksize=100000):
         """
         Write measurement data to a netcdf file.
 
         Write measurementss as .nc file. This format works well with xarray
-        and Dask.
+        and Dask. Text fields with repeated values are written as integer
+        codes with a table of the unique values, and all variables are
+        compressed (see Annotation.to_netcdf).
 
         Parameters
         ----------
         file : str
             Path of the netcdf file (.nc) to be written.
+        compression_level : int, optional
+            zlib compression level (0 to 9). 0 means no compression. The
+            default is 4.
+        chunksize : int, optional
+            Number of measurements in each chunk of the netcdf variables. The
+            default is 100000.
 
         Returns
         -------
@@ -83,11 +91,10 @@ class Measurement(Annotation):
         if file.endswith(".nc") == False:
             file = file + ".nc"
         self._enforce_dtypes()
-        meas = self.data
-        meas.set_index("time_min_date", drop=False, inplace=True)
-        meas.index.name = "date"
-        dxr1 = meas.to_xarray()
+        dxr1 = Annotation._to_xarray(self.data)
         dxr1.attrs["datatype"] = "Measurement"
+        # data types to use when reading the file
+        dxr1.attrs["compact_dtypes"] = int(self.compact_dtypes)
         dxr1.attrs[
             "measurements_name"
         ] = self.metadata.measurements_name.values[0]
@@ -101,10 +108,14 @@ class Measurement(Annotation):
             )
         except:
             pass
-        dxr1.to_netcdf(file, engine="netcdf4", format="NETCDF4")
+        Annotation._write_netcdf(dxr1, file, compression_level, chunksize)
 
     def to_raven(
-        self, outdir, outfile="Raven.Table.1.selections.txt", single_file=False
+        self,
+        outdir,
+        outfile="Raven.Table.1.selections.txt",
+        single_file=False,
+        n_jobs=None,
     ):
         """
         Write data to 1 or several Raven files.
@@ -124,6 +135,10 @@ class Measurement(Annotation):
         single_file : bool, optional
             If set to True, writes a single output file with all annotations.
             The default is False.
+        n_jobs : int, optional
+            Number of threads used to write the files. If None, uses the
+            default of concurrent.futures.ThreadPoolExecutor. The default is
+            None.
 
         Returns
         -------
@@ -152,90 +167,15 @@ class Measurement(Annotation):
         cols = cols + self.metadata['measurements_name'][0]
         
         if len(self) > 0:
-            if single_file:
-                annots = [self.data]
-            else:
-                annots = [
-                    pd.DataFrame(y)
-                    for x, y in self.data.groupby(
-                        "audio_file_name", as_index=False
-                    )
-                ]
-            for annot in annots:
-                annot.reset_index(inplace=True, drop=True)
-                
-                outdf = pd.DataFrame(columns =cols)
-                # outdf = pd.DataFrame(
-                #     {
-                #         "Selection": 0,
-                #         "View": 0,
-                #         "Channel": 0,
-                #         "Begin Time (s)": 0,
-                #         "End Time (s)": 0,
-                #         "Delta Time (s)": 0,
-                #         "Low Freq (Hz)": 0,
-                #         "High Freq (Hz)": 0,
-                #         "Begin Path": 0,
-                #         "File Offset (s)": 0,
-                #         "Begin File": 0,
-                #         "Class": 0,
-                #         "Sound type": 0,
-                #         "Software": 0,
-                #         "Confidence": 0,
-                #     },
-                #     index=list(range(annot.shape[0])),
-                # )
-                
-                
-                outdf["Selection"] = range(1, annot.shape[0] + 1)
-                outdf["View"] = "Spectrogram 1"
-                outdf["Channel"] = annot["audio_channel"]
-                outdf["Begin Time (s)"] = annot["time_min_offset"]
-                outdf["End Time (s)"] = annot["time_max_offset"]
-                outdf["Delta Time (s)"] = annot["duration"]
-                outdf["Low Freq (Hz)"] = annot["frequency_min"]
-                outdf["High Freq (Hz)"] = annot["frequency_max"]
-                outdf["File Offset (s)"] = annot["time_min_offset"]
-                outdf["Class"] = annot["label_class"]
-                outdf["Sound type"] = annot["label_subclass"]
-                outdf["Software"] = annot["software_name"]
-                outdf["Confidence"] = annot["confidence"]
-                outdf["Begin Path"] = [
-                    os.path.join(x, y) + z
-                    for x, y, z in zip(
-                        annot["audio_file_dir"],
-                        annot["audio_file_name"],
-                        annot["audio_file_extension"],
-                    )
-                ]
-                outdf["Begin File"] = [
-                    x + y
-                    for x, y in zip(
-                        annot["audio_file_name"], annot["audio_file_extension"]
-                    )
-                ]
-                outdf = outdf.fillna(0)
-                # add neasurements
-                outdf[self.metadata['measurements_name'][0]]=annot[self.metadata['measurements_name'][0]]                
-                if single_file:
-                    outfilename = os.path.join(outdir, outfile)
-                else:
-                    outfilename = os.path.join(
-                        outdir,
-                        str(annot["audio_file_name"].iloc[0])
-                        + str(annot["audio_file_extension"].iloc[0])
-                        + ".chan"
-                        + str(annot["audio_channel"].iloc[0])
-                        + ".Table.1.selections.txt",
-                    )                                                
-                outdf.to_csv(
-                    outfilename,
-                    sep="\t",
-                    encoding="utf-8",
-                    header=True,
-                    columns=cols,
-                    index=False,
-                )
+            outdf, codes, outfilenames = self._raven_table(
+                outdir, outfile, single_file
+            )
+            # add neasurements
+            for measurement in self.metadata['measurements_name'][0]:
+                outdf[measurement] = self.data[measurement].values
+            Annotation._write_tables(
+                outdf, cols, codes, outfilenames, n_jobs=n_jobs
+            )
         else:
             # No annotation => write file with header only
             outfilename = os.path.join(outdir, outfile)
@@ -245,7 +185,7 @@ class Measurement(Annotation):
             f.close()
     
 
-    def from_netcdf(self, file, verbose=False):
+    def from_netcdf(self, file, verbose=False, variables=None):
         """
         Import measurement data from a netcdf file.
 
@@ -263,6 +203,10 @@ class Measurement(Annotation):
         verbose : bool, optional
             If set to True, print the summary of the annatation integrity test.
             The default is False.
+        variables : list of str, optional
+            Name of the fields to load. If None, all fields are loaded. If
+            defined, the integrity of the measurements is not checked. The
+            default is None.
 
         Returns
         -------
@@ -281,47 +225,58 @@ class Measurement(Annotation):
                     print(len(file), "files found.")
             else:
                 file = [file]
-        self.data, self._metadata = self._import_netcdf_files(file)
-        self.check_integrity(verbose=verbose)
+        self.data, self._metadata = self._import_netcdf_files(file, variables)
+        if variables is None:
+            if self.compact_dtypes:
+                self._enforce_dtypes()
+            self.check_integrity(verbose=verbose)
 
-    def _import_netcdf_files(self, files):
+    def _import_netcdf_files(self, files, variables=None):
         """Import one or several netcdf files to a Panda datafrane."""
         assert type(files) in (
             str,
             list,
         ), "Input must be of type str (single \
             file or directory) or list (multiple files)"
+        if type(files) is str:
+            files = [files]
+        # metadata from first file
+        with xr.open_dataset(files[0]) as dxr:
+            if dxr.attrs["datatype"] != "Measurement":
+                raise ValueError(files[0] + "Not a Measurement file.")
+            measurer_name = dxr.measurer_name
+            measurer_version = dxr.measurer_version
+            measurements_name = dxr.measurements_name
+            # file written with compact data types
+            if dxr.attrs.get("compact_dtypes", 0):
+                self.compact_dtypes = True
+            try:
+                measurements_parameters = eval(dxr.measurements_parameters)
+            except:
+                measurements_parameters = None
+
+        def check_measurer(dxr):
+            if dxr.attrs["datatype"] != "Measurement":
+                raise ValueError(
+                    dxr.encoding.get("source", "") + "Not a Measurement file."
+                )
+            ## check measurere name and version
+            if (dxr.measurer_name != measurer_name) | (
+                dxr.measurer_version != measurer_version
+            ):
+                raise ValueError(
+                    dxr.encoding.get("source", "")
+                    + "Not all files were not generated from the same measurer type and version."
+                )
+            return dxr
+
         # Import all files to a dataframe
-        tmp = []
-        for idx, file in enumerate(files):
-            dxr = xr.open_dataset(file)
-            if dxr.attrs["datatype"] == "Measurement":
-                if idx == 0:
-                    measurer_name = dxr.measurer_name
-                    measurer_version = dxr.measurer_version
-                    measurements_name = dxr.measurements_name
-                    try:
-                        measurements_parameters = eval(
-                            dxr.measurements_parameters
-                        )
-                    except:
-                        measurements_parameters = None
-                ## check measurere name and version
-                if (dxr.measurer_name == measurer_name) & (
-                    dxr.measurer_version == measurer_version
-                ):
-                    tmp2 = dxr.to_dataframe()
-                    tmp2.reset_index(inplace=True)
-                else:
-                    raise ValueError(
-                        file
-                        + "Not all files were not generated from the same measurer type and version."
-                    )
-            else:
-                raise ValueError(file + "Not a Measurement file.")
-            tmp.append(tmp2)
-        data = pd.concat(tmp, ignore_index=True, sort=False)
-        data.reset_index(inplace=True, drop=True)
+        dxr = Annotation._open_netcdf_files(
+            files, variables=variables, preprocess=check_measurer
+        )
+        data = dxr.to_dataframe()
+        dxr.close()
+        data.reset_index(inplace=True)
         metadata = {
             "measurer_name": measurer_name,
             "measurer_version": measurer_version,
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-compiled filtering conditions on annotation fields.
+"""
+import operator
+import numpy as np
+
+
+class Predicate:
+    """
+    Pre-compiled filtering conditions on annotation fields.
+
+    Conditions are defined as keyword arguments with the name of the
+    annotation field, optionally followed by two underscores and a
+    comparison operator:
+        - field=value or field__eq=value: field equal to value,
+        - field__ne=value: field different from value,
+        - field__lt=value: field lower than value,
+        - field__le=value: field lower or equal to value,
+        - field__gt=value: field greater than value,
+        - field__ge=value: field greater or equal to value,
+        - field__in=values: field equal to one of the values in the list,
+        - field__notin=values: field not equal to any of the values in the
+          list.
+    All conditions must be true for an annotation to be selected. Conditions
+    are evaluated with vectorized comparisons on the data columns (no string
+    parsing), so the same Predicate can be applied efficiently to many
+    Annotation objects.
+
+    For example:
+        pred = Predicate(label_class='MW', confidence__ge=0.9)
+        annot_MW = annot.filter(pred)
+
+    Attributes
+    ----------
+    conditions : list of tuples
+        List of (field, operator name, value) for each condition.
+
+    Methods
+    -------
+    mask(data)
+        Return boolean mask of the rows of data meeting all the conditions.
+    to_filters()
+        Return conditions as parquet filters (list of tuples).
+    """
+
+    operators = {
+        "eq": operator.eq,
+        "ne": operator.ne,
+        "lt": operator.lt,
+        "le": operator.le,
+        "gt": operator.gt,
+        "ge": operator.ge,
+        "in": None,
+        "notin": None,
+    }
+
+    filter_operators = {
+        "eq": "==",
+        "ne": "!=",
+        "lt": "<",
+        "le": "<=",
+        "gt": ">",
+        "ge": ">=",
+        "in": "in",
+        "notin": "not in",
+    }
+
+    def __init__(self, **conditions):
+        """
+        Initialize the Predicate.
+
+        Parameters
+        ----------
+        **conditions : optional
+            Filtering conditions (e.g. label_class='MW', confidence__ge=0.9).
+
+        Raises
+        ------
+        ValueError
+            If the comparison operator of a condition is not supported.
+
+        Returns
+        -------
+        None. Predicate object.
+
+        """
+        self.conditions = []
+        for key, value in conditions.items():
+            field, _, op_name = key.partition("__")
+            if op_name == "":
+                op_name = "eq"
+            if op_name not in self.operators:
+                raise ValueError(
+                    "Operator '"
+                    + op_name
+                    + "' not supported. Operators must be one of: "
+                    + str(list(self.operators.keys()))
+                )
+            if op_name in ("in", "notin"):
+                if type(value) in (str, bytes):
+                    value = [value]
+                value = list(value)
+            self.conditions.append((field, op_name, value))
+
+    def mask(self, data):
+        """
+        Return boolean mask of the rows meeting all the conditions.
+
+        Parameters
+        ----------
+        data : pandas DataFrame
+            Annotation data (Annotation.data).
+
+        Returns
+        -------
+        mask : numpy array
+            True for rows meeting all the conditions.
+
+        """
+        mask = np.ones(len(data), dtype=bool)
+        for field, op_name, value in self.conditions:
+            values = data[field]
+            if op_name == "in":
+                field_mask = values.isin(value)
+            elif op_name == "notin":
+                field_mask = ~values.isin(value)
+            else:
+                field_mask = self.operators[op_name](values, value)
+            # missing values never meet the conditions
+            mask &= field_mask.to_numpy(dtype=bool, na_value=False)
+        return mask
+
+    def to_filters(self):
+        """
+        Return conditions as parquet filters.
+
+        The filters can be used to only read the annotations meeting the
+        conditions from parquet files (see Annotation.from_parquet).
+
+        Returns
+        -------
+        filters : list of tuples
+            List of (field, operator, value) for each condition.
+
+        """
+        return [
+            (field, self.filter_operators[op_name], value)
+            for field, op_name, value in self.conditions
+        ]
+
+    def __call__(self, data):
+        """Return boolean mask of the rows meeting all the conditions."""
+        return self.mask(data)
+
+    def __repr__(self):
+        """Return the conditions of the Predicate."""
+        return f"{self.__class__.__name__}({self.conditions})"
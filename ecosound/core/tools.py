@@ -6,6 +6,8 @@ Created on Wed Jan 29 21:21:40 2020
 """
 import json
 import re
+import functools
+import concurrent.futures
 from datetime import datetime
 import ecosound.core.decorators
 import numpy as np
@@ -16,6 +18,9 @@ from numba import njit
 import pkg_resources
 import yaml
 
+# maximum number of filenames kept in memory by filename_to_datetime
+FILENAME_CACHE_SIZE = 100000
+
 
 def read_json(file):
     """Load JSON file as dict."""
@@ -47,33 +52,62 @@ def read_yaml(file):
 
 @ecosound.core.decorators.listinput
 def filename_to_datetime(files):
-    """Extract date from a list of str of filenames."""
+    """Extract date from a list of str of filenames.
+
+    Each unique filename is only parsed once and results are mapped back to
+    the list of filenames.
+    """
+    timestamps = dict()
+    for file in files:
+        if file not in timestamps:
+            timestamps[file] = _filename_to_datetime(file)
+    return [timestamps[file] for file in files]
+
+
+def _load_timestamp_patterns():
+    """Load timestamp formats and compile the combined regex."""
     current_dir = os.path.dirname(os.path.realpath(__file__))
     patterns = read_json(os.path.join(current_dir, r"timestamp_formats.json"))
 
     # stream = pkg_resources.resource_stream(__name__, 'core/timestamp_formats.json')
     # patterns = read_json(os.path.join(stream)
 
+    # each pattern in a named group to know which one matched
     regex_string = "|".join(
-        [pattern["string_pattern"] for pattern in patterns]
+        [
+            "(?P<p" + str(idx) + ">" + pattern["string_pattern"] + ")"
+            for idx, pattern in enumerate(patterns)
+        ]
     )
     time_formats = [pattern["time_format"] for pattern in patterns]
-    timestamps = [None] * len(files)
-    p = re.compile(regex_string)
-    for idx, file in enumerate(files):
-        datestr = p.search(file)
-        for time_format in time_formats:
-            ok_flag = False
-            try:
-                timestamps[idx] = datetime.strptime(datestr[0], time_format)
-                ok_flag = True
-            except:
-                ok_flag = False
-            if ok_flag is True:
-                break
-        if ok_flag is False:
-            raise ValueError("Time format not recognized:" + file)
-    return timestamps
+    return re.compile(regex_string), time_formats
+
+
+# Compiled once when the module is loaded
+TIMESTAMP_REGEX, TIMESTAMP_FORMATS = _load_timestamp_patterns()
+# Time format that worked for each pattern of TIMESTAMP_REGEX
+_timestamp_format_by_pattern = dict()
+
+
+@functools.lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def _filename_to_datetime(file):
+    """Extract date from a filename (cached)."""
+    datestr = TIMESTAMP_REGEX.search(file)
+    if datestr is None:
+        raise ValueError("Time format not recognized:" + file)
+    # try the time format that worked last time for that pattern first
+    time_formats = TIMESTAMP_FORMATS
+    known_format = _timestamp_format_by_pattern.get(datestr.lastgroup)
+    if known_format is not None:
+        time_formats = [known_format] + time_formats
+    for time_format in time_formats:
+        try:
+            timestamp = datetime.strptime(datestr[0], time_format)
+        except ValueError:
+            continue
+        _timestamp_format_by_pattern[datestr.lastgroup] = time_format
+        return timestamp
+    raise ValueError("Time format not recognized:" + file)
 
 
 # @njit
@@ -224,6 +258,119 @@ def list_files(indir, suffix, case_sensitive=True, recursive=False):
     return files_list
 
 
+def index_files(indir, suffixes=None, cache_file=None, n_jobs=None):
+    """
+    Index files in folder and all its subfolders by file name.
+
+    Folders are listed with os.scandir and the subfolders of indir are
+    scanned in parallel. If a cache file is provided, the content of each
+    folder is saved with the folder's modification time, so only the folders
+    that have changed since the last call are listed again.
+
+    Parameters
+    ----------
+    indir : str
+        Path of the parent folder to search.
+    suffixes : list of str, optional
+        Suffixes (e.g. extensions) of the filenames to index. If None, all
+        files are indexed. The default is None.
+    cache_file : str, optional
+        Path of the json file where the content of the folders is saved.
+        Created if it doesn't exist. If None, no cache is used. The default
+        is None.
+    n_jobs : int, optional
+        Number of threads used to scan the subfolders. If None, uses the
+        default of concurrent.futures.ThreadPoolExecutor. The default is None.
+
+    Returns
+    -------
+    index : dict
+        Full path of each file (values) by file name (keys). If several files
+        have the same name, the one in the first folder (in alphabetical
+        order) is used.
+
+    """
+    if os.path.isdir(indir) is False:
+        raise Exception("The indir folder given does not exist.")
+    # content of folders from previous scan
+    cached_dirs = dict()
+    if (cache_file is not None) and os.path.isfile(cache_file):
+        cache = read_json(cache_file)
+        if cache.get("root") == os.path.abspath(indir):
+            cached_dirs = cache["dirs"]
+    # scan folders
+    root = _list_dir(indir, cached_dirs)
+    if root is None:
+        raise Exception("The indir folder given can't be read.")
+    dirs = {indir: root}
+    subdirs = [os.path.join(indir, name) for name in dirs[indir]["subdirs"]]
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+    with executor:
+        for subdir_dirs in executor.map(
+            lambda subdir: _scan_dirs(subdir, cached_dirs), subdirs
+        ):
+            dirs.update(subdir_dirs)
+    if cache_file is not None:
+        # written to temporary file first so the cache is never incomplete
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"root": os.path.abspath(indir), "dirs": dirs}, f)
+        os.replace(tmp_file, cache_file)
+    # index
+    if suffixes is not None:
+        suffixes = tuple(suffixes)
+    index = dict()
+    for folder in sorted(dirs):
+        for file in dirs[folder]["files"]:
+            if (suffixes is None) or file.endswith(suffixes):
+                index.setdefault(file, os.path.join(folder, file))
+    return index
+
+
+def _list_dir(folder, cached_dirs):
+    """
+    List files and subfolders of a folder.
+
+    Returns the cached content of the folder if its modification time hasn't
+    changed. Returns None if the folder can't be read.
+    """
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+    cached = cached_dirs.get(folder)
+    if (cached is not None) and (cached["mtime"] == mtime):
+        return cached
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # symbolic links to folders are not followed (as os.walk)
+                    if entry.is_symlink() is False:
+                        subdirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+    except OSError:
+        return None
+    return {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+
+
+def _scan_dirs(folder, cached_dirs):
+    """List files and subfolders of a folder and all its subfolders."""
+    dirs = dict()
+    folders = [folder]
+    while len(folders) > 0:
+        folder = folders.pop()
+        content = _list_dir(folder, cached_dirs)
+        if content is None:
+            continue
+        dirs[folder] = content
+        folders += [os.path.join(folder, name) for name in content["subdirs"]]
+    return dirs
+
+
 @njit
 def find_peaks(array, troughs=False):
     """
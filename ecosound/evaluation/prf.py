@@ -49,15 +49,15 @@ class PRF:
 
         # filter dates (if dataset partially annotated)
         if date_min:
-            annot.filter("time_min_date >= '" + date_min + "'", inplace=True)
-            detec.filter("time_min_date >= '" + date_min + "'", inplace=True)
+            annot.filter(time_min_date__ge=date_min, inplace=True)
+            detec.filter(time_min_date__ge=date_min, inplace=True)
         if date_max:
-            annot.filter("time_max_date <= '" + date_max + "'", inplace=True)
-            detec.filter("time_max_date <= '" + date_max + "'", inplace=True)
+            annot.filter(time_max_date__le=date_max, inplace=True)
+            detec.filter(time_max_date__le=date_max, inplace=True)
 
         # filter to the class of interest
-        annot.filter('label_class == "' + target_class + '"', inplace=True)
-        detec.filter('label_class == "' + target_class + '"', inplace=True)
+        annot.filter(label_class=target_class, inplace=True)
+        detec.filter(label_class=target_class, inplace=True)
 
         # Define list of files to use for the performance evaluation.
         if (
@@ -82,88 +82,67 @@ class PRF:
         files_list.sort()
 
         # filter annotations with selected files to use
-        annot.filter(
-            "audio_file_name in @files_list",
-            files_list=files_list,
-            inplace=True,
-        )
+        annot.filter(audio_file_name__in=files_list, inplace=True)
 
         # filter detections with selected files to use
-        detec.filter(
-            "audio_file_name in @files_list",
-            files_list=files_list,
-            inplace=True,
+        detec.filter(audio_file_name__in=files_list, inplace=True)
+
+        # pairs of overlapping annotations and detections (all files), so
+        # overlaps are only calculated once for all thresholds
+        pairs = annot.overlap_join(
+            detec, freq_ovp=freq_ovp, filter_deploymentID=filter_deploymentID
         )
+        annot_idx, detec_idx = Annotation._select_overlap_pairs(
+            annot.data,
+            detec.data,
+            pairs,
+            dur_factor_max=dur_factor_max,
+            dur_factor_min=dur_factor_min,
+            ovlp_ratio_min=ovlp_ratio_min,
+            remove_duplicates=remove_duplicates,
+        )
+        # file of each annotation and detection
+        files_index = pd.Index(pd.unique(pd.Series(files_list, dtype=object)))
+        files_pos = files_index.get_indexer(files_list)
+        annot_files = files_index.get_indexer(annot.data["audio_file_name"])
+        detec_files = files_index.get_indexer(detec.data["audio_file_name"])
+        n_annot = np.bincount(annot_files, minlength=len(files_index))
+        detec_confidence = detec.data["confidence"].values.astype(float)
 
         # loop through thresholds
         for th_idx, threshold in enumerate(thresholds):
             print("Threshold value: ", threshold)
-            # filter detections for that threshold value
-            detec_conf = detec.filter(
-                "confidence >= " + str(threshold), inplace=False
+            # detections for that threshold value
+            is_detec = detec_confidence >= threshold
+            n_detec = np.bincount(
+                detec_files[is_detec], minlength=len(files_index)
             )
-            # init
-            FP = np.zeros(len(files_list))
-            TP = np.zeros(len(files_list))
-            FN = np.zeros(len(files_list))
-            # loop through each file
-            # for idx, file in enumerate(
-            #     tqdm(files_list, desc="File", leave=True, miniters=1, colour="red")
-            # ):
-            # for idx, file in enumerate(files_list):
-            for idx, file in enumerate(
-                tqdm(
-                    files_list,
-                    desc="Progress",
-                    leave=True,
-                    miniters=1,
-                    colour="green",
-                )
-            ):
-                # print(idx)
-                # filter to only keep data from this file
-                annot_tmp = annot.filter("audio_file_name == '" + file + "'")
-                detec_tmp = detec_conf.filter(
-                    "audio_file_name=='" + file + "'", inplace=False
+            # annotations overlapping with at least one of these detections
+            annot_tp = np.unique(annot_idx[is_detec[detec_idx]])
+            n_tp = np.bincount(
+                annot_files[annot_tp], minlength=len(files_index)
+            )
+            # count FP, TP, FN for each file
+            TP = n_tp[files_pos].astype(float)
+            FN = (n_annot - n_tp)[files_pos].astype(float)
+            FP = (n_detec - n_tp)[files_pos].astype(float)
+
+            # plot annot and detec boxes
+            if do_plot:
+                detec_conf = detec.filter(
+                    confidence__ge=threshold, inplace=False
                 )
-
-                # count FP, TP, FN:
-                if (
-                    len(annot_tmp) == 0
-                ):  # if no annotations -> FP = nb of detections
-                    FP[idx] = len(detec_tmp)
-                elif (
-                    len(detec_tmp) == 0
-                ):  # if no detections -> FN = nb of annotations
-                    FN[idx] = len(annot_tmp)
-                else:
-                    ovlp = annot_tmp.filter_overlap_with(
-                        detec_tmp,
-                        freq_ovp=freq_ovp,
-                        dur_factor_max=dur_factor_max,
-                        dur_factor_min=dur_factor_min,
-                        ovlp_ratio_min=ovlp_ratio_min,
-                        remove_duplicates=remove_duplicates,
-                        inherit_metadata=inherit_metadata,
-                        filter_deploymentID=filter_deploymentID,
-                        inplace=False,
+                for idx, file in enumerate(
+                    tqdm(
+                        files_list,
+                        desc="Progress",
+                        leave=True,
+                        miniters=1,
+                        colour="green",
                     )
-                    FN[idx] = len(annot_tmp) - len(ovlp)
-                    TP[idx] = len(ovlp)
-                    FP[idx] = len(detec_tmp) - len(ovlp)
-
-                # Sanity check
-                if FP[idx] + TP[idx] != len(detec_tmp):
-                    raise Exception(
-                        "FP and TP don't add up to the total number of detections"
-                    )
-                elif TP[idx] + FN[idx] != len(annot_tmp):
-                    raise Exception(
-                        "FP and FN don't add up to the total number of annotations"
-                    )
-
-                # plot annot and detec boxes
-                if do_plot:
+                ):
+                    annot_tmp = annot.get_by_file(file)
+                    detec_tmp = detec_conf.get_by_file(file)
                     PRF._plot_annot_boxes(
                         [annot_tmp, detec_tmp],
                         out_dir_figs,
@@ -222,11 +201,11 @@ class PRF:
                 }
             )
             # Sanity check
-            if FP_th + TP_th != len(detec_conf):
+            if FP_th + TP_th != n_detec[files_pos].sum():
                 raise Exception(
                     "FP and TP don't add up to the total number of detections"
                 )
-            elif TP_th + FN_th != len(annot):
+            elif TP_th + FN_th != n_annot[files_pos].sum():
                 raise Exception(
                     "FP and FN don't add up to the total number of annotations"
                 )
@@ -318,15 +297,15 @@ class PRF:
 
         # filter dates (if dataset partially annotated)
         if date_min:
-            annot.filter("time_min_date >= '" + date_min + "'", inplace=True)
-            detec.filter("time_min_date >= '" + date_min + "'", inplace=True)
+            annot.filter(time_min_date__ge=date_min, inplace=True)
+            detec.filter(time_min_date__ge=date_min, inplace=True)
         if date_max:
-            annot.filter("time_max_date <= '" + date_max + "'", inplace=True)
-            detec.filter("time_max_date <= '" + date_max + "'", inplace=True)
+            annot.filter(time_max_date__le=date_max, inplace=True)
+            detec.filter(time_max_date__le=date_max, inplace=True)
 
         # filter to the class of interest
-        annot.filter('label_class == "' + target_class + '"', inplace=True)
-        detec.filter('label_class == "' + target_class + '"', inplace=True)
+        annot.filter(label_class=target_class, inplace=True)
+        detec.filter(label_class=target_class, inplace=True)
 
         # Define list of files to use for the performance evaluation.
         if files_to_use:
@@ -352,18 +331,10 @@ class PRF:
             files_list.sort()
 
             # filter annotations with selected files to use
-            annot.filter(
-                "audio_file_name in @files_list",
-                files_list=files_list,
-                inplace=True,
-            )
+            annot.filter(audio_file_name__in=files_list, inplace=True)
 
             # filter detections with selected files to use
-            detec.filter(
-                "audio_file_name in @files_list",
-                files_list=files_list,
-                inplace=True,
-            )
+            detec.filter(audio_file_name__in=files_list, inplace=True)
 
         # Create annootation aggregate
         aggr_min_date = min(
@@ -388,9 +359,7 @@ class PRF:
         for th_idx, threshold in enumerate(thresholds):
             print("Threshold value: ", threshold)
             # filter detections for that threshold value
-            detec_conf = detec.filter(
-                "confidence >= " + str(threshold), inplace=False
-            )
+            detec_conf = detec.filter(confidence__ge=threshold, inplace=False)
 
             # Create detection aggregate
             detec_aggr = detec_conf.calc_time_aggregate_1D(
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of measurement results.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+class MeasurementCache:
+    """
+    On-disk cache of measurement results.
+
+    Stores the measurements calculated by a measurer in a SQLite file so they
+    don't need to be re-calculated when the measurer is run again on the same
+    annotations (e.g. after adding new annotations to a dataset). Cached
+    results are identified by:
+        - the annotation uuid,
+        - a hash of the size and modification time of the audio file,
+        - a hash of the measurer name, version, and measurer parameters.
+    Results are invalidated automatically if the audio file or the measurer
+    configuration change.
+
+    The cache is used by passing it (or the path of the cache file) to the
+    compute method of a measurer:
+
+    snr = MeasurerFactory('SNR', noise_win_sec=1)
+    measurements = snr.compute(annotations, cache='measurements_cache.sqlite')
+
+    Attributes
+    ----------
+    file : str
+        Path of the SQLite cache file.
+
+    Methods
+    -------
+    lookup(annotations, measurer)
+        Retrieve cached measurements and list annotations not in the cache.
+    store(features, annotations, measurer)
+        Write measurements to the cache.
+    clear()
+        Delete all cached measurements.
+    """
+
+    table_name = "measurements"
+
+    def __init__(self, file):
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        file : str
+            Path of the SQLite cache file. Created if it doesn't exist.
+
+        Returns
+        -------
+        None. MeasurementCache object.
+
+        """
+        if file.endswith(".sqlite") is False:
+            file = file + ".sqlite"
+        self.file = file
+        conn = sqlite3.connect(self.file)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS "
+            + self.table_name
+            + " (uuid TEXT, audio_key TEXT, measurer_key TEXT,"
+            + " measurements TEXT,"
+            + " PRIMARY KEY (measurer_key, uuid, audio_key))"
+        )
+        conn.commit()
+        conn.close()
+
+    def lookup(self, annotations, measurer, options=None):
+        """
+        Retrieve cached measurements.
+
+        Parameters
+        ----------
+        annotations : pandas DataFrame
+            Annotations to measure (Annotation.data).
+        measurer : Measurer object
+            Measurer used to calculate the measurements.
+        options : dict, optional
+            Additional settings affecting the measurements that are not
+            measurer parameters (e.g. calculation mode). The default is None.
+
+        Returns
+        -------
+        cached : pandas DataFrame
+            Cached measurements with a 'uuid' column and a column for each
+            measurement.
+        missing : pandas DataFrame
+            Rows of annotations that are not in the cache.
+
+        """
+        measurer_key = MeasurementCache.measurer_key(measurer, options)
+        audio_keys = MeasurementCache.audio_keys(annotations)
+        conn = sqlite3.connect(self.file)
+        rows = pd.read_sql_query(
+            "SELECT uuid, audio_key, measurements FROM "
+            + self.table_name
+            + " WHERE measurer_key = ?",
+            conn,
+            params=[measurer_key],
+        )
+        conn.close()
+        keys = pd.DataFrame(
+            {"uuid": annotations["uuid"].values, "audio_key": audio_keys}
+        )
+        keys = keys.merge(rows, on=["uuid", "audio_key"], how="left")
+        is_cached = keys["measurements"].notna().values
+        cached = pd.DataFrame(
+            [json.loads(meas) for meas in keys["measurements"][is_cached]]
+        )
+        cached.insert(0, "uuid", keys["uuid"][is_cached].values)
+        missing = annotations[~is_cached]
+        return cached, missing
+
+    def store(self, features, annotations, measurer, options=None):
+        """
+        Write measurements to the cache.
+
+        Parameters
+        ----------
+        features : pandas DataFrame
+            Measurements with a 'uuid' column and a column for each
+            measurement.
+        annotations : pandas DataFrame
+            Annotations that were measured (Annotation.data).
+        measurer : Measurer object
+            Measurer used to calculate the measurements.
+        options : dict, optional
+            Additional settings affecting the measurements that are not
+            measurer parameters (e.g. calculation mode). The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        if len(features) == 0:
+            return
+        measurer_key = MeasurementCache.measurer_key(measurer, options)
+        audio_keys = pd.Series(
+            MeasurementCache.audio_keys(annotations),
+            index=annotations["uuid"].values,
+        )
+        features = features.reset_index(drop=("uuid" in features.columns))
+        features_name = [col for col in features.columns if col != "uuid"]
+        records = features[features_name].to_dict(orient="records")
+        rows = [
+            (
+                uuid,
+                audio_keys[uuid],
+                measurer_key,
+                json.dumps(record, default=MeasurementCache._to_json),
+            )
+            for uuid, record in zip(features["uuid"], records)
+        ]
+        conn = sqlite3.connect(self.file)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO "
+                + self.table_name
+                + " (uuid, audio_key, measurer_key, measurements)"
+                + " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        conn.close()
+
+    def clear(self):
+        """Delete all cached measurements."""
+        conn = sqlite3.connect(self.file)
+        with conn:
+            conn.execute("DELETE FROM " + self.table_name)
+        conn.close()
+
+    @staticmethod
+    def measurer_key(measurer, options=None):
+        """Return hash of the measurer name, version, parameters and options."""
+        params = dict()
+        for param in measurer.measurer_parameters:
+            params[param] = measurer.__dict__.get(param)
+        key = json.dumps(
+            {
+                "name": measurer.name,
+                "version": measurer.version,
+                "parameters": params,
+                "options": options,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def spectrogram_key(spectro):
+        """Return hash of the values and axes of a spectrogram.
+
+        Used to identify measurements calculated from a spectrogram (e.g. a
+        raw and a denoised spectrogram of the same audio data give different
+        keys).
+        """
+        key = hashlib.sha1()
+        for values in (
+            spectro.spectrogram,
+            spectro.axis_times,
+            spectro.axis_frequencies,
+        ):
+            values = np.ascontiguousarray(values)
+            key.update(str((values.dtype, values.shape)).encode("utf-8"))
+            key.update(values.tobytes())
+        return key.hexdigest()
+
+    @staticmethod
+    def audio_keys(annotations):
+        """Return hash of the size and modification time of audio files.
+
+        Annotations whose audio file can't be found get an empty key.
+        """
+        files = [
+            os.path.join(x, y) + z
+            for x, y, z in zip(
+                annotations["audio_file_dir"],
+                annotations["audio_file_name"],
+                annotations["audio_file_extension"],
+            )
+        ]
+        keys = dict()
+        for file in set(files):
+            try:
+                stat = os.stat(file)
+                key = str(stat.st_size) + "-" + str(stat.st_mtime_ns)
+                keys[file] = hashlib.sha1(key.encode("utf-8")).hexdigest()
+            except OSError:
+                keys[file] = ""
+        return [keys[file] for file in files]
+
+    @staticmethod
+    def _to_json(value):
+        """Convert numpy values for JSON serialization."""
+        if hasattr(value, "item"):
+            return value.item()
+        return str(value)
@@ -4,6 +4,9 @@ Created on Thu Apr 22 10:02:51 2020
 
 @author: xavier.mouy
 """
+import copy
+import pandas as pd
+from .measurement_cache import MeasurementCache
 
 
 class BaseClass(object):
@@ -36,6 +39,51 @@ class BaseClass(object):
         """
         return measurer_name == cls.__name__
 
+    def _cache_lookup(self, annotations, cache, options=None):
+        """
+        Retrieve measurements already in the cache.
+
+        Parameters
+        ----------
+        annotations : ecosound Annotation object
+            Annotations to measure.
+        cache : str, MeasurementCache object, or None
+            Measurement cache (or path of the cache file). If None, the cache
+            is not used.
+        options : dict, optional
+            Additional settings affecting the measurements that are not
+            measurer parameters. The default is None.
+
+        Returns
+        -------
+        cache : MeasurementCache object or None
+            Measurement cache.
+        cached : pandas DataFrame or None
+            Cached measurements (with a 'uuid' column).
+        annotations : ecosound Annotation object
+            Annotations that still need to be measured.
+
+        """
+        if cache is None:
+            return None, None, annotations
+        if not isinstance(cache, MeasurementCache):
+            cache = MeasurementCache(cache)
+        cached, missing = cache.lookup(annotations.data, self, options=options)
+        annotations_todo = copy.copy(annotations)
+        annotations_todo.data = missing
+        return cache, cached, annotations_todo
+
+    def _cache_store(self, cache, cached, features, annotations, options=None):
+        """
+        Write new measurements to the cache and merge with cached ones.
+
+        Returns the measurements for all annotations (with a 'uuid' column).
+        """
+        if cache is None:
+            return features
+        cache.store(features, annotations.data, self, options=options)
+        return pd.concat([cached, features], ignore_index=True)
+
 
 def MeasurerFactory(measurer_name, *args, **kwargs):
     """
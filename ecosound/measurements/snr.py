@@ -6,10 +6,13 @@ Created on Fri Feb  7 15:27:39 2020
 """
 
 from .measurer_builder import BaseClass
+from .measurement_cache import MeasurementCache
 from ecosound.core.annotation import Annotation
 from ecosound.core.measurement import Measurement
-from ecosound.core.audiotools import Sound
+from ecosound.core.spectrogram import Spectrogram
+from ecosound.core.audiotools import Sound, Filter
 import numpy as np
+import soundfile as sf
 import pandas as pd
 from dask import delayed, compute, visualize
 import os
@@ -62,7 +65,7 @@ class SNR(BaseClass):
         version = "0.1"
         return version
 
-    def _prerun_check(self, annotations):
+    def _prerun_check(self, annotations, spectro=None):
         """Run several verifications before the run."""
         # check that all required arguments are defined
         if True in [
@@ -80,13 +83,36 @@ class SNR(BaseClass):
                 "Input must be an ecosound Annotation object"
                 + "(ecosound.core.annotation)."
             )
+        # check that spectro is a Spectrogram class
+        if (spectro is not None) and (not isinstance(spectro, Spectrogram)):
+            raise ValueError(
+                "Input must be an ecosound Spectrogram object"
+                + "(ecosound.core.spectrogram)."
+            )
 
-    def compute(self, annotations, debug=False, verbose=False, use_dask=False):
+    def compute(
+        self,
+        annotations,
+        debug=False,
+        verbose=False,
+        use_dask=False,
+        spectro=None,
+        spectro_dB=True,
+        cache=None,
+    ):
         """Compute signal-to-noise-ratio of annotations.
 
         Goes through each annotation and computes the SNR by estinating the
         power of the noise before and after the annotation. Measurements are
-        performed on the band-pass filtered waveform.
+        performed on the band-pass filtered waveform. Annotations are
+        processed by audio file: each file is opened once and the audio data
+        covering overlapping annotations are read in a single block.
+
+        If a Spectrogram object is provided (spectro), the SNR is instead
+        estimated directly from the spectrogram, without reading any audio
+        data: the signal power is measured in the time-frequency box of each
+        annotation and the noise power in the same frequency band before and
+        after the annotation (see compute_from_spectrogram).
 
         Parameters
         ----------
@@ -94,15 +120,26 @@ class SNR(BaseClass):
             Annotations of the sounds to measure. Can be from manual analysis
             or from an automatic detector.
         use_dask : bool, optional
-            If True, run the measurer in parallele using Dask. The default is
-            False.
+            If True, run the measurer in parallele using Dask (one task per
+            audio file). The default is False.
         debug : bool, optional
             Displays figures for each annotation with the spectrogram, spectral
             and time envelopes, and tables with all associated measurements.
             The default is False.
         verbose : bool, optional
-            Prints in the console the annotation being processed. The default
+            Prints in the console the audio file being processed. The default
             is False.
+        spectro : ecosound Spectrogram object, optional
+            Spectrogram of the recording the annotations are from (e.g. the
+            spectrogram already computed by the detector). If provided, SNR is
+            measured in the spectrogram domain. The default is None.
+        spectro_dB : bool, optional
+            Set to True if the values of spectro are in dB. Only used if spectro
+            is provided. The default is True.
+        cache : str or MeasurementCache object, optional
+            Measurement cache (or path of the SQLite cache file). If provided,
+            only annotations not already in the cache are measured, and new
+            measurements are added to the cache. The default is None.
 
         Returns
         -------
@@ -113,36 +150,38 @@ class SNR(BaseClass):
             are in the .metadata datafreame.
 
         """
-        self._prerun_check(annotations)
+        self._prerun_check(annotations, spectro)
 
         # init
         features = self._init_dataframe()
         features_name = list(features.columns)
-        # loop through each annotation
-        df_list = []
-        for index, annot in annotations.data.iterrows():
-            if verbose:
-                print(
-                    "processing annotation ",
-                    index,
-                    annot["time_min_offset"],
-                    "-",
-                    annot["time_max_offset"],
-                )
-
-            # feature for 1 annot
-            if use_dask:
-                df = delayed(self.compute_single_annot)(annot, debug)
-            else:
-                df = self.compute_single_annot(annot, debug)
-            # stack features for each annotation
-            df_list.append(df)
-        if use_dask:
-            features = delayed(pd.concat)(df_list, ignore_index=False)
-            # features.visualize('measuremnets')
-            features = features.compute()
+        if spectro is not None:
+            cache_options = {
+                "domain": "spectrogram",
+                "spectro_dB": spectro_dB,
+                "time_resolution": spectro.time_resolution,
+                "frequency_resolution": spectro.frequency_resolution,
+            }
+            if cache is not None:
+                # content of the spectrogram (e.g. raw or denoised)
+                spectro_key = MeasurementCache.spectrogram_key(spectro)
+                cache_options["spectrogram"] = spectro_key
         else:
-            features = pd.concat(df_list, ignore_index=False)
+            cache_options = {"domain": "audio"}
+        cache, cached, annots_todo = self._cache_lookup(
+            annotations, cache, options=cache_options
+        )
+        if spectro is not None:  # spectrogram domain: no audio data read
+            features = self.compute_from_spectrogram(
+                spectro, annots_todo.data, spectro_dB=spectro_dB
+            )
+        else:
+            features = self._compute_from_audio(
+                annots_todo, debug=debug, verbose=verbose, use_dask=use_dask
+            )
+        features = self._cache_store(
+            cache, cached, features, annots_todo, options=cache_options
+        )
         # merge with annotation fields
         annotations.data.set_index("uuid", inplace=True, drop=False)
         features.set_index("uuid", inplace=True, drop=True)
@@ -171,39 +210,323 @@ class SNR(BaseClass):
         )
         return tmp
 
-    def compute_single_annot(self, annot, debug):
-        # load sound file properties
-        sound = Sound(
-            os.path.join(annot["audio_file_dir"], annot["audio_file_name"])
-            + annot["audio_file_extension"]
+    def _compute_from_audio(self, annotations, debug, verbose, use_dask):
+        """Compute SNR of annotations from the audio files."""
+        # group annotations by audio file so each file is only opened once
+        files_path = [
+            os.path.join(x, y) + z
+            for x, y, z in zip(
+                annotations.data["audio_file_dir"],
+                annotations.data["audio_file_name"],
+                annotations.data["audio_file_extension"],
+            )
+        ]
+        df_list = []
+        for file_path, file_annots in annotations.data.groupby(
+            files_path, sort=False
+        ):
+            if verbose:
+                print(
+                    "processing file ",
+                    file_path,
+                    "(" + str(len(file_annots)) + " annotations)",
+                )
+            # features for all annotations of 1 file
+            if debug:  # plots each annotation individually
+                df = pd.concat(
+                    [
+                        self.compute_single_annot(annot, debug)
+                        for _, annot in file_annots.iterrows()
+                    ],
+                    ignore_index=False,
+                )
+            elif use_dask:
+                df = delayed(self.compute_single_file)(file_path, file_annots)
+            else:
+                df = self.compute_single_file(file_path, file_annots)
+            # stack features for each file
+            df_list.append(df)
+        if len(df_list) == 0:
+            features = pd.DataFrame({"uuid": [], "snr": []})
+        elif use_dask and not debug:
+            features = delayed(pd.concat)(df_list, ignore_index=False)
+            # features.visualize('measuremnets')
+            features = features.compute()
+        else:
+            features = pd.concat(df_list, ignore_index=False)
+        return features
+
+    def compute_from_spectrogram(self, spectro, annots, spectro_dB=True):
+        """Compute SNR of annotations from a spectrogram.
+
+        The signal power is the mean power of the spectrogram bins inside the
+        time-frequency box of each annotation. The noise power is the mean
+        power of the bins in the same frequency band, in the time windows
+        before and after the annotation (defined by noise_win_sec). A single
+        2-D cumulative sum (summed-area table) of the spectrogram is
+        calculated so the power in any box is obtained with 4 look-ups,
+        regardless of its size. Annotation times must be relative to the
+        start of the spectrogram.
+
+        Parameters
+        ----------
+        spectro : ecosound Spectrogram object
+            Spectrogram of the recording the annotations are from.
+        annots : pandas DataFrame
+            Annotations (Annotation.data) to measure.
+        spectro_dB : bool, optional
+            Set to True if the values of the spectrogram are in dB. The
+            default is True.
+
+        Returns
+        -------
+        pandas DataFrame
+            DataFrame with the columns 'uuid' and 'snr'.
+
+        """
+        # spectrogram power
+        if spectro_dB:
+            power = np.power(10, spectro.spectrogram / 10)
+        else:
+            power = np.square(spectro.spectrogram)
+        n_freqs, n_times = power.shape
+        # summed-area table (zero padded on first row and column)
+        sat = np.zeros((n_freqs + 1, n_times + 1))
+        sat[1:, 1:] = np.cumsum(np.cumsum(power, axis=0), axis=1)
+
+        # noise windows duration
+        duration = annots["duration"].values.astype(float)
+        if self.noise_win_sec == "auto":
+            half_noise_win_dur = duration / 2
+        else:
+            half_noise_win_dur = np.full(len(annots), self.noise_win_sec / 2)
+
+        # time and frequency boundaries, in bins
+        axis_t = spectro.axis_times
+        axis_f = spectro.axis_frequencies
+        t1 = annots["time_min_offset"].values.astype(float)
+        t2 = annots["time_max_offset"].values.astype(float)
+        row_start = np.searchsorted(axis_f, annots["frequency_min"].values, "left")
+        row_stop = np.searchsorted(axis_f, annots["frequency_max"].values, "right")
+        noise_left_start = np.searchsorted(axis_t, t1 - half_noise_win_dur, "left")
+        sig_start = np.searchsorted(axis_t, t1, "left")
+        sig_stop = np.searchsorted(axis_t, t2, "right")
+        noise_right_stop = np.searchsorted(
+            axis_t, t2 + half_noise_win_dur, "right"
+        )
+
+        # energies
+        sig_pw = SNR._box_sum(sat, row_start, row_stop, sig_start, sig_stop)
+        noise_pw = SNR._box_sum(
+            sat, row_start, row_stop, noise_left_start, sig_start
+        ) + SNR._box_sum(sat, row_start, row_stop, sig_stop, noise_right_stop)
+        n_rows = row_stop - row_start
+        sig_bins = n_rows * (sig_stop - sig_start)
+        noise_bins = n_rows * (
+            (sig_start - noise_left_start) + (noise_right_stop - sig_stop)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            snr = 10 * np.log10(
+                (sig_pw / sig_bins) / (noise_pw / noise_bins)
+            )
+        # annotations with empty signal or noise boxes
+        snr[(sig_bins <= 0) | (noise_bins <= 0)] = np.nan
+        return pd.DataFrame({"uuid": annots["uuid"].values, "snr": snr})
+
+    @staticmethod
+    def _box_sum(sat, row_start, row_stop, col_start, col_stop):
+        """Sum of values in boxes [row_start:row_stop, col_start:col_stop]."""
+        return (
+            sat[row_stop, col_stop]
+            - sat[row_start, col_stop]
+            - sat[row_stop, col_start]
+            + sat[row_start, col_start]
         )
 
+    def _time_windows(self, annot, file_duration_sec):
+        """Return start/stop times of the left noise, signal and right noise.
+
+        Returns a list [noise_left_start, noise_left_end, noise_right_start,
+        noise_right_end], in seconds, or None if the annotation is completely
+        outside of the recording.
+        """
+        time_min = annot["time_min_offset"]
+        time_max = annot["time_max_offset"]
         # verify that time boundaries are correct and fit into the duration of the sound file
-        if annot["time_max_offset"] > sound.file_duration_sec:
-            annot["time_max_offset"] = sound.file_duration_sec
+        if time_max > file_duration_sec:
+            time_max = file_duration_sec
             print('The annotation end time was adjusted as it exceeded the end time of the audio recording.')
+        if time_min >= file_duration_sec: # if annotation is completely outside teh recording -> discard
+            return None
+
+        # define duration of noise window
+        if self.noise_win_sec == "auto":
+            half_noise_win_dur = annot["duration"] / 2
+        else:
+            half_noise_win_dur = self.noise_win_sec / 2
 
-        if annot["time_min_offset"] < sound.file_duration_sec: # if annotation is completely outside teh recording -> discard
+        # define left noise window
+        noise_left_start = max(time_min - half_noise_win_dur, 0)
+        noise_left_end = time_min
 
-            # define duration of noise window
-            if self.noise_win_sec == "auto":
-                half_noise_win_dur = annot.duration / 2
-            else:
-                half_noise_win_dur = self.noise_win_sec / 2
+        # define right noise window
+        noise_right_start = time_max
+        noise_right_end = min(
+            noise_right_start + half_noise_win_dur, file_duration_sec
+        )
+        return [
+            noise_left_start,
+            noise_left_end,
+            noise_right_start,
+            noise_right_end,
+        ]
+
+    @staticmethod
+    def _snr_from_waveform(waveform, times_samp):
+        """Calculate SNR from a filtered waveform and window sample indices."""
+        # remove DC offset (amplitude normalization cancels out in the ratio)
+        waveform = waveform - np.mean(waveform)
+        noise_left = waveform[int(times_samp[0]) : int(times_samp[1])]
+        sig = waveform[int(times_samp[1]) : int(times_samp[2])]
+        noise_right = waveform[int(times_samp[2]) : int(times_samp[3])]
+        noise_rms = np.sqrt(
+            (np.sum(noise_left**2) + np.sum(noise_right**2))
+            / (len(noise_left) + len(noise_right))
+        )
+        sig_rms = np.sqrt(np.sum(sig**2) / len(sig))
+        return 20 * np.log10(sig_rms / noise_rms)
+
+    @staticmethod
+    def _merge_spans(starts, stops):
+        """Merge overlapping [start, stop] sample spans.
 
-            # define left noise window
-            noise_left_start = annot["time_min_offset"] - half_noise_win_dur
-            if noise_left_start < 0:
-                noise_left_end = annot["time_min_offset"]
-                noise_left_start = 0
+        Returns the merged spans as a list of [start, stop] and, for each
+        input span, the index of the merged span covering it.
+        """
+        order = np.argsort(starts, kind="stable")
+        spans = []
+        span_idx = np.zeros(len(starts), dtype=int)
+        for idx in order:
+            if (len(spans) > 0) and (starts[idx] <= spans[-1][1]):
+                spans[-1][1] = max(spans[-1][1], stops[idx])
             else:
-                noise_left_end = annot["time_min_offset"]
+                spans.append([starts[idx], stops[idx]])
+            span_idx[idx] = len(spans) - 1
+        return spans, span_idx
 
-            # define right noise window
-            noise_right_start = annot["time_max_offset"]
-            noise_right_end = noise_right_start + half_noise_win_dur
-            if noise_right_end > sound.file_duration_sec:
-                noise_right_end = sound.file_duration_sec
+    @staticmethod
+    def _get_filter(frequency_min, frequency_max, sampling_frequency):
+        """Return the band-pass Filter object for an annotation.
+
+        Uses the same rules as Sound.filter to switch from band-pass to
+        low-pass or high-pass filters.
+        """
+        filter_type = "bandpass"
+        cutoff_frequencies = [frequency_min, frequency_max]
+        if min(cutoff_frequencies) <= 0:
+            cutoff_frequencies = [max(cutoff_frequencies)]
+            filter_type = "lowpass"
+        if (filter_type == "bandpass") and (
+            max(cutoff_frequencies) >= sampling_frequency / 2
+        ):
+            cutoff_frequencies = [min(cutoff_frequencies)]
+            filter_type = "highpass"
+        return Filter(filter_type, cutoff_frequencies, order=10)
+
+    def compute_single_file(self, file_path, annots):
+        """Compute SNR of all annotations from a single audio file.
+
+        The audio file is opened once. Time windows of all annotations are
+        merged into non-overlapping spans that are each read only once.
+        Windows with the same frequency band and length are band-pass filtered
+        together in a single call.
+
+        Parameters
+        ----------
+        file_path : str
+            Full path of the audio file.
+        annots : pandas DataFrame
+            Annotations (rows of Annotation.data) from that audio file.
+
+        Returns
+        -------
+        pandas DataFrame
+            DataFrame with the columns 'uuid' and 'snr'.
+
+        """
+        snr = np.full(len(annots), np.nan)
+        with sf.SoundFile(file_path) as audio_file:
+            fs = audio_file.samplerate
+            file_duration_sample = audio_file.seek(0, sf.SEEK_END)
+            file_duration_sec = file_duration_sample / fs
+
+            # define time windows of each annotation (in samples)
+            windows = []
+            for idx, (_, annot) in enumerate(annots.iterrows()):
+                times_sec = self._time_windows(annot, file_duration_sec)
+                if times_sec is None:
+                    print('Annotation outside of audio recording.')
+                    continue
+                times_samp = np.round(np.dot(times_sec, fs))
+                if (
+                    (times_samp[0] < 0)
+                    | (times_samp[0] >= file_duration_sample)
+                    | (times_samp[3] > file_duration_sample)
+                    | (times_samp[3] <= times_samp[0])
+                ):
+                    print(annot)
+                    raise Exception("error with time boundaries")
+                windows.append((idx, annot, times_samp))
+            if len(windows) == 0:
+                return pd.DataFrame({"uuid": annots["uuid"].values, "snr": snr})
+
+            # read each merged span of audio data only once
+            spans, span_idx = self._merge_spans(
+                [int(w[2][0]) for w in windows],
+                [int(w[2][3]) for w in windows],
+            )
+            buffers = []
+            for span_start, span_stop in spans:
+                audio_file.seek(span_start)
+                sig = audio_file.read(
+                    frames=span_stop - span_start, always_2d=True
+                )
+                buffers.append(sig[:, 0])
+
+        # group windows with the same frequency band and length so they are
+        # filtered together in a single call
+        batches = dict()
+        for (idx, annot, times_samp), span_id in zip(windows, span_idx):
+            offset = spans[span_id][0]
+            waveform = buffers[span_id][
+                int(times_samp[0]) - offset : int(times_samp[3]) - offset
+            ]
+            key = (annot["frequency_min"], annot["frequency_max"], len(waveform))
+            batches.setdefault(key, []).append((idx, times_samp, waveform))
+
+        # calculate SNR of each annotation
+        for (freq_min, freq_max, _), batch in batches.items():
+            try:
+                my_filter = self._get_filter(freq_min, freq_max, fs)
+                waveforms = my_filter.apply_batch([w[2] for w in batch], fs)
+            except:
+                print(annots.iloc[batch[0][0]])
+                raise Exception("error with frequency filtering")
+            for (idx, times_samp, _), waveform in zip(batch, waveforms):
+                snr[idx] = self._snr_from_waveform(
+                    waveform, times_samp - times_samp[0]
+                )
+        return pd.DataFrame({"uuid": annots["uuid"].values, "snr": snr})
+
+    def compute_single_annot(self, annot, debug):
+        # load sound file properties
+        sound = Sound(
+            os.path.join(annot["audio_file_dir"], annot["audio_file_name"])
+            + annot["audio_file_extension"]
+        )
+        times_sec = self._time_windows(annot, sound.file_duration_sec)
+        if times_sec is not None:
+            noise_left_start, noise_left_end, noise_right_start, noise_right_end = times_sec
 
             # load sound data chunk
             try:
@@ -230,39 +553,10 @@ class SNR(BaseClass):
 
             # calculate energies
             times_samp = np.round(
-                np.dot(
-                    [
-                        noise_left_start,
-                        noise_left_end,
-                        noise_right_start,
-                        noise_right_end,
-                    ],
-                    sound.waveform_sampling_frequency,
-                )
+                np.dot(times_sec, sound.waveform_sampling_frequency)
             )
             times_samp = times_samp - times_samp[0]
-            noise_left = sound.waveform[int(times_samp[0]) : int(times_samp[1])]
-            sig = sound.waveform[int(times_samp[1]) : int(times_samp[2])]
-            noise_right = sound.waveform[int(times_samp[2]) : int(times_samp[3])]
-            # noise_pw = (sum(noise_left**2) + sum(noise_right**2)) / (
-            #     len(noise_left) + len(noise_right)
-            # )
-            # sig_pw = sum(sig**2) / len(sig)
-
-            noise_rms = np.sqrt(
-                (sum(noise_left**2) + sum(noise_right**2))
-                / (len(noise_left) + len(noise_right))
-            )
-            sig_rms = np.sqrt(sum(sig**2) / len(sig))
-
-            # noise_var = np.sqrt((sum(noise_left**2) + sum(noise_right**2)))
-
-            # try:
-            snr = 20 * np.log10(sig_rms / noise_rms)
-            # snr = 10 * np.log10(sig_pw / noise_pw)
-            # except:
-            #    print("Error")
-            #    snr = np.nan
+            snr = self._snr_from_waveform(sound.waveform, times_samp)
 
             if debug:
                 sound.plot(newfig=True, title=str(round(snr, 1)))
@@ -6,6 +6,7 @@ Created on Fri Feb  7 15:27:39 2020
 """
 
 from .measurer_builder import BaseClass
+from .measurement_cache import MeasurementCache
 from ecosound.core.annotation import Annotation
 from ecosound.core.spectrogram import Spectrogram
 from ecosound.core.measurement import Measurement
@@ -198,6 +199,10 @@ class SpectrogramFeatures(BaseClass):
         verbose : bool, optional
             Prints in the console the annotation being processed. The default
             is False.
+        cache : str or MeasurementCache object, optional
+            Measurement cache (or path of the SQLite cache file). If provided,
+            only annotations not already in the cache are measured, and new
+            measurements are added to the cache. The default is None.
 
         Returns
         -------
@@ -356,7 +361,7 @@ class SpectrogramFeatures(BaseClass):
         measurements.data = meas
         return measurements
 
-    def compute(self, spectro, annotations, debug=False, verbose=False, use_dask=False):
+    def compute(self, spectro, annotations, debug=False, verbose=False, use_dask=False, cache=None):
         """ Compute spectrogram features.
 
         Goes through each annotation and compute features from the spectrogram.
@@ -393,9 +398,15 @@ class SpectrogramFeatures(BaseClass):
         #init
         features = self._init_dataframe()
         features_name = list(features.columns)
+        cache_options = {'time_resolution': spectro.time_resolution,
+                         'frequency_resolution': spectro.frequency_resolution}
+        if cache is not None:
+            # content of the spectrogram (e.g. raw or denoised)
+            cache_options['spectrogram'] = MeasurementCache.spectrogram_key(spectro)
+        cache, cached, annots_todo = self._cache_lookup(annotations, cache, options=cache_options)
         # loop through each annotation
         df_list=[]
-        for index, annot in annotations.data.iterrows():
+        for index, annot in annots_todo.data.iterrows():
             if verbose:
                 print('processing annotation ', index, annot['time_min_offset'], '-' ,annot['time_max_offset'])
             #if index == 555:
@@ -411,12 +422,15 @@ class SpectrogramFeatures(BaseClass):
                 df = self.compute_single_annot(annot, spectro, debug)
             # stack features for each annotation
             df_list.append(df)
-        if use_dask:
+        if len(df_list) == 0:
+            pass
+        elif use_dask:
             features = delayed(pd.concat)(df_list, ignore_index=False)
             #features.visualize('measuremnets')
             features = features.compute()
         else:
             features = pd.concat(df_list, ignore_index=False)
+        features = self._cache_store(cache, cached, features, annots_todo, options=cache_options)
         # merge with annotation fields
         annotations.data.set_index('uuid', inplace=True, drop=False)
         features.set_index('uuid', inplace=True, drop=True)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures for the ecosound tests.
+"""
+import uuid
+import pandas as pd
+import pytest
+from ecosound.core.annotation import Annotation
+
+
+def build_annotations(boxes, audio_file_name='file1', deployment_ID='dep1'):
+    """ Create Annotation object from list of (t_min, t_max, f_min, f_max)."""
+    annot = Annotation()
+    annot.data = pd.DataFrame({
+        'time_min_offset': [float(box[0]) for box in boxes],
+        'time_max_offset': [float(box[1]) for box in boxes],
+        'frequency_min': [float(box[2]) for box in boxes],
+        'frequency_max': [float(box[3]) for box in boxes],
+        }).reindex(columns=annot.data.columns)
+    annot.data['uuid'] = [str(uuid.uuid4()) for _ in boxes]
+    annot.data['duration'] = annot.data['time_max_offset'] - annot.data['time_min_offset']
+    annot.data['audio_file_name'] = audio_file_name
+    annot.data['deployment_ID'] = deployment_ID
+    annot.data['label_class'] = 'det'
+    annot.data['label_subclass'] = ''
+    annot.data['audio_channel'] = 1
+    annot.data['audio_sampling_frequency'] = 4000
+    annot.data['audio_bit_depth'] = 16
+    annot.check_integrity(verbose=False)
+    return annot
+
+
+@pytest.fixture
+def make_annotations():
+    """ Return function creating Annotation object from list of boxes."""
+    return build_annotations
@@ -6,7 +6,12 @@ Created on Tue Dec 22 11:52:11 2020
 """
 #import pytest
 import os
+import copy
+import numpy as np
+import pandas as pd
+import pytest
 from ecosound.core.annotation import Annotation
+from ecosound.core.predicate import Predicate
 
 
 def get_paths():
@@ -67,6 +72,440 @@ def test_from_raven_dir():
     assert len(annot) == total_annotations
     return None
 
-# print(len(annot2))
 
+def test_import_csv_files_errors():
+    """ Test parallel import of Raven files with files that can't be read."""
+    paths = get_paths()
+    files = [os.path.join(paths['raven_annot_dir'], file['filename']) for file in paths['raven_annot_files']]
+    expected = pd.concat([pd.read_csv(file, delimiter='\t') for file in files], ignore_index=True)
+    data = Annotation._import_csv_files(files + files, n_jobs=2)
+    pd.testing.assert_frame_equal(data.iloc[:len(expected)], expected, check_dtype=False)
+    assert len(data) == 2 * len(expected)
+    with pytest.raises(FileNotFoundError):
+        Annotation._import_csv_files(files + ['missing.selections.txt'])
+    with pytest.warns(UserWarning, match='missing.selections.txt'):
+        data = Annotation._import_csv_files(files + ['missing.selections.txt'], errors='warn')
+    assert len(data) == len(expected)
+    with pytest.raises(ValueError, match='None of the files'):
+        Annotation().from_raven(['missing.selections.txt'], errors='warn')
+    # explicit data types
+    data = Annotation._import_csv_files(files, dtype={'Selection': str})
+    assert data['Selection'].dtype == object
+    with pytest.raises(ValueError):
+        Annotation().from_raven(files, dtype={'Sound type': 'int64'})
+    return None
+
+
+def test_filter_overlap_with(make_annotations):
+    """ Test that only overlapping detections are kept."""
+    detec = make_annotations([(0, 1, 100, 200),    # inside annotation 1
+                              (0.5, 3, 100, 200),  # overlaps annotations 1 and 2
+                              (3, 4, 100, 200),    # touches annotation 2
+                              (1.5, 2.5, 500, 600),  # no overlap in frequency
+                              (8, 9, 100, 200)])   # no overlap
+    detec2 = make_annotations([(0, 1, 100, 200)], audio_file_name='file2')
+    detec = detec + detec2
+    annot = make_annotations([(0, 2, 50, 250), (2.5, 3, 50, 250)])
+    annot.data['label_class'] = ['A', 'B']
+    ovlp = detec.filter_overlap_with(annot, inherit_metadata=True)
+    assert list(ovlp.data['time_min_offset']) == [0, 0.5, 0.5]
+    assert list(ovlp.data['label_class']) == ['A', 'A', 'B']
+    ovlp = detec.filter_overlap_with(annot, freq_ovp=False)
+    assert list(ovlp.data['time_min_offset']) == [0, 0.5, 1.5]
+    ovlp = detec.filter_overlap_with(annot, remove_duplicates=True, inherit_metadata=True)
+    assert list(ovlp.data['time_min_offset']) == [0.5, 0.5]
+    ovlp = detec.filter_overlap_with(annot, ovlp_ratio_min=0.8, inherit_metadata=True)
+    assert list(ovlp.data['label_class']) == ['B']
+    return None
+
+
+def test_overlap_join(make_annotations):
+    """ Test pairs of overlapping annotations and their overlap ratios."""
+    detec = make_annotations([(0, 1, 100, 200),
+                              (0.5, 3, 100, 200),
+                              (8, 9, 100, 200)])
+    annot = make_annotations([(0, 2, 50, 250), (2.5, 3, 50, 250)])
+    pairs = detec.overlap_join(annot)
+    assert list(pairs['index_self']) == [0, 1, 1]
+    assert list(pairs['index_other']) == [0, 0, 1]
+    assert list(pairs['uuid_self']) == list(detec.data['uuid'].values[[0, 1, 1]])
+    assert list(pairs['ovlp_duration']) == [1, 1.5, 0.5]
+    assert list(pairs['ovlp_ratio_self']) == [1, 0.6, 0.2]
+    assert list(pairs['ovlp_ratio_other']) == [0.5, 0.75, 1]
+    assert len(detec.overlap_join(make_annotations([(0, 2, 50, 250)], audio_file_name='file2'))) == 0
+    return None
+
+
+def test_merge_overlapped(make_annotations):
+    """ Test that overlapping annotations are merged together."""
+    annot = make_annotations([(5, 6, 100, 200),
+                              (0, 2, 100, 200),
+                              (1, 3, 300, 400),
+                              (2.5, 4, 100, 150),  # overlaps only with 2nd one
+                              (4.2, 4.5, 100, 200)])
+    merged = annot.merge_overlapped()
+    assert list(merged.data['time_min_offset']) == [0, 4.2, 5]
+    assert list(merged.data['time_max_offset']) == [4, 4.5, 6]
+    np.testing.assert_allclose(merged.data['duration'], [4, 0.3, 1])
+    assert list(merged.data['frequency_max']) == [400, 200, 200]
+    assert merged.data['uuid'][0] == annot.data['uuid'][1]
+    merged = annot.merge_overlapped(time_tolerance_sec=0.25)
+    assert list(merged.data['time_min_offset']) == [0, 5]
+    assert list(annot.data['time_min_offset']) == [5, 0, 1, 2.5, 4.2]
+    # tolerance is added on both sides: gaps < 2 * time_tolerance_sec merged
+    annot = make_annotations([(0, 1, 100, 200), (2, 3, 100, 200)])
+    assert len(annot.merge_overlapped(time_tolerance_sec=0.5)) == 2
+    merged = annot.merge_overlapped(time_tolerance_sec=0.625)
+    assert len(merged) == 1
+    assert list(merged.data['time_max_offset']) == [3]
+    return None
+
+
+def test_merge_overlapped_with_rules(make_annotations):
+    """ Test merge rules applied to merged annotations."""
+    annot = make_annotations([(0, 2, 100, 200),
+                              (1, 3, 300, 400),
+                              (5, 6, 100, 200)])
+    annot.data['confidence'] = [0.2, 0.8, 0.5]
+    annot.data['label_class'] = ['A', 'B', 'C']
+    merged = annot.merge_overlapped(merge_rules={'confidence': 'max', 'label_class': 'last'})
+    assert list(merged.data['confidence']) == [0.8, 0.5]
+    assert list(merged.data['label_class']) == ['B', 'C']
+    merged = annot.merge_overlapped(merge_rules={'confidence': 'mean'})
+    np.testing.assert_allclose(merged.data['confidence'], [0.5, 0.5])
+    assert list(merged.data['label_class']) == ['A', 'C']
+    return None
+
+
+def test_concat_and_add(make_annotations):
+    """ Test concatenation of annotation objects with concat and +."""
+    annots = [make_annotations([(idx, idx + 1, 100, 200)], audio_file_name='file' + str(idx)) for idx in range(5)]
+    annot = Annotation.concat(annots)
+    assert len(annot) == 5
+    assert list(annot.data['audio_file_name']) == ['file' + str(idx) for idx in range(5)]
+    assert annot.data['time_min_offset'].dtype == float
+    annot2 = Annotation()
+    for an in annots:
+        annot2 = annot2 + an
+    annot3 = copy.copy(annot2)
+    annot3 = annot3 + annots[0]
+    assert len(annot2) == 5
+    assert len(annot3) == 6
+    assert annot2.data.drop(columns='uuid').equals(annot.data.drop(columns='uuid'))
+    # changes to the added object after the addition are not in the result
+    annot4 = Annotation() + annots[1]
+    annots[1].data.loc[0, 'time_min_offset'] = 100
+    assert annot4.data['time_min_offset'].iloc[0] == 1
+    return None
+
+
+def test_compact_dtypes(tmp_path, make_annotations):
+    """ Test that compact data types are kept through common operations."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(50)])
+    annot.data['time_min_date'] = pd.Timestamp('2020-01-01') + pd.to_timedelta(annot.data['time_min_offset'], unit='s')
+    annot._enforce_dtypes()
+    memory = annot.data.memory_usage(deep=True).sum()
+    annot.use_compact_dtypes()
+    assert annot.data.memory_usage(deep=True).sum() < memory
+    assert isinstance(annot.data['label_class'].dtype, pd.CategoricalDtype)
+    assert annot.data['frequency_min'].dtype == np.float32
+    assert annot.data['time_min_offset'].dtype == np.float64
+    dtypes = annot.data.dtypes.astype(str)
+    # filter and +
+    filtered = annot.filter('time_min_offset < 10')
+    assert len(filtered) == 10
+    assert filtered.data.dtypes.astype(str).equals(dtypes)
+    added = filtered + make_annotations([(100, 101, 100, 200)], audio_file_name='file2')
+    assert len(added) == 11
+    assert added.data.dtypes.astype(str).equals(dtypes)
+    assert list(added.data['audio_file_name'].cat.categories) == ['file1', 'file2']
+    # parquet
+    annot.to_parquet(os.path.join(tmp_path, 'annot.parquet'))
+    annot2 = Annotation()
+    annot2.from_parquet(os.path.join(tmp_path, 'annot.parquet'))
+    assert annot2.data.dtypes.astype(str).equals(dtypes)
+    # sqlite and netcdf (read with default data types)
+    annot.to_sqlite(os.path.join(tmp_path, 'annot.sqlite'))
+    annot3 = Annotation()
+    annot3.from_sqlite(os.path.join(tmp_path, 'annot.sqlite'))
+    assert annot3.compact_dtypes
+    assert annot3.data.dtypes.astype(str).equals(dtypes)
+    assert annot3.data['frequency_max'].equals(annot.data['frequency_max'])
+    annot.to_netcdf(os.path.join(tmp_path, 'annot.nc'))
+    annot4 = Annotation()
+    annot4.from_netcdf(os.path.join(tmp_path, 'annot.nc'))
+    assert annot4.data.drop(columns='date').dtypes.astype(str).equals(dtypes)
+    # files written with default data types
+    annot5 = Annotation()
+    filtered.use_compact_dtypes(False)
+    filtered.to_sqlite(os.path.join(tmp_path, 'annot2.sqlite'))
+    annot5.from_sqlite(os.path.join(tmp_path, 'annot2.sqlite'))
+    assert not annot5.compact_dtypes
+    assert annot5.data['label_class'].dtype == object
+    # back to default types
+    annot3.use_compact_dtypes(False)
+    assert annot3.data['label_class'].dtype == object
+    return None
+
+
+def test_check_integrity_incremental(make_annotations):
+    """ Test that only new rows are checked and duplicates still removed."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(10)])
+    assert annot._count_checked_rows(list(annot._integrity['fields'])) == 10
+    # duplicate of existing row, new row with existing uuid, new row
+    new = make_annotations([(0, 1, 100, 200), (20, 21, 100, 200), (30, 31, 100, 200)])
+    new.data.loc[1, 'uuid'] = annot.data['uuid'][3]
+    annot = annot + new
+    annot.check_integrity()
+    assert len(annot) == 12
+    assert list(annot.data['time_min_offset'][10:]) == [20, 30]
+    assert not annot.data['uuid'].duplicated().any()
+    # filtering doesn't require checking annotations again
+    filtered = annot.filter('time_min_offset > 5')
+    assert filtered._count_checked_rows(list(filtered._integrity['fields'])) == len(filtered)
+    # no integrity check
+    dup = annot + make_annotations([(0, 1, 100, 200)])
+    dup = dup.filter('time_min_offset < 1', validate=False)
+    assert len(dup) == 2
+    dup.check_integrity(incremental=False)
+    assert len(dup) == 1
+    # copies don't share the integrity state
+    assert copy.copy(annot)._integrity is not annot._integrity
+    assert filtered._integrity is not annot._integrity
+    # rows modified in place are checked again with invalidate_cache
+    annot.data.loc[1, 'time_max_offset'] = -5
+    with pytest.raises(ValueError):
+        annot.check_integrity(incremental=False)
+    annot.invalidate_cache()
+    with pytest.raises(ValueError):
+        annot.filter('time_min_offset < 5')
+    annot.data.loc[1, 'time_max_offset'] = 2
+    annot.data.loc[2, 'time_min_offset'] = 1
+    annot.data.loc[2, 'time_max_offset'] = 2
+    annot.check_integrity()
+    assert len(annot) == 11
+    return None
+
+
+def test_get_by_file_and_time_range(make_annotations):
+    """ Test indexed lookups by audio file, deployment and time."""
+    annot = Annotation.concat([
+        make_annotations([(0, 1, 100, 200), (5, 6, 100, 200)], audio_file_name='file1', deployment_ID='dep1'),
+        make_annotations([(2, 3, 100, 200)], audio_file_name='file2', deployment_ID='dep2'),
+        make_annotations([(7, 8, 100, 200)], audio_file_name='file1', deployment_ID='dep2'),
+        ])
+    annot.data['time_min_date'] = pd.Timestamp('2020-01-01') + pd.to_timedelta(annot.data['time_min_offset'], unit='s')
+    assert list(annot.get_by_file('file1').data['time_min_offset']) == [0, 5, 7]
+    assert list(annot.get_by_file(['file2', 'file1']).data['time_min_offset']) == [0, 5, 2, 7]
+    assert len(annot.get_by_file('file3')) == 0
+    assert list(annot.get_by_deployment('dep2').data['time_min_offset']) == [2, 7]
+    assert annot.get_by_file('file1').data.equals(annot.filter("audio_file_name == 'file1'").data)
+    selec = annot.time_range('2020-01-01 00:00:02', '2020-01-01 00:00:07')
+    assert list(selec.data['time_min_offset']) == [5, 2]
+    assert list(annot.time_range(date_min='2020-01-01 00:00:05').data['time_min_offset']) == [5, 7]
+    # indexes are updated when data change
+    annot = annot + make_annotations([(9, 10, 100, 200)], audio_file_name='file2')
+    assert list(annot.get_by_file('file2').data['time_min_offset']) == [2, 9]
+    annot.insert_values(deployment_ID='dep3')
+    assert len(annot.get_by_deployment('dep2')) == 0
+    # and after in-place modifications with invalidate_cache
+    annot.data.loc[0, 'audio_file_name'] = 'file2'
+    annot.data.loc[3, 'time_min_date'] = pd.Timestamp('2019-12-31')
+    annot.invalidate_cache()
+    assert list(annot.get_by_file('file2').data['time_min_offset']) == [0, 2, 9]
+    assert list(annot.time_range(date_max='2020-01-01').data['time_min_offset']) == [7]
+    return None
 
+
+def test_filter_conditions(make_annotations):
+    """ Test filtering with keyword conditions, Predicate and query string."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(10)])
+    annot.data['confidence'] = np.arange(10) / 10
+    annot.data['label_class'] = ['A', 'B'] * 5
+    filt = annot.filter(label_class='A', confidence__ge=0.4)
+    assert list(filt.data['time_min_offset']) == [4, 6, 8]
+    expected = annot.filter("label_class == 'A' & confidence >= 0.4")
+    assert filt.data.equals(expected.data)
+    files = ['file1', 'file2']
+    filt = annot.filter("audio_file_name in @files & confidence < 0.2", files=files)
+    assert len(filt) == 2
+    pred = Predicate(time_min_offset__in=[1, 3], label_class__ne='A')
+    assert list(annot.filter(pred).data['time_min_offset']) == [1, 3]
+    assert len(annot.filter(audio_file_name__notin=files)) == 0
+    annot.filter(confidence__lt=0.5, inplace=True)
+    assert len(annot) == 5
+    return None
+
+
+def test_calc_time_aggregate_1D(make_annotations):
+    """ Test time aggregates against pandas resample."""
+    rng = np.random.default_rng(0)
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(500)])
+    annot.data['time_min_date'] = pd.Timestamp('2021-03-04 05:17:00') + pd.to_timedelta(
+        rng.uniform(0, 3 * 86400, 500), unit='s')
+    annot.data['confidence'] = rng.uniform(0, 1, 500)
+    annot.data['label_class'] = rng.choice(['A', 'B'], 500)
+    data = annot.data.set_index('time_min_date')
+    for resampler, field in [('count', None), ('sum', 'confidence'), ('mean', 'confidence')]:
+        aggr = annot.calc_time_aggregate_1D(
+            integration_time='2H', resampler=resampler, field=field,
+            start_date='2021-03-03 00:00:00', end_date='2021-03-08 00:00:00')
+        expected = data['uuid' if field is None else field].resample(
+            '2H', origin='start_day').agg(resampler).reindex(aggr.index).fillna(0)
+        np.testing.assert_allclose(aggr['value'].values, expected.values)
+    assert aggr['value'].values[0] == 0
+    aggr = annot.calc_time_aggregate_1D(integration_time='1D', group_by='label_class')
+    assert list(aggr.columns) == ['A', 'B']
+    assert aggr['A'].sum() == (annot.data['label_class'] == 'A').sum()
+    aggr = annot.calc_time_aggregate_1D(integration_time='1D', is_binary=True)
+    assert list(aggr['value']) == [1, 1, 1, 1]
+    return None
+
+
+def test_split_paths():
+    """ Test splitting of audio file paths into dir, name and extension."""
+    paths = pd.Series(['/data/dep.1/AMAR.20190916T061248Z.wav', 'file', '/data/dep.1/AMAR.20190916T061248Z.wav'],
+                      index=[5, 6, 7])
+    split_paths = Annotation._split_paths(paths)
+    assert list(split_paths.index) == [5, 6, 7]
+    assert list(split_paths['audio_file_dir']) == ['/data/dep.1', '', '/data/dep.1']
+    assert list(split_paths['audio_file_name']) == ['AMAR.20190916T061248Z', 'file', 'AMAR.20190916T061248Z']
+    assert list(split_paths['audio_file_extension']) == ['.wav', '', '.wav']
+    return None
+
+
+def test_partitioned_parquet(tmp_path, make_annotations):
+    """ Test writing and reading partitioned parquet datasets."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(20)])
+    annot.data['time_min_date'] = pd.Timestamp('2021-03-04 23:00:00') + pd.to_timedelta(annot.data['time_min_offset'] * 600, unit='s')
+    annot.data['deployment_ID'] = ['dep1', 'dep2'] * 10
+    annot.data['label_class'] = ['A'] * 10 + ['B'] * 10
+    annot.data['confidence'] = np.arange(20) / 20
+    folder = os.path.join(tmp_path, 'dataset')
+    annot.to_parquet(folder, partition_cols=['deployment_ID', 'date', 'label_class'])
+    assert os.path.isdir(os.path.join(folder, 'deployment_ID=dep1', 'date=2021-03-05', 'label_class=B'))
+    annot2 = Annotation()
+    annot2.from_parquet(folder)
+    assert list(annot2.data.columns) == list(annot.data.columns)
+    data1 = annot.data.sort_values('uuid').reset_index(drop=True)
+    data2 = annot2.data.sort_values('uuid').reset_index(drop=True)
+    for field in ['uuid', 'deployment_ID', 'label_class', 'confidence', 'time_min_offset']:
+        assert data1[field].equals(data2[field])
+    annot3 = Annotation()
+    annot3.from_parquet(folder, columns=['uuid', 'confidence'],
+                        filters=[('deployment_ID', '==', 'dep1'), ('date', '>=', '2021-03-05'), ('confidence', '>=', 0.5)])
+    assert list(annot3.data.columns) == ['uuid', 'confidence']
+    np.testing.assert_allclose(sorted(annot3.data['confidence']), [0.5, 0.6, 0.7, 0.8, 0.9])
+    return None
+
+
+def test_sqlite_filtered_read(tmp_path, make_annotations):
+    """ Test writing sqlite tables and reading with filters and columns."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(20)])
+    annot.data['time_min_date'] = pd.Timestamp('2021-03-04 23:00:00') + pd.to_timedelta(annot.data['time_min_offset'] * 600, unit='s')
+    annot.data['label_class'] = ['A', 'B'] * 10
+    annot.data['confidence'] = np.arange(20) / 20
+    file = os.path.join(tmp_path, 'detections.sqlite')
+    annot.to_sqlite(file, chunksize=7)
+    annot2 = Annotation()
+    annot2.from_sqlite(file)
+    assert len(annot2) == 20
+    assert annot2.data['time_min_date'].equals(annot.data['time_min_date'])
+    annot3 = Annotation()
+    annot3.from_sqlite(file, chunksize=2, filters=[('label_class', 'in', ['A']), ('confidence', '>=', 0.5),
+                                                   ('time_min_date', '<', pd.Timestamp('2021-03-05 01:00:00'))])
+    assert list(annot3.data['time_min_offset']) == [10]
+    annot4 = Annotation()
+    annot4.from_sqlite(file, columns=['uuid', 'label_class'], filters=[('label_class', '==', 'B')])
+    assert list(annot4.data.columns) == ['uuid', 'label_class']
+    assert len(annot4) == 10
+    # read by chunks
+    chunks = list(Annotation().iter_sqlite(file, chunksize=6, filters=[('label_class', '==', 'A')]))
+    assert [len(chunk) for chunk in chunks] == [6, 4]
+    assert list(Annotation.concat(chunks).data['uuid']) == list(annot.data['uuid'][::2])
+    return None
+
+
+def test_netcdf_roundtrip(tmp_path, make_annotations):
+    """ Test writing and reading netcdf files with categorical fields."""
+    annot1 = make_annotations([(idx, idx + 1, 100, 200) for idx in range(20)])
+    annot1.data['label_class'] = ['A', 'B', np.nan, 'A'] * 5
+    annot1.data['confidence'] = np.arange(20) / 20
+    annot2 = make_annotations([(idx, idx + 1, 100, 200) for idx in range(5)], audio_file_name='file2')
+    annot2.data['label_class'] = 'C'
+    annot2.use_compact_dtypes()
+    columns = list(annot1.data.columns)
+    annot1.to_netcdf(os.path.join(tmp_path, 'annot1.nc'))
+    annot2.to_netcdf(os.path.join(tmp_path, 'annot2.nc'))
+    assert list(annot1.data.columns) == columns
+    annot3 = Annotation()
+    annot3.from_netcdf(os.path.join(tmp_path, 'annot1.nc'))
+    assert list(annot3.data.columns) == ['date'] + columns
+    for field in ['uuid', 'audio_file_name', 'label_class', 'confidence', 'time_min_offset']:
+        assert annot3.data[field].equals(annot1.data[field])
+    # several files with different categories and selected variables
+    annot4 = Annotation()
+    annot4.from_netcdf([os.path.join(tmp_path, 'annot1.nc'), os.path.join(tmp_path, 'annot2.nc')],
+                       variables=['uuid', 'audio_file_name', 'label_class'])
+    assert list(annot4.data.columns) == ['date', 'uuid', 'audio_file_name', 'label_class']
+    assert len(annot4) == 25
+    assert list(annot4.data['label_class']) == list(annot1.data['label_class']) + ['C'] * 5
+    assert list(annot4.data['audio_file_name'][-5:]) == ['file2'] * 5
+    return None
+
+
+def test_to_raven_per_file(tmp_path, make_annotations):
+    """ Test writing one Raven file per audio file."""
+    annot = make_annotations([(idx, idx + 1, 100, 200) for idx in range(10)])
+    annot.data['audio_file_name'] = ['file2', 'file1'] * 5
+    annot.data['audio_file_extension'] = '.wav'
+    annot.data['audio_file_dir'] = 'dir'
+    annot.to_raven(tmp_path, n_jobs=2)
+    files = sorted(os.listdir(tmp_path))
+    assert files == ['file1.wav.chan1.Table.1.selections.txt', 'file2.wav.chan1.Table.1.selections.txt']
+    table = pd.read_csv(os.path.join(tmp_path, files[0]), sep='\t')
+    assert list(table['Selection']) == [1, 2, 3, 4, 5]
+    assert list(table['Begin Time (s)']) == [1, 3, 5, 7, 9]
+    assert list(table['Begin Path']) == [os.path.join('dir', 'file1.wav')] * 5
+    assert list(table['Begin File']) == ['file1.wav'] * 5
+    # annotations without audio file name
+    annot.data.loc[9, 'audio_file_name'] = None
+    os.makedirs(os.path.join(tmp_path, 'missing'))
+    annot.to_raven(os.path.join(tmp_path, 'missing'))
+    files = sorted(os.listdir(os.path.join(tmp_path, 'missing')))
+    assert files == ['file1.wav.chan1.Table.1.selections.txt', 'file2.wav.chan1.Table.1.selections.txt']
+    table = pd.read_csv(os.path.join(tmp_path, 'missing', files[0]), sep='\t')
+    assert list(table['Begin Time (s)']) == [1, 3, 5, 7]
+    annot.to_raven(os.path.join(tmp_path, 'missing'), outfile='all.txt', single_file=True)
+    table = pd.read_csv(os.path.join(tmp_path, 'missing', 'all.txt'), sep='\t')
+    assert len(table) == 10
+    assert annot.data['audio_file_name'][9] is None
+    return None
+
+
+def test_update_audio_dir(tmp_path, make_annotations):
+    """ Test finding the new folder of audio files by file name."""
+    os.makedirs(os.path.join(tmp_path, 'new', 'dep1'))
+    open(os.path.join(tmp_path, 'new', 'dep1', 'file1.wav'), 'w').close()
+    open(os.path.join(tmp_path, 'new', 'dep1', 'afile2.wav'), 'w').close()
+    annot = make_annotations([(0, 1, 100, 200), (1, 2, 100, 200)])
+    annot.data['audio_file_name'] = ['file1', 'file2']
+    annot.data['audio_file_extension'] = '.wav'
+    annot.data['audio_file_dir'] = 'old'
+    with pytest.warns(UserWarning, match='1 files could not be found'):
+        annot.update_audio_dir(os.path.join(tmp_path, 'new'))
+    assert list(annot.data['audio_file_dir']) == [os.path.join(tmp_path, 'new', 'dep1'), 'old']
+    return None
+
+
+def test_overlap_pairs_long_annotation(make_annotations):
+    """ Test that one long annotation doesn't make all pairs candidates."""
+    n = 20000
+    annot = make_annotations([(idx * 10, idx * 10 + 1, 100, 200) for idx in range(n)])
+    annot.data.loc[0, 'time_max_offset'] = n * 100
+    idx1, idx2 = Annotation._overlap_pairs(annot.data, annot.data)
+    # each annotation with itself + long annotation with all others (both ways)
+    assert len(idx1) == n + 2 * (n - 1)
+    assert np.all(np.diff(idx2) >= 0)
+    assert set(idx1[idx2 == 5]) == {0, 5}
+    return None
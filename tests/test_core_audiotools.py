@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ecosound.core.audiotools.
+"""
+import numpy as np
+import scipy.signal as spsig
+from ecosound.core.audiotools import Filter, Resampler, resample_polyphase, _design_sos
+
+
+def test_filter_coefficients_are_cached():
+    """ Test that filter coefficients are only designed once."""
+    _design_sos.cache_clear()
+    Filter('bandpass', [100, 500], order=4).coefficients(4000)
+    sos = Filter('bandpass', [100, 500], order=4).coefficients(4000)
+    assert _design_sos.cache_info().hits == 1
+    expected = spsig.butter(4, [100 / 2000, 500 / 2000], btype='band', output='sos')
+    np.testing.assert_allclose(sos, expected)
+    return None
+
+
+def test_filter_apply_batch():
+    """ Test that filtering a batch gives the same results as one by one."""
+    rng = np.random.default_rng(0)
+    waveforms = [rng.normal(0, 1, 1000) for _ in range(5)]
+    my_filter = Filter('lowpass', [300], order=6)
+    batch = my_filter.apply_batch(waveforms, 4000)
+    for waveform, filtered in zip(waveforms, batch):
+        np.testing.assert_allclose(filtered, my_filter.apply(waveform, 4000))
+    return None
+
+
+def test_streaming_resampler_matches_polyphase():
+    """ Test that resampling by blocks gives the same result as in one go."""
+    rng = np.random.default_rng(0)
+    waveform = rng.normal(0, 1, 20000)
+    for fs, new_fs in [(96000, 2000), (44100, 2000), (8000, 12000)]:
+        expected, expected_fs = resample_polyphase(waveform, fs, new_fs)
+        resampler = Resampler(fs, new_fs)
+        blocks = [resampler.process(block) for block in np.array_split(waveform, 7)]
+        blocks.append(resampler.flush())
+        np.testing.assert_allclose(np.concatenate(blocks), expected)
+        assert expected_fs == new_fs
+    return None
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ecosound.core.detection_sink.
+"""
+import os
+import concurrent.futures
+from ecosound.core.detection_sink import DetectionSink
+
+
+def write_detections(folder, worker, make_annotations):
+    """ Write detections of one worker (run in a separate process)."""
+    sink = DetectionSink(folder)
+    for idx in range(5):
+        annot = make_annotations([(t, t + 1, 100, 200) for t in range(10)],
+                                 audio_file_name='file_' + str(worker) + '_' + str(idx))
+        sink.write(annot, name='file_' + str(worker) + '_' + str(idx))
+    return len(sink)
+
+
+def test_detection_sink_parallel_writes(tmp_path, make_annotations):
+    """ Test writing detections from several processes at the same time."""
+    folder = os.path.join(tmp_path, 'sink')
+    sink = DetectionSink(folder)
+    assert len(sink.read()) == 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(write_detections, folder, worker, make_annotations) for worker in range(4)]
+        counts = [future.result() for future in futures]
+    assert max(counts) <= 200
+    assert len(sink.segments()) == 20
+    assert sink.contains('file_3_4')
+    assert not sink.contains('file_4_0')
+    assert len(sink) == 200
+    annot = sink.read(filters=[('audio_file_name', 'in', ['file_0_0', 'file_1_1'])])
+    assert len(annot) == 20
+    segments = {file: open(file, 'rb').read() for file in sink.segments()}
+    sink.compact()
+    assert len(sink.segments()) == 1
+    assert len(sink.read()) == 200
+    assert len(sink.lazy().filter(audio_file_name='file_2_3')) == 10
+    # names of the merged segments are kept
+    assert sink.contains('file_3_4')
+    assert not sink.contains('file_4_0')
+    assert len(sink.names()) == 20
+    # merged segments are ignored by readers before they are deleted
+    for file, content in segments.items():
+        with open(file, 'wb') as f:
+            f.write(content)
+    assert len(sink.segments()) == 1
+    assert len(sink.read()) == 200
+    # segments merged several times
+    sink.write(make_annotations([(0, 1, 100, 200)], audio_file_name='file_4_0'), name='file_4_0')
+    sink.compact()
+    assert len(sink.segments()) == 1
+    assert len(sink.names()) == 21
+    assert sink.contains('file_4_0') and sink.contains('file_0_0')
+    assert len(sink) == 201
+    return None
+
+
+def test_detection_sink_names(tmp_path, make_annotations):
+    """ Test names of segments are kept as written (not as in file names)."""
+    sink = DetectionSink(os.path.join(tmp_path, 'sink'))
+    sink.write(make_annotations([(0, 1, 100, 200)], audio_file_name='a-b.wav'), name='a-b.wav')
+    assert sink.contains('a-b.wav')
+    assert not sink.contains('a_b.wav')
+    sink.write(make_annotations([(0, 1, 100, 200)], audio_file_name='a_b.wav'), name='a_b.wav')
+    assert sink.contains('a_b.wav')
+    assert sorted(sink.names()) == ['a-b.wav', 'a_b.wav']
+    sink.compact()
+    assert sink.contains('a-b.wav') and sink.contains('a_b.wav')
+    assert not sink.contains('a+b.wav')
+    assert sorted(sink.names()) == ['a-b.wav', 'a_b.wav']
+    return None
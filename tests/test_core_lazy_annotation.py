@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ecosound.core.lazy_annotation.
+"""
+import os
+import numpy as np
+import pandas as pd
+from ecosound.core.annotation import Annotation
+from ecosound.core.lazy_annotation import LazyAnnotation
+
+
+def make_dataset(folder, make_annotations):
+    """ Write partitioned parquet dataset and return matching Annotation."""
+    rng = np.random.default_rng(0)
+    boxes = [(t, t + 1, 100, 200) for t in rng.uniform(0, 100, 200)]
+    annot = make_annotations(boxes)
+    annot.data['audio_file_name'] = rng.choice(['file1', 'file2'], 200)
+    annot.data['deployment_ID'] = rng.choice(['dep1', 'dep2'], 200)
+    annot.data['label_class'] = rng.choice(['A', 'B'], 200)
+    annot.data['confidence'] = rng.uniform(0, 1, 200)
+    annot.data['time_min_date'] = pd.Timestamp('2021-03-04 20:00:00') + pd.to_timedelta(
+        rng.uniform(0, 86400, 200), unit='s')
+    annot.to_parquet(folder, partition_cols=['deployment_ID', 'date', 'label_class'])
+    annot = Annotation()
+    annot.from_parquet(folder)
+    return annot
+
+
+def test_lazy_annotation_queries(tmp_path, make_annotations):
+    """ Test that lazy queries give the same results as Annotation."""
+    folder = os.path.join(tmp_path, 'dataset')
+    annot = make_dataset(folder, make_annotations)
+    lazy_annot = LazyAnnotation(folder, batch_size=30)
+    assert len(lazy_annot) == len(annot)
+    lazy_filt = lazy_annot.filter(label_class='A', confidence__ge=0.5)
+    filt = annot.filter(label_class='A', confidence__ge=0.5)
+    assert len(lazy_annot) == len(annot)
+    assert len(lazy_filt) == len(filt)
+    assert lazy_filt.get_labels_class() == ['A']
+    assert set(lazy_filt.collect().data['uuid']) == set(filt.data['uuid'])
+    assert lazy_annot.summary().equals(annot.summary())
+    for kwargs in [{'integration_time': '2H'},
+                   {'integration_time': '5H', 'group_by': 'deployment_ID'},
+                   {'integration_time': '1D', 'resampler': 'mean', 'field': 'confidence'}]:
+        np.testing.assert_allclose(lazy_annot.calc_time_aggregate_1D(**kwargs).values,
+                                   annot.calc_time_aggregate_1D(**kwargs).values)
+    return None
+
+
+def test_lazy_annotation_filter_overlap_with(tmp_path, make_annotations):
+    """ Test filtering overlapping annotations by batches."""
+    folder = os.path.join(tmp_path, 'dataset')
+    annot = make_dataset(folder, make_annotations)
+    lazy_annot = LazyAnnotation(folder, batch_size=30)
+    ref = make_annotations([(10, 20, 0, 1000), (50, 52, 150, 160)], audio_file_name='file1')
+    ref.data['deployment_ID'] = ['dep1', 'dep2']
+    for remove_duplicates in [False, True]:
+        expected = annot.filter_overlap_with(ref, remove_duplicates=remove_duplicates)
+        result = lazy_annot.filter_overlap_with(ref, remove_duplicates=remove_duplicates)
+        assert len(expected) > 0
+        assert set(result.data['uuid']) == set(expected.data['uuid'])
+    return None
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ecosound.core.tools.
+"""
+import os
+from datetime import datetime
+import pytest
+from ecosound.core.tools import filename_to_datetime, _filename_to_datetime, index_files
+
+
+def test_filename_to_datetime():
+    """ Test timestamps are parsed once per unique filename."""
+    _filename_to_datetime.cache_clear()
+    files = ['AMAR173.4.20190916T061248Z.wav',
+             '67674121.181018013806.wav',
+             'JASCOAMARHYDROPHONE742_20140913T084017.774Z.wav'] * 100
+    timestamps = filename_to_datetime(files)
+    assert timestamps[:3] == [datetime(2019, 9, 16, 6, 12, 48),
+                              datetime(2018, 10, 18, 1, 38, 6),
+                              datetime(2014, 9, 13, 8, 40, 17, 774000)]
+    assert timestamps[3:6] == timestamps[:3]
+    assert _filename_to_datetime.cache_info().misses == 3
+    assert filename_to_datetime('a_20190101_101010.wav') == [datetime(2019, 1, 1, 10, 10, 10)]
+    with pytest.raises(ValueError):
+        filename_to_datetime('no_date.wav')
+    return None
+
+
+def test_index_files(tmp_path):
+    """ Test indexing files by name with a cache of the folders content."""
+    for folder in ['a', os.path.join('b', 'c')]:
+        os.makedirs(os.path.join(tmp_path, folder))
+    for file in [os.path.join('a', 'rec1.wav'), os.path.join('b', 'c', 'rec2.wav'), os.path.join('b', 'c', 'rec2.log')]:
+        open(os.path.join(tmp_path, file), 'w').close()
+    cache_file = os.path.join(tmp_path, 'cache.json')
+    index = index_files(str(tmp_path), suffixes=['.wav'], cache_file=cache_file)
+    assert index == {'rec1.wav': os.path.join(str(tmp_path), 'a', 'rec1.wav'),
+                     'rec2.wav': os.path.join(str(tmp_path), 'b', 'c', 'rec2.wav')}
+    assert os.path.isfile(cache_file)
+    # new file is found when the cache is used
+    open(os.path.join(tmp_path, 'b', 'c', 'rec3.wav'), 'w').close()
+    index = index_files(str(tmp_path), suffixes=['.wav'], cache_file=cache_file)
+    assert index['rec3.wav'] == os.path.join(str(tmp_path), 'b', 'c', 'rec3.wav')
+    assert 'rec2.log' in index_files(str(tmp_path))
+    with pytest.raises(Exception):
+        index_files(os.path.join(str(tmp_path), 'no_folder'))
+    return None
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the PRF performance evaluation.
+"""
+import copy
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+from ecosound.evaluation.prf import PRF
+
+
+def test_count_matches_filter_overlap_with(tmp_path, make_annotations):
+    """ Test that TP, FP, FN are the same as with filter_overlap_with per file."""
+    rng = np.random.default_rng(0)
+    annot = make_annotations([(t, t + 2, 100, 200) for t in rng.random(40) * 50])
+    annot.data['audio_file_name'] = rng.choice(['f1', 'f2', 'f3'], 40)
+    detec = make_annotations([(t, t + 1, 100, 200) for t in rng.random(60) * 50])
+    detec.data['audio_file_name'] = rng.choice(['f1', 'f2', 'f4'], 60)
+    detec.data['confidence'] = rng.random(60)
+    thresholds = [0, 0.5]
+    PRF.count(annot=copy.deepcopy(annot), detec=copy.deepcopy(detec), out_dir=str(tmp_path),
+              target_class='det', thresholds=thresholds, remove_duplicates=True)
+    perf = pd.read_csv(tmp_path / 'Performance_per_file.csv')
+    for _, row in perf.iterrows():
+        annot_file = annot.get_by_file(row['file'])
+        detec_file = detec.filter(confidence__ge=row['threshold']).get_by_file(row['file'])
+        ovlp = annot_file.filter_overlap_with(detec_file, remove_duplicates=True, filter_deploymentID=False)
+        assert row['TP'] == len(ovlp)
+        assert row['FN'] == len(annot_file) - len(ovlp)
+        assert row['FP'] == len(detec_file) - len(ovlp)
+    assert list(perf['file'].unique()) == ['f1', 'f2', 'f3', 'f4']
+    return None
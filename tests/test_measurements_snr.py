@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the SNR measurer.
+"""
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import soundfile as sf
+from ecosound.core.annotation import Annotation
+from ecosound.core.audiotools import Sound
+from ecosound.core.spectrogram import Spectrogram
+from ecosound.measurements.measurer_builder import MeasurerFactory
+from ecosound.measurements.measurement_cache import MeasurementCache
+
+
+def make_test_data(out_dir, fs=4000):
+    """ Write a noisy test recording with a tone and matching annotations."""
+    rng = np.random.default_rng(0)
+    sig = rng.normal(0, 0.1, fs * 10)
+    axis_t = np.arange(fs * 10) / fs
+    sig[fs * 2:fs * 3] += np.sin(2 * np.pi * 500 * axis_t[fs * 2:fs * 3])
+    sf.write(os.path.join(out_dir, 'rec.wav'), sig, fs)
+    # time_min, time_max, freq_min, freq_max
+    boxes = [(1.9, 3.1, 400, 600),
+             (2.5, 2.8, 300, 700),
+             (8, 9, 0, 1000),
+             (9.5, 10.5, 100, 1900),
+             (11, 12, 100, 200),
+             (0.1, 0.5, 100, 300)]
+    annot = Annotation()
+    annot.data = pd.DataFrame({
+        'time_min_offset': [box[0] for box in boxes],
+        'time_max_offset': [box[1] for box in boxes],
+        'frequency_min': [box[2] for box in boxes],
+        'frequency_max': [box[3] for box in boxes],
+        })
+    annot.data['duration'] = annot.data['time_max_offset'] - annot.data['time_min_offset']
+    annot.data['audio_file_dir'] = str(out_dir)
+    annot.data['audio_file_name'] = 'rec'
+    annot.data['audio_file_extension'] = '.wav'
+    annot.data['label_class'] = 'tone'
+    annot.data['uuid'] = [str(uuid.uuid4()) for _ in boxes]
+    return annot
+
+
+def test_snr_per_file_matches_per_annotation(tmp_path):
+    """ Test that grouped-by-file SNR gives the same values as per annotation."""
+    annot = make_test_data(tmp_path)
+    snr = MeasurerFactory('SNR', noise_win_sec=1)
+    expected = [snr.compute_single_annot(an, False)['snr'][0] for _, an in annot.data.iterrows()]
+    meas = snr.compute(annot)
+    np.testing.assert_allclose(meas.data['snr'].values, expected)
+    assert np.isnan(meas.data['snr'].values[4])
+    assert meas.data['snr'].values[0] > 20
+    return None
+
+
+def test_snr_from_spectrogram(tmp_path):
+    """ Test spectrogram-domain SNR against a brute force calculation."""
+    fs = 4000
+    annot = make_test_data(tmp_path, fs=fs)
+    sound = Sound(os.path.join(tmp_path, 'rec.wav'))
+    sound.read()
+    spectro = Spectrogram(0.064, 'hann', 0.064, 0.016, fs, unit='sec', verbose=False)
+    spectro.compute(sound, dB=True)
+    snr = MeasurerFactory('SNR', noise_win_sec=1)
+    meas = snr.compute(annot, spectro=spectro)
+    # brute force for first annotation
+    power = 10 ** (spectro.spectrogram / 10)
+    axis_t = spectro.axis_times
+    axis_f = spectro.axis_frequencies
+    an = annot.data.iloc[0]
+    rows = (axis_f >= an.frequency_min) & (axis_f <= an.frequency_max)
+    sig = (axis_t >= an.time_min_offset) & (axis_t <= an.time_max_offset)
+    noise = ((axis_t >= an.time_min_offset - 0.5) & (axis_t < an.time_min_offset)) | (
+        (axis_t > an.time_max_offset) & (axis_t <= an.time_max_offset + 0.5))
+    expected = 10 * np.log10(power[rows][:, sig].mean() / power[rows][:, noise].mean())
+    np.testing.assert_allclose(meas.data['snr'].values[0], expected)
+    assert np.isnan(meas.data['snr'].values[4])
+    return None
+
+
+def test_snr_cache(tmp_path):
+    """ Test that cached SNR measurements are reused and match."""
+    annot = make_test_data(tmp_path)
+    snr = MeasurerFactory('SNR', noise_win_sec=1)
+    cache_file = os.path.join(tmp_path, 'cache.sqlite')
+    expected = snr.compute(annot).data['snr'].values
+    meas1 = snr.compute(annot, cache=cache_file)
+    cache = MeasurementCache(cache_file)
+    cached, missing = cache.lookup(annot.data, snr, options={'domain': 'audio'})
+    assert len(missing) == 0
+    meas2 = snr.compute(annot, cache=cache)
+    np.testing.assert_allclose(meas1.data['snr'].values, expected)
+    np.testing.assert_allclose(meas2.data['snr'].values, expected)
+    # different parameters are not read from the cache
+    snr2 = MeasurerFactory('SNR', noise_win_sec=0.5)
+    cached, missing = cache.lookup(annot.data, snr2, options={'domain': 'audio'})
+    assert len(cached) == 0
+    return None
+
+
+def test_snr_cache_spectrogram_content(tmp_path):
+    """ Test that cached SNR from a different spectrogram is not reused."""
+    fs = 4000
+    annot = make_test_data(tmp_path, fs=fs)
+    sound = Sound(os.path.join(tmp_path, 'rec.wav'))
+    sound.read()
+    spectro = Spectrogram(0.064, 'hann', 0.064, 0.016, fs, unit='sec', verbose=False)
+    spectro.compute(sound, dB=True)
+    snr = MeasurerFactory('SNR', noise_win_sec=1)
+    cache_file = os.path.join(tmp_path, 'cache.sqlite')
+    meas1 = snr.compute(annot, spectro=spectro, cache=cache_file)
+    # same resolution, different values (e.g. denoised)
+    spectro._spectrogram = spectro.spectrogram - spectro.spectrogram.mean(axis=1, keepdims=True)
+    expected = snr.compute(annot, spectro=spectro).data['snr'].values
+    meas2 = snr.compute(annot, spectro=spectro, cache=cache_file)
+    np.testing.assert_allclose(meas2.data['snr'].values, expected)
+    assert not np.allclose(meas1.data['snr'].values[:4], expected[:4])
+    return None